@@ -1,42 +1,219 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi.responses import JSONResponse
+import math
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException, Depends, Request, status, File, Form, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
 import json
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel
-from api.schemas import BookInfoRequest, QARequest, APIResponse, GenerateReportRequest
+from api.schemas import (
+    BookInfoRequest, BookInfoBatchRequest, QARequest, APIResponse, GenerateReportRequest, ReportSectionsRequest
+)
+from config.settings import settings
 from services.book_service import BookService
 from services.gemini_service import GeminiService
 from services.chat_memory_service import ChatMemoryService
+from services.report_job_service import ReportJobService, JobQueueFullError
+from services.health_service import HealthService
+from services.prefetch_service import ReportPrefetchService
+from services.book_text_service import BookTextService, BookTextTooLargeError
+from services.answer_index_service import AnswerIndexService
+from services.report_sections import REPORT_SECTIONS
+from services.preset_prompts import PRESET_PROMPTS, match_preset
 from utils.helpers import create_success_response, create_error_response, log_error
+from utils.cache import TTLCache
+from utils.shared_cache import SharedCache
+from utils.catalog import BookCatalog
+from utils.circuit_breaker import CircuitOpenError
+from utils.response_cache import cached_response, prepare_json_response
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # 依赖注入
+_book_text_service: Optional[BookTextService] = None
+
+def get_book_text_service() -> BookTextService:
+    """获取书籍全文服务实例（进程内共享）"""
+    global _book_text_service
+    if _book_text_service is None:
+        _book_text_service = BookTextService(
+            storage_dir=settings.book_text_dir,
+            chunk_chars=settings.book_text_chunk_chars,
+            max_bytes=settings.book_text_max_bytes
+        )
+    return _book_text_service
+
+def _create_answer_index() -> Optional[AnswerIndexService]:
+    """创建语义索引，未启用或缺少numpy时返回None"""
+    if not settings.answer_index_enabled:
+        return None
+    answer_index = AnswerIndexService(
+        storage_dir=settings.answer_index_dir,
+        top_k=settings.answer_index_top_k,
+        min_similarity=settings.answer_index_min_similarity,
+        direct_similarity=settings.answer_index_direct_similarity
+    )
+    if not answer_index.available:
+        logger.warning("ANSWER_INDEX_ENABLED is set but numpy is not installed, semantic index disabled")
+        return None
+    return answer_index
+
+_book_service: Optional[BookService] = None
+
 def get_book_service() -> BookService:
-    """获取书籍服务实例"""
-    try:
-        gemini_service = GeminiService()
-        return BookService(gemini_service)
-    except Exception as e:
-        log_error(e, "Failed to initialize book service")
-        raise HTTPException(status_code=500, detail="Service initialization failed")
+    """获取书籍服务实例（进程内共享，使缓存在请求之间生效）"""
+    global _book_service
+    if _book_service is None:
+        try:
+            gemini_service = GeminiService()
+            # 多worker部署时配置共享缓存，使各worker复用彼此生成的结果
+            shared_cache = (SharedCache(settings.shared_cache_path, busy_timeout=settings.shared_cache_busy_timeout)
+                            if settings.shared_cache_path else None)
+            _book_service = BookService(
+                gemini_service,
+                cache_ttl=settings.cache_ttl if settings.cache_enabled else 0,
+                shared_cache=shared_cache,
+                claim_timeout=settings.shared_cache_claim_timeout,
+                stale_ttl=settings.cache_stale_ttl,
+                refresh_ahead=settings.cache_refresh_ahead,
+                hot_hits=settings.cache_hot_hits,
+                report_mode=settings.report_mode,
+                preset_ttl=settings.preset_answer_ttl,
+                book_text_service=get_book_text_service(),
+                book_text_top_k=settings.book_text_top_k,
+                answer_index=_create_answer_index(),
+                catalog=BookCatalog(settings.catalog_path) if settings.catalog_path else None
+            )
+        except Exception as e:
+            log_error(e, "Failed to initialize book service")
+            raise HTTPException(status_code=500, detail="Service initialization failed")
+    return _book_service
+
+_report_job_service: Optional[ReportJobService] = None
+
+def get_report_job_service() -> ReportJobService:
+    """获取报告任务队列实例（进程内共享）"""
+    global _report_job_service
+    if _report_job_service is None:
+        _report_job_service = ReportJobService(
+            get_book_service(),
+            workers=settings.report_job_workers,
+            max_queue_size=settings.report_job_queue_size,
+            storage_dir=settings.report_job_dir,
+            retention_seconds=settings.report_job_retention
+        )
+    return _report_job_service
+
+_prefetch_service: Optional[ReportPrefetchService] = None
+
+def get_prefetch_service() -> Optional[ReportPrefetchService]:
+    """获取报告预取实例，未启用时返回None"""
+    global _prefetch_service
+    if not settings.report_prefetch_enabled:
+        return None
+    if _prefetch_service is None:
+        _prefetch_service = ReportPrefetchService(
+            get_book_service(),
+            get_report_job_service(),
+            daily_budget=settings.report_prefetch_daily_budget,
+            idle_ratio=settings.report_prefetch_idle_ratio,
+            tracking_ttl=settings.report_job_retention
+        )
+    return _prefetch_service
+
+_health_service: Optional[HealthService] = None
+
+def get_health_service() -> HealthService:
+    """获取健康检查实例（进程内共享，检查项在应用启动时注册）"""
+    global _health_service
+    if _health_service is None:
+        _health_service = HealthService()
+    return _health_service
+
+def _book_info_payload(book_info) -> Dict[str, Any]:
+    """书籍信息接口的响应内容"""
+    # The service now always returns a BookInfo object.
+    # We pass it directly to the response.
+    return create_success_response(
+        data=book_info.dict(),
+        message="Book information retrieved successfully"
+    )
+
+def _stale_book_info_payload(book_info) -> Dict[str, Any]:
+    """已过期的书籍信息（后台正在刷新，或上游熔断）"""
+    return create_success_response(
+        data={**book_info.dict(), "stale": True},
+        message="Returning previously cached book information"
+    )
+
+def _after_book_lookup(book_info, book_service: BookService,
+                       prefetch_service: Optional[ReportPrefetchService]):
+    """查到书籍后在后台准备用户接下来可能请求的内容"""
+    if not book_info.is_found:
+        return
+    if settings.preset_precompute_on_lookup:
+        # 客户端以书籍信息中的书名提问
+        book_service.schedule_preset_answers(book_info.title)
+    if prefetch_service is not None:
+        # 用户很可能接着打开详细报告，上游空闲时提前生成
+        prefetch_service.maybe_prefetch(book_info)
+
+def _upstream_unavailable_response(error: str, retry_after: float) -> JSONResponse:
+    """上游熔断且没有缓存可用时的响应（503，Retry-After 为熔断剩余秒数）"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=create_error_response(
+            error=error,
+            message="AI service is temporarily unavailable, please retry later"
+        ),
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+def _queue_full_response(e: JobQueueFullError) -> JSONResponse:
+    """报告任务队列已满时的响应（429）"""
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content=create_error_response(
+            error=str(e),
+            message="Too many pending report jobs, please retry later"
+        )
+    )
 
 @router.post("/book/info", response_model=APIResponse)
 async def get_book_info(
     request: BookInfoRequest,
-    book_service: BookService = Depends(get_book_service)
+    http_request: Request,
+    book_service: BookService = Depends(get_book_service),
+    prefetch_service: Optional[ReportPrefetchService] = Depends(get_prefetch_service)
 ):
     """获取书籍信息"""
     try:
-        book_info = await book_service.get_book_info(request.book_name)
+        # 缓存命中时直接返回条目上已序列化的响应，跳过模型校验与JSON编码
+        entry = book_service.get_book_info_entry(request.book_name)
+        if entry is None:
+            book_info = await book_service.get_book_info(request.book_name)
+            entry = book_service.get_book_info_entry(request.book_name, allow_expired=True)
+            if entry is None:
+                # 缓存未启用
+                _after_book_lookup(book_info, book_service, prefetch_service)
+                return _book_info_payload(book_info)
         
-        # The service now always returns a BookInfo object.
-        # We pass it directly to the response.
-        return create_success_response(
-            data=book_info.dict(),
-            message="Book information retrieved successfully"
+        _after_book_lookup(entry.value, book_service, prefetch_service)
+        
+        if entry.is_expired:
+            # 服务层先返回了过期条目（后台刷新中或上游熔断）
+            return cached_response(entry, _stale_book_info_payload, artifact_key="stale_response").render(
+                http_request, settings.compression_min_size
+            )
+        
+        return cached_response(entry, _book_info_payload).render(
+            http_request, settings.compression_min_size
         )
-            
+    
+    except CircuitOpenError as e:
+        return _upstream_unavailable_response(str(e), e.retry_after)
     except Exception as e:
         log_error(e, "Error getting book info")
         return create_error_response(
@@ -44,6 +221,91 @@ async def get_book_info(
             message=f"Failed to retrieve book information: {str(e)}"
         )
 
+@router.post("/book/info/batch")
+async def get_book_info_batch(
+    request: BookInfoBatchRequest,
+    book_service: BookService = Depends(get_book_service)
+):
+    """批量获取书籍信息，以NDJSON按完成顺序流式返回"""
+    if not request.book_names:
+        return create_error_response(
+            error="Empty book list",
+            message="book_names must not be empty"
+        )
+    
+    if len(request.book_names) > settings.batch_max_titles:
+        return create_error_response(
+            error="Too many books",
+            message=f"At most {settings.batch_max_titles} books per batch"
+        )
+    
+    async def generate():
+        try:
+            async for item in book_service.iter_book_info_batch(
+                request.book_names, concurrency=settings.batch_concurrency
+            ):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        except Exception as e:
+            log_error(e, "Error in batch book info")
+            yield json.dumps({"status": "error", "error": "Internal server error"}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/catalog/lookup", response_model=APIResponse)
+async def lookup_catalog(
+    q: str,
+    book_service: BookService = Depends(get_book_service)
+):
+    """按ISBN或书名查询本地书目库（只返回书目库中的事实信息，不调用AI）"""
+    if book_service.catalog is None:
+        return create_error_response(
+            error="Catalog not configured",
+            message="Set CATALOG_PATH to enable the local catalog"
+        )
+    try:
+        record = await asyncio.to_thread(book_service.catalog.lookup, q)
+    except Exception as e:
+        log_error(e, "Error looking up catalog")
+        return create_error_response(
+            error="Internal server error",
+            message="Failed to look up catalog"
+        )
+    if record is None:
+        return create_error_response(
+            error="Book not found in catalog",
+            message="No catalog record matches the query"
+        )
+    return create_success_response(
+        data=record,
+        message="Catalog record retrieved successfully"
+    )
+
+@router.get("/library/search", response_model=APIResponse)
+async def search_library(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    book_service: BookService = Depends(get_book_service)
+):
+    """在已缓存的书籍中按书名、作者、类型、简介检索（分页，不调用AI）"""
+    try:
+        result = await book_service.search_library(q, limit=limit, offset=offset)
+        return create_success_response(
+            data=result,
+            message="Library search completed successfully"
+        )
+    except ValueError as e:
+        return create_error_response(
+            error=str(e),
+            message="Invalid input"
+        )
+    except Exception as e:
+        log_error(e, "Error searching library")
+        return create_error_response(
+            error="Internal server error",
+            message="Failed to search library"
+        )
+
 @router.post("/book/qa", response_model=APIResponse)
 async def answer_question(
     request: QARequest,
@@ -51,7 +313,9 @@ async def answer_question(
 ):
     """回答书籍相关问题"""
     try:
-        answer = await book_service.answer_book_question(request.book_name, request.question)
+        answer = await book_service.answer_book_question(
+            request.book_name, request.question, hint=request.route_hint
+        )
         
         if answer:
             return create_success_response(
@@ -69,6 +333,8 @@ async def answer_question(
             error=str(e),
             message="Invalid input"
         )
+    except CircuitOpenError as e:
+        return _upstream_unavailable_response(str(e), e.retry_after)
     except Exception as e:
         log_error(e, "Error answering question")
         return create_error_response(
@@ -76,26 +342,164 @@ async def answer_question(
             message="Failed to answer question"
         )
 
+@router.post("/book/text", response_model=APIResponse)
+async def upload_book_text(
+    book_name: str = Form(...),
+    file: UploadFile = File(...),
+    book_text_service: BookTextService = Depends(get_book_text_service)
+):
+    """上传书籍全文（TXT或EPUB），之后关于这本书的问答会引用原文片段"""
+    try:
+        # 书名校验、分块存储与建索引在线程中进行，不阻塞事件循环
+        meta = await asyncio.to_thread(book_text_service.ingest, book_name, file.file, file.filename or "")
+        return create_success_response(
+            data=meta.dict(),
+            message="Book text uploaded successfully"
+        )
+    except BookTextTooLargeError as e:
+        return create_error_response(
+            error=str(e),
+            message="File too large"
+        )
+    except ValueError as e:
+        return create_error_response(
+            error=str(e),
+            message="Invalid input"
+        )
+    except Exception as e:
+        log_error(e, "Error uploading book text")
+        return create_error_response(
+            error="Internal server error",
+            message="Failed to upload book text"
+        )
+    finally:
+        await file.close()
+
+@router.get("/book/text", response_model=APIResponse)
+async def get_book_text(
+    book_name: str,
+    book_text_service: BookTextService = Depends(get_book_text_service)
+):
+    """查询一本书是否已上传全文"""
+    meta = await asyncio.to_thread(book_text_service.get_meta, book_name)
+    if meta is None:
+        return create_error_response(
+            error="Book text not found",
+            message="No text uploaded for this book"
+        )
+    return create_success_response(
+        data=meta.dict(),
+        message="Book text retrieved successfully"
+    )
+
+@router.delete("/book/text", response_model=APIResponse)
+async def delete_book_text(
+    book_name: str,
+    book_text_service: BookTextService = Depends(get_book_text_service)
+):
+    """删除已上传的书籍全文"""
+    deleted = await asyncio.to_thread(book_text_service.delete, book_name)
+    if not deleted:
+        return create_error_response(
+            error="Book text not found",
+            message="No text uploaded for this book"
+        )
+    return create_success_response(
+        data={"book_name": book_name},
+        message="Book text deleted successfully"
+    )
+
+@router.get("/prompts/presets", response_model=APIResponse)
+async def list_preset_prompts():
+    """列出客户端的推荐问题（kind 为 report 的一项对应详细报告）"""
+    return create_success_response(
+        data={"presets": [preset.dict() for preset in PRESET_PROMPTS]},
+        message="Preset prompts retrieved successfully"
+    )
+
+@router.post("/book/presets", response_model=APIResponse)
+async def get_preset_answers(
+    request: BookInfoRequest,
+    book_service: BookService = Depends(get_book_service)
+):
+    """获取一本书全部推荐问题的回答（未缓存的先生成）"""
+    try:
+        result = await book_service.precompute_preset_answers(request.book_name)
+        return create_success_response(
+            data=result,
+            message="Preset answers retrieved successfully"
+        )
+    except ValueError as e:
+        return create_error_response(
+            error=str(e),
+            message="Invalid input"
+        )
+    except Exception as e:
+        log_error(e, "Error getting preset answers")
+        return create_error_response(
+            error="Internal server error",
+            message="Failed to get preset answers"
+        )
+
+def _report_payload(report: str) -> Dict[str, Any]:
+    """详细报告接口的响应内容"""
+    return create_success_response(
+        data={"report": report},
+        message="Detailed book report generated successfully"
+    )
+
+def _stale_report_payload(report: str) -> Dict[str, Any]:
+    """上游熔断时返回的过期报告"""
+    return create_success_response(
+        data={"report": report, "stale": True},
+        message="AI service is temporarily unavailable, returning a previously generated report"
+    )
+
 @router.post("/chat/generate_report", response_model=APIResponse)
 async def generate_detailed_report(
     request: GenerateReportRequest,
-    book_service: BookService = Depends(get_book_service)
+    http_request: Request,
+    book_service: BookService = Depends(get_book_service),
+    job_service: ReportJobService = Depends(get_report_job_service),
+    prefetch_service: Optional[ReportPrefetchService] = Depends(get_prefetch_service)
 ):
-    """生成详细的书籍报告"""
+    """生成详细的书籍报告（同步等待，相同书籍的并发请求共享同一个任务）"""
     try:
-        report = await book_service.generate_detailed_report(request.book_name, request.author)
+        if prefetch_service is not None:
+            prefetch_service.record_request(request.book_name, request.author)
+        entry = book_service.get_report_entry(request.book_name, request.author)
+        if entry is None:
+            job, _ = await job_service.submit(request.book_name, request.author)
+            job = await job_service.wait_for(job.id)
+            report = job.result if job else None
+            
+            if job is not None and job.retry_after is not None:
+                # 任务因上游熔断失败且没有可用的旧报告
+                return _upstream_unavailable_response(job.error, job.retry_after)
+            if not report:
+                return create_error_response(
+                    error="No report generated",
+                    message=(job.error if job and job.error else "Unable to generate detailed report for the book")
+                )
+            
+            entry = book_service.get_report_entry(request.book_name, request.author, allow_expired=True)
+            if entry is None:
+                # 缓存未启用
+                return _report_payload(report)
         
-        if report:
-            return create_success_response(
-                data={"report": report},
-                message="Detailed book report generated successfully"
+        if entry.is_expired:
+            # 上游熔断时任务返回了过期报告
+            return cached_response(entry, _stale_report_payload, artifact_key="stale_response").render(
+                http_request, settings.compression_min_size
             )
-        else:
-            return create_error_response(
-                error="No report generated",
-                message="Unable to generate detailed report for the book"
-            )
-            
+        
+        # 报告的序列化结果与压缩版本保存在缓存条目上，重复请求不再重新编码
+        return cached_response(entry, _report_payload).render(
+            http_request, settings.compression_min_size
+        )
+    
+    except JobQueueFullError as e:
+        return _queue_full_response(e)
     except Exception as e:
         log_error(e, "Error generating detailed report")
         return create_error_response(
@@ -103,32 +507,178 @@ async def generate_detailed_report(
             message=f"Failed to generate detailed report: {str(e)}"
         )
 
-@router.get("/health")
-async def health_check():
-    """健康检查接口"""
+@router.get("/report/sections", response_model=APIResponse)
+async def list_report_sections():
+    """列出报告的章节ID与标题（按报告顺序）"""
+    return create_success_response(
+        data={"sections": [{"id": section.id, "title": section.title} for section in REPORT_SECTIONS]},
+        message="Report sections retrieved successfully"
+    )
+
+@router.post("/report/sections", response_model=APIResponse)
+async def get_report_sections(
+    request: ReportSectionsRequest,
+    book_service: BookService = Depends(get_book_service)
+):
+    """按需生成报告章节，返回 {章节ID: 文本}
+
+    只生成请求的章节，每个章节单独缓存，之后请求其他章节时再补充生成。
+    """
+    try:
+        result = await book_service.get_report_sections(request.book_name, request.author, request.sections)
+        if not result["sections"]:
+            return create_error_response(
+                error="No report sections generated",
+                message="; ".join(f"{section_id}: {error}" for section_id, error in result["failed"].items())
+            )
+        return create_success_response(
+            data={
+                "sections": result["sections"],
+                "failed": list(result["failed"])
+            },
+            message="Report sections generated successfully"
+        )
+    except ValueError as e:
+        return create_error_response(
+            error=str(e),
+            message="Invalid input"
+        )
+    except Exception as e:
+        log_error(e, "Error generating report sections")
+        return create_error_response(
+            error="Internal server error",
+            message="Failed to generate report sections"
+        )
+
+@router.post("/report/sections/stream")
+async def stream_report_sections(
+    request: ReportSectionsRequest,
+    book_service: BookService = Depends(get_book_service)
+):
+    """分章节并发生成详细报告，以NDJSON按完成顺序推送各章节
+
+    每行一个章节（含 index，客户端按其排序拼接），最后一行汇总完成情况。
+    sections 为空时生成全部章节。
+    """
+    async def generate():
+        completed, failed = 0, []
+        try:
+            async for item in book_service.iter_report_sections(
+                request.book_name, request.author, request.sections
+            ):
+                if item["status"] == "failed":
+                    failed.append(item["section_id"])
+                else:
+                    completed += 1
+                yield json.dumps({"type": "section", **item}, ensure_ascii=False) + "\n"
+        except ValueError as e:
+            yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+            return
+        except Exception as e:
+            log_error(e, "Error streaming report sections")
+            yield json.dumps({"type": "error", "error": "Internal server error"}, ensure_ascii=False) + "\n"
+            return
+        yield json.dumps({"type": "done", "completed": completed, "failed": failed}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.post("/report/jobs", response_model=APIResponse)
+async def submit_report_job(
+    request: GenerateReportRequest,
+    job_service: ReportJobService = Depends(get_report_job_service),
+    prefetch_service: Optional[ReportPrefetchService] = Depends(get_prefetch_service)
+):
+    """提交详细报告生成任务，立即返回任务ID"""
     try:
-        # 检查Gemini服务是否正常
-        gemini_service = GeminiService()
+        if prefetch_service is not None:
+            prefetch_service.record_request(request.book_name, request.author)
+        job, created = await job_service.submit(request.book_name, request.author)
         return create_success_response(
             data={
-                "status": "healthy",
-                "service": "AI Book Assistant Backend",
-                "gemini_model": gemini_service.model_name
+                "job_id": job.id,
+                "status": job.status.value,
+                "deduplicated": not created
             },
-            message="Service is running normally"
+            message="Report job submitted successfully"
         )
+    except ValueError as e:
+        return create_error_response(
+            error=str(e),
+            message="Invalid input"
+        )
+    except JobQueueFullError as e:
+        return _queue_full_response(e)
     except Exception as e:
-        log_error(e, "Health check failed")
+        log_error(e, "Error submitting report job")
+        return create_error_response(
+            error="Internal server error",
+            message="Failed to submit report job"
+        )
+
+# 已结束任务的序列化响应（结束后内容不再变化）
+_finished_job_responses = TTLCache(ttl=600, max_size=1000)
+
+@router.get("/report/jobs/{job_id}", response_model=APIResponse)
+async def get_report_job(
+    job_id: str,
+    http_request: Request,
+    job_service: ReportJobService = Depends(get_report_job_service)
+):
+    """查询报告任务状态与结果（支持If-None-Match，结果较大时压缩）"""
+    prepared = _finished_job_responses.get(job_id)
+    if prepared is None:
+        job = job_service.get_job(job_id)
+        if job is None:
+            return create_error_response(
+                error="Job not found",
+                message=f"Report job {job_id} does not exist"
+            )
+        prepared = prepare_json_response(create_success_response(
+            data=json.loads(job.json()),
+            message="Report job retrieved successfully"
+        ))
+        if job.is_finished:
+            _finished_job_responses[job_id] = prepared
+    
+    return prepared.render(http_request, settings.compression_min_size)
+
+@router.get("/report/jobs/{job_id}/stream")
+async def stream_report_job(
+    job_id: str,
+    job_service: ReportJobService = Depends(get_report_job_service)
+):
+    """以NDJSON流式推送报告任务的状态变化，任务结束时包含结果"""
+    if job_service.get_job(job_id) is None:
         return create_error_response(
-            error="Service unhealthy",
-            message="Health check failed"
+            error="Job not found",
+            message=f"Report job {job_id} does not exist"
         )
+    
+    async def generate():
+        async for job in job_service.watch(job_id):
+            yield job.json() + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/health")
+async def health_check():
+    """健康检查接口：返回后台最近一次检查的结果，不在请求中调用上游"""
+    status_code, prepared = get_health_service().readiness()
+    return prepared.to_response(status_code)
 
 @router.get("/cache/stats")
-async def get_cache_stats(book_service: BookService = Depends(get_book_service)):
+async def get_cache_stats(
+    book_service: BookService = Depends(get_book_service),
+    prefetch_service: Optional[ReportPrefetchService] = Depends(get_prefetch_service)
+):
     """获取缓存统计信息"""
     try:
         stats = book_service.get_cache_stats()
+        if prefetch_service is not None:
+            stats["report_prefetch"] = prefetch_service.get_stats()
+        stats["model_routing"] = book_service.gemini_service.router.snapshot()
+        if book_service.answer_index is not None:
+            stats["answer_index"] = book_service.answer_index.get_stats()
         return create_success_response(
             data=stats,
             message="Cache statistics retrieved successfully"
@@ -167,6 +717,7 @@ class ChatRequest(BaseModel):
     book_name: str
     messages: List[ChatMessage]
     question: str
+    route_hint: Optional[str] = None  # 模型偏好：fast、balanced 或 quality
 
 @router.post("/chat/ask", response_model=APIResponse)
 async def chat_with_history(
@@ -175,6 +726,16 @@ async def chat_with_history(
 ):
     """带历史对话的无状态问答"""
     try:
+        # 推荐问题与对话历史无关，直接使用预先生成的回答
+        preset = match_preset(request.question)
+        if preset is not None and preset.kind == "qa":
+            answer = await book_service.answer_preset_question(request.book_name, preset)
+            if answer:
+                return create_success_response(
+                    data={"answer": answer},
+                    message="Question answered successfully"
+                )
+        
         # 构建对话上下文
         context_parts = []
         for msg in request.messages:
@@ -189,7 +750,8 @@ async def chat_with_history(
         answer = await book_service.answer_book_question_with_context(
             request.book_name, 
             request.question, 
-            context
+            context,
+            hint=request.route_hint
         )
         
         if answer:
@@ -202,6 +764,13 @@ async def chat_with_history(
                 error="No answer generated",
                 message="Unable to generate answer for the question"
             )
+    except ValueError as e:
+        return create_error_response(
+            error=str(e),
+            message="Invalid input"
+        )
+    except CircuitOpenError as e:
+        return _upstream_unavailable_response(str(e), e.retry_after)
     except Exception as e:
         log_error(e, "Error in chat with history")
         return create_error_response(
@@ -15,6 +15,7 @@ class QARequest(BaseModel):
     """问答请求数据模型"""
     book_name: str = Field(..., description="书籍名称")
     question: str = Field(..., description="用户问题")
+    route_hint: Optional[str] = Field(None, description="模型偏好：fast、balanced 或 quality")
 
 class QAResponse(BaseModel):
     """问答响应数据模型"""
@@ -24,6 +25,10 @@ class BookInfoRequest(BaseModel):
     """书籍信息请求数据模型"""
     book_name: str = Field(..., description="书籍名称")
 
+class BookInfoBatchRequest(BaseModel):
+    """批量书籍信息请求数据模型"""
+    book_names: List[str] = Field(..., description="书籍名称列表")
+
 class APIResponse(BaseModel):
     """通用API响应模型"""
     success: bool = Field(..., description="请求是否成功")
@@ -36,6 +41,12 @@ class GenerateReportRequest(BaseModel):
     book_name: str = Field(..., description="书籍名称")
     author: Optional[str] = Field(None, description="作者名称")
 
+class ReportSectionsRequest(BaseModel):
+    """按章节生成报告请求数据模型"""
+    book_name: str = Field(..., description="书籍名称")
+    author: Optional[str] = Field(None, description="作者名称")
+    sections: Optional[List[str]] = Field(None, description="需要的章节ID列表，为空表示全部章节")
+
 class GenerateReportResponse(BaseModel):
     """生成详细报告响应数据模型"""
     report: str = Field(..., description="生成的详细书籍报告")
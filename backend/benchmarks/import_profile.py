@@ -0,0 +1,96 @@
+"""
+导入耗时分析
+在独立的子进程中导入应用入口（默认 main），统计冷启动的导入耗时，
+并基于 python -X importtime 列出耗时最多的模块。
+
+用法：
+    python benchmarks/import_profile.py
+    python benchmarks/import_profile.py --module main --runs 5 --top 30 --warmup
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+from typing import List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_import(module: str, cwd: str, importtime: bool = False) -> Tuple[float, str]:
+    """在子进程中导入模块，返回 (耗时秒数, stderr)"""
+    code = (
+        "import time, sys\n"
+        f"sys.path.insert(0, {BACKEND_DIR!r})\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", code]
+
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "import-profile")
+    result = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+def parse_importtime(stderr: str) -> List[Tuple[int, int, str]]:
+    """解析 -X importtime 输出，返回 [(自身微秒, 累计微秒, 模块名)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+def measure_warmup(cwd: str) -> float:
+    """在子进程中测量GeminiService预热（导入SDK并创建客户端）的耗时"""
+    code = (
+        "import time, sys\n"
+        f"sys.path.insert(0, {BACKEND_DIR!r})\n"
+        "from services.gemini_service import GeminiService\n"
+        "service = GeminiService()\n"
+        "start = time.perf_counter()\n"
+        "service.warm_up()\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "import-profile")
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="分析应用的导入耗时")
+    parser.add_argument("--module", default="main", help="要导入的模块")
+    parser.add_argument("--runs", type=int, default=5, help="测量次数")
+    parser.add_argument("--top", type=int, default=25, help="列出耗时最多的模块数")
+    parser.add_argument("--warmup", action="store_true", help="同时测量Gemini客户端预热耗时")
+    args = parser.parse_args()
+
+    # 在临时目录中运行，避免导入时产生的日志文件写入仓库
+    with tempfile.TemporaryDirectory() as cwd:
+        timings = [run_import(args.module, cwd)[0] for _ in range(args.runs)]
+        _, stderr = run_import(args.module, cwd, importtime=True)
+        warmup = measure_warmup(cwd) if args.warmup else None
+
+    print(f"import {args.module}: median {statistics.median(timings) * 1000:.1f} ms, "
+          f"min {min(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms ({args.runs} runs)")
+    if warmup is not None:
+        print(f"GeminiService.warm_up: {warmup * 1000:.1f} ms")
+
+    rows = parse_importtime(stderr)
+    print()
+    print(f"{'cumulative ms':>14}  {'self ms':>9}  module")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f}  {self_us / 1000:9.1f}  {name}")
+
+if __name__ == "__main__":
+    main()
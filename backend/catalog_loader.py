@@ -0,0 +1,63 @@
+"""
+本地书目库导入工具
+把批量书目数据导入 CATALOG_PATH 指定的SQLite书目库，服务查询书籍信息时优先使用其中的事实信息
+
+用法：
+    python catalog_loader.py load books.jsonl
+    python catalog_loader.py load ol_dump_editions_latest.txt.gz --catalog data/catalog.db
+    python catalog_loader.py lookup 9787536692930
+    python catalog_loader.py search 三体
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import settings
+from utils.catalog import BookCatalog, iter_dump_records
+
+logger = logging.getLogger("catalog_loader")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="导入与查询本地书目库")
+    parser.add_argument("--catalog", default=settings.catalog_path or "data/catalog.db", help="书目库文件路径")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    load = subparsers.add_parser("load", help="导入书目数据（JSON Lines、CSV/TSV 或 Open Library 数据转储，可为.gz）")
+    load.add_argument("files", nargs="+", help="书目数据文件")
+    load.add_argument("--batch-size", type=int, default=5000, help="每个事务写入的条数")
+
+    lookup = subparsers.add_parser("lookup", help="按ISBN或书名精确查询")
+    lookup.add_argument("query")
+
+    search = subparsers.add_parser("search", help="按书名、作者全文检索")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=10)
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    catalog = BookCatalog(args.catalog)
+
+    if args.command == "load":
+        for path in args.files:
+            started = time.time()
+            loaded = catalog.load(iter_dump_records(path), batch_size=args.batch_size)
+            logger.info(f"Loaded {loaded} records from {path} in {time.time() - started:.1f}s")
+        logger.info(f"Catalog {args.catalog} now has {catalog.count()} books")
+    elif args.command == "lookup":
+        record = catalog.lookup(args.query)
+        print(json.dumps(record, ensure_ascii=False, indent=2) if record else "Not found")
+    else:
+        for record in catalog.search(args.query, limit=args.limit):
+            print(json.dumps(record, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -14,10 +14,37 @@ class Settings(BaseSettings):
     # 服务器配置
     host: str = Field(default="0.0.0.0", env="HOST")
     port: int = Field(default=8000, env="PORT")
+    workers: int = Field(default=0, env="WORKERS")  # 生产模式的worker进程数，0表示CPU核数
+    shutdown_grace_period: int = Field(default=120, env="SHUTDOWN_GRACE_PERIOD")  # 停止时等待进行中请求的秒数
     
     # Google API配置
     google_api_key: Optional[str] = Field(default=None, env="GOOGLE_API_KEY")
     gemini_model: str = Field(default="gemini-2.0-flash", env="GEMINI_MODEL")
+    upstream_concurrency: int = Field(default=8, env="UPSTREAM_CONCURRENCY")  # 每个worker同时调用Gemini的上限
+    # 启动后在后台导入Gemini SDK并创建客户端；关闭则推迟到第一次请求
+    startup_warmup: bool = Field(default=True, env="STARTUP_WARMUP")
+
+    # 模型路由配置：问答按问题长度、上下文与客户端偏好选择模型
+    routing_enabled: bool = Field(default=True, env="ROUTING_ENABLED")
+    route_fast_model: str = Field(default="gemini-2.0-flash", env="ROUTE_FAST_MODEL")  # 简短问题与 fast 偏好使用的模型
+    route_quality_model: str = Field(default="gemini-2.5-pro", env="ROUTE_QUALITY_MODEL")  # quality 偏好使用的模型
+    route_short_question_chars: int = Field(default=40, env="ROUTE_SHORT_QUESTION_CHARS")  # 不超过该字数且无上下文的问题视为简短问题
+    route_fast_max_tokens: int = Field(default=1024, env="ROUTE_FAST_MAX_TOKENS")
+
+    # 健康检查配置（探针只读取后台刷新的结果）
+    health_check_interval: float = Field(default=5.0, env="HEALTH_CHECK_INTERVAL")  # 本地检查的刷新间隔秒数
+    upstream_probe_interval: float = Field(default=60.0, env="UPSTREAM_PROBE_INTERVAL")  # Gemini探测间隔秒数
+    upstream_probe_timeout: float = Field(default=10.0, env="UPSTREAM_PROBE_TIMEOUT")
+    ready_max_upstream_waiting: int = Field(default=50, env="READY_MAX_UPSTREAM_WAITING")  # 等待调用Gemini的请求超过该值时视为未就绪
+
+    # 熔断配置（按 模型:操作 分别统计）
+    circuit_failure_rate: float = Field(default=0.5, env="CIRCUIT_FAILURE_RATE")  # 窗口内失败率达到该值时熔断
+    circuit_min_calls: int = Field(default=5, env="CIRCUIT_MIN_CALLS")  # 窗口内至少多少次调用才计算失败率
+    circuit_window_seconds: float = Field(default=60.0, env="CIRCUIT_WINDOW_SECONDS")
+    circuit_slow_call_seconds: float = Field(default=60.0, env="CIRCUIT_SLOW_CALL_SECONDS")  # 超过该耗时的调用计为失败
+    circuit_report_slow_call_seconds: float = Field(default=240.0, env="CIRCUIT_REPORT_SLOW_CALL_SECONDS")
+    circuit_open_seconds: float = Field(default=30.0, env="CIRCUIT_OPEN_SECONDS")  # 熔断后多久放行试探调用
+    circuit_half_open_calls: int = Field(default=1, env="CIRCUIT_HALF_OPEN_CALLS")
     
     # 日志配置
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
@@ -32,7 +59,63 @@ class Settings(BaseSettings):
     # 缓存配置
     cache_enabled: bool = Field(default=True, env="CACHE_ENABLED")
     cache_ttl: int = Field(default=3600, env="CACHE_TTL")  # 1小时
-    
+    cache_stale_ttl: int = Field(default=86400, env="CACHE_STALE_TTL")  # 书籍信息过期后仍可先返回旧值并后台刷新的秒数，0表示关闭
+    cache_refresh_ahead: float = Field(default=0.1, env="CACHE_REFRESH_AHEAD")  # 热门条目在剩余有效期低于TTL的该比例时提前刷新
+    cache_hot_hits: int = Field(default=3, env="CACHE_HOT_HITS")  # 命中次数达到该值视为热门条目
+    shared_cache_path: Optional[str] = Field(default=None, env="SHARED_CACHE_PATH")  # 多worker共享的SQLite缓存文件，为空表示不启用
+    shared_cache_claim_timeout: int = Field(default=300, env="SHARED_CACHE_CLAIM_TIMEOUT")  # 认领生成的最长秒数
+    shared_cache_busy_timeout: float = Field(default=0.1, env="SHARED_CACHE_BUSY_TIMEOUT")  # 等待共享缓存写锁的最长秒数，超时按未命中处理
+    preset_answer_ttl: int = Field(default=604800, env="PRESET_ANSWER_TTL")  # 推荐问题回答的缓存秒数（7天）
+    preset_precompute_on_lookup: bool = Field(default=False, env="PRESET_PRECOMPUTE_ON_LOOKUP")  # 查到书籍后在后台预生成推荐问题的回答
+
+    # 响应压缩配置
+    compression_min_size: int = Field(default=1024, env="COMPRESSION_MIN_SIZE")  # 超过该字节数的响应才压缩
+
+    # 批量查询配置
+    batch_max_titles: int = Field(default=500, env="BATCH_MAX_TITLES")
+    batch_concurrency: int = Field(default=8, env="BATCH_CONCURRENCY")  # 同时向Gemini发起的请求数
+
+    # 报告任务队列配置
+    report_job_workers: int = Field(default=2, env="REPORT_JOB_WORKERS")
+    report_job_queue_size: int = Field(default=100, env="REPORT_JOB_QUEUE_SIZE")
+    report_job_dir: str = Field(default="data/report_jobs", env="REPORT_JOB_DIR")
+    report_job_retention: int = Field(default=86400, env="REPORT_JOB_RETENTION")  # 已完成任务保留秒数
+
+    # 详细报告生成方式：single 整篇一次生成；sectioned 各章节并发生成后拼接
+    report_mode: str = Field(default="single", env="REPORT_MODE")
+
+    # 详细报告预取：查到书籍后在上游空闲时以低优先级提前生成报告
+    report_prefetch_enabled: bool = Field(default=False, env="REPORT_PREFETCH_ENABLED")
+    report_prefetch_daily_budget: int = Field(default=100, env="REPORT_PREFETCH_DAILY_BUDGET")  # 每个worker进程每天最多预取的报告数
+    report_prefetch_idle_ratio: float = Field(default=0.5, env="REPORT_PREFETCH_IDLE_RATIO")  # 进行中的上游调用低于并发上限的该比例时才预取
+
+    # 书籍全文配置：上传TXT/EPUB后问答时检索原文片段
+    book_text_dir: str = Field(default="data/book_texts", env="BOOK_TEXT_DIR")
+    book_text_max_bytes: int = Field(default=20 * 1024 * 1024, env="BOOK_TEXT_MAX_BYTES")  # 上传文件大小上限（EPUB同时限制解压后的大小）
+    book_text_chunk_chars: int = Field(default=800, env="BOOK_TEXT_CHUNK_CHARS")  # 每个分块的字符数
+    book_text_top_k: int = Field(default=5, env="BOOK_TEXT_TOP_K")  # 每个问题放入提示词的片段数
+    book_text_max_context_chars: int = Field(default=4000, env="BOOK_TEXT_MAX_CONTEXT_CHARS")  # 放入提示词的片段总字符数上限
+
+    # 本地书目库（由 catalog_loader.py 导入），为空表示不启用
+    catalog_path: Optional[str] = Field(default=None, env="CATALOG_PATH")
+
+    # 语义索引配置：复用已生成的报告与回答（需要numpy）
+    answer_index_enabled: bool = Field(default=False, env="ANSWER_INDEX_ENABLED")
+    answer_index_dir: str = Field(default="data/answer_index", env="ANSWER_INDEX_DIR")
+    answer_index_top_k: int = Field(default=3, env="ANSWER_INDEX_TOP_K")  # 每个问题作为参考的片段数
+    answer_index_min_similarity: float = Field(default=0.05, env="ANSWER_INDEX_MIN_SIMILARITY")  # 参考片段的最低相似度
+    answer_index_direct_similarity: float = Field(default=0.92, env="ANSWER_INDEX_DIRECT_SIMILARITY")  # 与历史问题的相似度达到该值时直接返回历史回答
+
+    # 缓存预热配置
+    prewarm_on_startup: bool = Field(default=False, env="PREWARM_ON_STARTUP")
+    prewarm_titles_file: Optional[str] = Field(default=None, env="PREWARM_TITLES_FILE")  # 未设置时从对话日志统计
+    prewarm_limit: int = Field(default=200, env="PREWARM_LIMIT")
+    prewarm_interval: float = Field(default=2.0, env="PREWARM_INTERVAL")  # 每次调用间隔秒数
+    prewarm_off_peak_hours: str = Field(default="", env="PREWARM_OFF_PEAK_HOURS")  # 如 "1-6"，为空表示不限
+    prewarm_include_reports: bool = Field(default=True, env="PREWARM_INCLUDE_REPORTS")
+    prewarm_questions_per_book: int = Field(default=3, env="PREWARM_QUESTIONS_PER_BOOK")
+    prewarm_include_presets: bool = Field(default=False, env="PREWARM_INCLUDE_PRESETS")  # 同时预生成推荐问题的回答
+
     # API限制配置
     rate_limit_enabled: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
     rate_limit_requests: int = Field(default=100, env="RATE_LIMIT_REQUESTS")
@@ -69,7 +152,48 @@ class Settings(BaseSettings):
         
         if self.rate_limit_requests <= 0:
             errors.append("RATE_LIMIT_REQUESTS must be positive")
-        
+
+        if self.batch_max_titles <= 0:
+            errors.append("BATCH_MAX_TITLES must be positive")
+
+        if self.batch_concurrency <= 0:
+            errors.append("BATCH_CONCURRENCY must be positive")
+
+        if self.workers < 0:
+            errors.append("WORKERS must not be negative")
+
+        for name, model in (("ROUTE_FAST_MODEL", self.route_fast_model),
+                            ("ROUTE_QUALITY_MODEL", self.route_quality_model)):
+            if model not in self.gemini_model_options.values():
+                errors.append(f"Invalid {name}: {model}")
+
+        if self.upstream_concurrency <= 0:
+            errors.append("UPSTREAM_CONCURRENCY must be positive")
+
+        if self.report_job_workers <= 0:
+            errors.append("REPORT_JOB_WORKERS must be positive")
+
+        if self.report_mode not in ("single", "sectioned"):
+            errors.append("REPORT_MODE must be 'single' or 'sectioned'")
+
+        if self.report_prefetch_daily_budget < 0:
+            errors.append("REPORT_PREFETCH_DAILY_BUDGET must not be negative")
+
+        if not (0 < self.report_prefetch_idle_ratio <= 1):
+            errors.append("REPORT_PREFETCH_IDLE_RATIO must be between 0 and 1")
+
+        if self.book_text_max_bytes <= 0:
+            errors.append("BOOK_TEXT_MAX_BYTES must be positive")
+
+        if self.book_text_top_k <= 0:
+            errors.append("BOOK_TEXT_TOP_K must be positive")
+
+        if not (0 <= self.answer_index_min_similarity <= self.answer_index_direct_similarity <= 1):
+            errors.append("ANSWER_INDEX_MIN_SIMILARITY and ANSWER_INDEX_DIRECT_SIMILARITY must satisfy 0 <= min <= direct <= 1")
+
+        if not (0 < self.circuit_failure_rate <= 1):
+            errors.append("CIRCUIT_FAILURE_RATE must be between 0 and 1")
+
         return errors
 
 # 全局配置实例
@@ -8,6 +8,7 @@ import sys
 import os
 import uvicorn
 import time
+import asyncio
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -18,7 +19,11 @@ from contextlib import asynccontextmanager
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config.settings import settings
-from api.routes import router
+from api.routes import router, get_book_service, get_report_job_service, get_health_service
+from services.health_service import HealthService, storage_check
+from services.prewarm_service import (
+    PrewarmService, load_targets_from_file, load_targets_from_logs, parse_off_peak_hours
+)
 from utils.helpers import log_error
 
 # 配置日志
@@ -48,10 +53,119 @@ async def lifespan(app: FastAPI):
                 logger.error(f"  - {error}")
             raise ValueError("Invalid configuration")
     
+    # 启动报告任务队列（恢复上次未完成的任务）
+    report_job_service = None
+    try:
+        report_job_service = get_report_job_service()
+        await report_job_service.start()
+    except Exception as e:
+        log_error(e, "Failed to start report job service")
+    
+    # 后台导入SDK并创建客户端，完成前 /ready 返回503
+    warmup_task = None
+    if settings.startup_warmup:
+        startup_state["ready"] = False
+        warmup_task = asyncio.create_task(warm_up_services())
+    
+    # 后台预热缓存
+    prewarm_task = None
+    if settings.prewarm_on_startup:
+        prewarm_task = asyncio.create_task(run_prewarm())
+    
+    # 注册健康检查并在后台定期刷新
+    health_service = get_health_service()
+    register_health_checks(health_service, report_job_service)
+    await health_service.start()
+    
     yield
     
     # 关闭时执行
     logger.info(f"Shutting down {settings.app_name}")
+    await health_service.stop()
+    if warmup_task is not None:
+        warmup_task.cancel()
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+    if report_job_service is not None:
+        # 让进行中的报告生成在期限内完成
+        await report_job_service.stop(timeout=settings.shutdown_grace_period)
+
+# 启动状态；未开启后台预热时视为就绪，SDK在第一次请求时初始化
+startup_state = {"ready": True, "warmup_error": None}
+
+async def warm_up_services():
+    """在后台线程中导入Gemini SDK并创建客户端"""
+    start_time = time.time()
+    try:
+        await asyncio.to_thread(get_book_service().gemini_service.warm_up)
+        logger.info(f"Gemini client warmed up in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        startup_state["warmup_error"] = str(e)
+        log_error(e, "Gemini client warm-up failed")
+    finally:
+        # 预热失败时仍标记就绪，由第一次请求重试初始化
+        startup_state["ready"] = True
+
+def register_health_checks(health_service: HealthService, report_job_service=None):
+    """注册就绪检查项"""
+    interval = settings.health_check_interval
+    
+    def startup_check():
+        return startup_state["ready"], {"warmup_error": startup_state["warmup_error"]}
+    
+    def upstream_queue_check():
+        gemini_service = get_book_service().gemini_service
+        detail = {
+            "inflight": gemini_service.inflight,
+            "waiting": gemini_service.waiting,
+            "max_concurrency": gemini_service.max_concurrency,
+        }
+        return gemini_service.waiting < settings.ready_max_upstream_waiting, detail
+    
+    def report_queue_check():
+        stats = report_job_service.get_stats()
+        ok = report_job_service.is_running and stats["queued"] < report_job_service.max_queue_size
+        return ok, stats
+    
+    def circuit_check():
+        breakers = get_book_service().gemini_service.breakers
+        open_circuits = breakers.open_circuits()
+        return not open_circuits, {"open": sorted(open_circuits), "circuits": breakers.snapshot()}
+    
+    async def upstream_probe():
+        return True, await get_book_service().gemini_service.probe(timeout=settings.upstream_probe_timeout)
+    
+    health_service.register("startup", startup_check, interval=1.0)
+    health_service.register("upstream_queue", upstream_queue_check, interval=interval)
+    if report_job_service is not None:
+        health_service.register("report_queue", report_queue_check, interval=interval)
+    health_service.register("storage", storage_check(settings.report_job_dir), interval=interval)
+    # 上游不可用时仍可提供缓存内容，因此只标记为degraded，不摘除实例
+    health_service.register("circuit_breakers", circuit_check, interval=interval, critical=False)
+    health_service.register("upstream", upstream_probe, interval=settings.upstream_probe_interval,
+                            timeout=settings.upstream_probe_timeout + 1, critical=False)
+
+async def run_prewarm():
+    """按配置预热缓存"""
+    try:
+        if settings.prewarm_titles_file:
+            targets = load_targets_from_file(settings.prewarm_titles_file)[:settings.prewarm_limit]
+        else:
+            targets = load_targets_from_logs(limit=settings.prewarm_limit)
+        
+        prewarm_service = PrewarmService(
+            get_book_service(),
+            interval=settings.prewarm_interval,
+            off_peak_hours=parse_off_peak_hours(settings.prewarm_off_peak_hours),
+            include_reports=settings.prewarm_include_reports,
+            questions_per_book=settings.prewarm_questions_per_book,
+            include_presets=settings.prewarm_include_presets
+        )
+        await prewarm_service.run(targets)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log_error(e, "Cache prewarm failed")
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -126,19 +240,18 @@ async def root():
         "message": "AI Book Assistant Backend is running"
     }
 
-# 健康检查
+# 存活检查
 @app.get("/health")
 async def health_check():
-    """健康检查"""
-    return {
-        "success": True,
-        "data": {
-            "status": "healthy",
-            "service": settings.app_name,
-            "version": settings.app_version
-        },
-        "message": "Service is healthy"
-    }
+    """存活检查：进程能响应即为存活，返回预先生成的响应"""
+    return get_health_service().liveness().to_response()
+
+# 就绪检查
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查：返回后台最近一次检查的结果，未通过时返回503"""
+    status_code, prepared = get_health_service().readiness()
+    return prepared.to_response(status_code)
 
 # 开发信息
 if settings.debug:
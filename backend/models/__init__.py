@@ -1,6 +1,7 @@
 # Backend models package
 
 from .chat import ChatSession, ChatMessage, MessageType, SessionCreateRequest, SessionUpdateRequest, MessageHistoryRequest, QARequestWithSession
+from .job import JobStatus, ReportJob
 
 __all__ = [
     'ChatSession',
@@ -9,5 +10,7 @@ __all__ = [
     'SessionCreateRequest',
     'SessionUpdateRequest',
     'MessageHistoryRequest',
-    'QARequestWithSession'
+    'QARequestWithSession',
+    'JobStatus',
+    'ReportJob'
 ]
\ No newline at end of file
@@ -0,0 +1,18 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+class BookTextMeta(BaseModel):
+    """已上传的书籍全文"""
+    book_name: str = Field(..., description="书籍名称")
+    filename: str = Field(..., description="上传的文件名")
+    format: str = Field(..., description="文件格式：txt 或 epub")
+    chunks: int = Field(..., description="分块数")
+    characters: int = Field(..., description="总字符数")
+    version: str = Field(..., description="版本号，重新上传后变化")
+    created_at: datetime = Field(default_factory=datetime.now, description="上传时间")
+
+class Passage(BaseModel):
+    """检索到的原文片段"""
+    chunk_id: int = Field(..., description="分块序号")
+    text: str = Field(..., description="片段内容")
+    score: float = Field(..., description="相关度得分")
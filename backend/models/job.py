@@ -0,0 +1,31 @@
+from typing import Optional
+from datetime import datetime
+from enum import Enum
+from pydantic import BaseModel, Field
+
+class JobStatus(str, Enum):
+    """任务状态枚举"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class ReportJob(BaseModel):
+    """详细报告生成任务"""
+    id: str = Field(..., description="任务ID")
+    book_name: str = Field(..., description="书籍名称")
+    author: Optional[str] = Field(None, description="作者名称")
+    priority: int = Field(0, description="优先级，数值越小越先执行")
+    speculative: bool = Field(False, description="是否为预取任务（用户尚未请求）")
+    status: JobStatus = Field(JobStatus.PENDING, description="任务状态")
+    result: Optional[str] = Field(None, description="生成的报告")
+    error: Optional[str] = Field(None, description="错误信息")
+    retry_after: Optional[float] = Field(None, description="因上游熔断失败时，熔断剩余的秒数")
+    created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
+    started_at: Optional[datetime] = Field(None, description="开始时间")
+    finished_at: Optional[datetime] = Field(None, description="完成时间")
+
+    @property
+    def is_finished(self) -> bool:
+        """任务是否已结束"""
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED)
@@ -0,0 +1,116 @@
+"""
+缓存预热工具
+通过HTTP接口让正在运行的服务提前生成热门书籍的信息、报告和常见问题回答
+
+用法：
+    python prewarm.py --from-logs --limit 100
+    python prewarm.py --titles-file titles.txt --server http://localhost:8000 --off-peak 1-6
+    python prewarm.py --titles-file titles.txt --presets --no-reports
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import settings
+from models.book import BookInfo
+from services.prewarm_service import (
+    PrewarmService, load_targets_from_file, load_targets_from_logs, parse_off_peak_hours
+)
+from utils.conversation_logger import LOGS_DIR
+
+logger = logging.getLogger("prewarm")
+
+class HttpBookClient:
+    """通过服务的HTTP接口调用，提供与BookService相同的方法"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def _post(self, path: str, payload: dict) -> Optional[dict]:
+        response = await self.client.post(path, json=payload)
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("success"):
+            raise RuntimeError(result.get("error") or result.get("message"))
+        return result.get("data")
+
+    async def get_book_info(self, book_name: str) -> Optional[BookInfo]:
+        data = await self._post("/api/book/info", {"book_name": book_name})
+        return BookInfo(**data) if data else None
+
+    async def generate_detailed_report(self, book_name: str, author: Optional[str] = None) -> Optional[str]:
+        # 通过任务队列提交，由服务端worker控制并发
+        data = await self._post("/api/report/jobs", {"book_name": book_name, "author": author})
+        return data.get("job_id") if data else None
+
+    async def answer_book_question(self, book_name: str, question: str) -> Optional[str]:
+        data = await self._post("/api/book/qa", {"book_name": book_name, "question": question})
+        return data.get("answer") if data else None
+
+    async def precompute_preset_answers(self, book_name: str) -> Optional[dict]:
+        return await self._post("/api/book/presets", {"book_name": book_name})
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="预热AI读书助手的缓存")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--titles-file", help="书名列表文件，每行一本")
+    source.add_argument("--from-logs", action="store_true", help="从对话日志统计热门书籍（默认）")
+    parser.add_argument("--logs-dir", default=LOGS_DIR, help="对话日志目录")
+    parser.add_argument("--limit", type=int, default=settings.prewarm_limit, help="最多预热的书籍数")
+    parser.add_argument("--server", default=f"http://localhost:{settings.port}", help="服务地址")
+    parser.add_argument("--interval", type=float, default=settings.prewarm_interval, help="每次调用间隔秒数")
+    parser.add_argument("--off-peak", default=settings.prewarm_off_peak_hours,
+                        help="仅在该时段内运行，如 1-6")
+    parser.add_argument("--questions", type=int, default=settings.prewarm_questions_per_book,
+                        help="每本书预热的常见问题数")
+    parser.add_argument("--no-reports", action="store_true", help="不预热详细报告")
+    parser.add_argument("--presets", action="store_true", default=settings.prewarm_include_presets,
+                        help="同时预生成推荐问题的回答")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将要预热的书籍")
+    return parser.parse_args()
+
+async def run(args) -> int:
+    if args.titles_file:
+        targets = load_targets_from_file(args.titles_file)[:args.limit]
+    else:
+        targets = load_targets_from_logs(args.logs_dir, limit=args.limit)
+
+    if not targets:
+        logger.warning("No books to prewarm")
+        return 1
+
+    if args.dry_run:
+        for target in targets:
+            print(f"{target.weight:6d}  {target.title}  {target.questions[:args.questions]}")
+        return 0
+
+    async with httpx.AsyncClient(base_url=args.server, timeout=300) as client:
+        prewarm_service = PrewarmService(
+            HttpBookClient(client),
+            interval=args.interval,
+            off_peak_hours=parse_off_peak_hours(args.off_peak),
+            include_reports=not args.no_reports,
+            questions_per_book=args.questions,
+            include_presets=args.presets
+        )
+        stats = await prewarm_service.run(targets)
+
+    print(stats)
+    return 0
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+生产环境启动入口
+主进程预先导入应用并绑定端口，然后fork出多个worker进程共享同一个监听socket。
+收到SIGTERM/SIGINT时通知所有worker停止接收新请求，进行中的请求与报告生成
+在 SHUTDOWN_GRACE_PERIOD 内完成，超时后强制结束。
+
+用法：
+    python serve.py
+    python serve.py --workers 4 --upstream-concurrency 8 --grace-period 120
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+from typing import Dict
+
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import settings
+
+logger = logging.getLogger("serve")
+
+# worker异常退出后重启前的等待秒数；启动后很快退出时按次数指数增加，不超过 MAX_RESTART_DELAY
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+# 启动后不到该秒数就退出视为启动失败
+FAST_EXIT_SECONDS = 10.0
+# 同一个worker连续启动失败达到该次数时停止所有worker并以非零状态退出
+MAX_FAST_FAILURES = 5
+# worker启动失败（如生命周期初始化出错）时的退出码
+STARTUP_FAILURE_EXIT_CODE = 3
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="以多进程方式启动AI读书助手后端")
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--workers", type=int, default=settings.workers,
+                        help="worker进程数，0表示CPU核数")
+    parser.add_argument("--upstream-concurrency", type=int, default=settings.upstream_concurrency,
+                        help="每个worker同时调用Gemini的上限")
+    parser.add_argument("--grace-period", type=int, default=settings.shutdown_grace_period,
+                        help="停止时等待进行中请求的秒数")
+    return parser.parse_args()
+
+def create_socket(host: str, port: int) -> socket.socket:
+    """在主进程中绑定监听socket，由所有worker继承"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock: socket.socket, grace_period: int) -> bool:
+    """worker进程：在继承的socket上运行uvicorn，返回是否成功启动"""
+    config = uvicorn.Config(
+        app,
+        log_level=settings.log_level.lower(),
+        timeout_graceful_shutdown=grace_period,
+    )
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    return server.started
+
+class Supervisor:
+    """管理worker进程：启动、异常退出后重启、停止时转发信号
+
+    启动后很快退出的worker按指数退避重启；连续启动失败 MAX_FAST_FAILURES 次
+    （多为配置错误，重启无济于事）时停止全部worker，run 返回非零退出码。
+    """
+
+    def __init__(self, app, sock: socket.socket, workers: int, grace_period: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.grace_period = grace_period
+        self.children: Dict[int, int] = {}  # pid -> worker序号
+        self.started_at: Dict[int, float] = {}  # pid -> 启动时间
+        self.fast_failures: Dict[int, int] = {}  # worker序号 -> 连续启动失败次数
+        self.restarts: Dict[int, float] = {}  # worker序号 -> 计划重启的时间
+        self.stopping = False
+        self.exit_code = 0
+
+    def spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            # 子进程恢复默认信号处理，由uvicorn重新安装
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                if not run_worker(self.app, self.sock, self.grace_period):
+                    logger.error(f"Worker {index} failed to start")
+                    exit_code = STARTUP_FAILURE_EXIT_CODE
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = index
+        self.started_at[pid] = time.monotonic()
+        logger.info(f"Started worker {index} (pid {pid})")
+
+    def handle_signal(self, signum, frame):
+        if self.stopping:
+            return
+        logger.info(f"Received signal {signum}, draining {len(self.children)} workers")
+        self.stop_workers()
+
+    def stop_workers(self):
+        self.stopping = True
+        self.restarts.clear()
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+
+        for index in range(self.workers):
+            self.spawn(index)
+
+        deadline = None
+        while self.children or self.restarts:
+            if self.stopping and deadline is None:
+                # worker先等待进行中的请求，再在生命周期关闭阶段等待报告任务，各最多grace_period秒
+                deadline = time.monotonic() + self.grace_period * 2 + 10
+
+            if not self.children:
+                # 所有worker都在等待重启
+                self.restart_due()
+                time.sleep(0.2)
+                continue
+
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+
+            if pid == 0:
+                self.restart_due()
+                if deadline is not None and time.monotonic() > deadline:
+                    logger.error("Shutdown deadline exceeded, killing remaining workers")
+                    for child in list(self.children):
+                        try:
+                            os.kill(child, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+                    deadline = float("inf")
+                time.sleep(0.2)
+                continue
+
+            index = self.children.pop(pid, None)
+            started_at = self.started_at.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            self.schedule_restart(index, pid, status, time.monotonic() - started_at)
+
+        logger.info("All workers stopped")
+        return self.exit_code
+
+    def schedule_restart(self, index: int, pid: int, status: int, uptime: float):
+        """安排重启退出的worker；连续启动失败过多时停止全部worker"""
+        if uptime < FAST_EXIT_SECONDS:
+            failures = self.fast_failures.get(index, 0) + 1
+        else:
+            failures = 0
+        self.fast_failures[index] = failures
+
+        if failures >= MAX_FAST_FAILURES:
+            logger.error(f"Worker {index} (pid {pid}) exited with status {status} {failures} times "
+                         f"within {FAST_EXIT_SECONDS:.0f}s of starting, stopping all workers")
+            self.exit_code = 1
+            self.stop_workers()
+            return
+
+        delay = min(RESTART_DELAY * 2 ** max(failures - 1, 0), MAX_RESTART_DELAY)
+        logger.warning(f"Worker {index} (pid {pid}) exited with status {status} after {uptime:.1f}s, "
+                       f"restarting in {delay:.1f}s")
+        self.restarts[index] = time.monotonic() + delay
+
+    def restart_due(self):
+        """启动到达重启时间的worker"""
+        now = time.monotonic()
+        for index, restart_at in list(self.restarts.items()):
+            if restart_at <= now and not self.stopping:
+                del self.restarts[index]
+                self.spawn(index)
+
+def main():
+    """主函数"""
+    args = parse_args()
+    # 每个worker进程的上游并发上限；worker在fork后首次使用时读取
+    settings.upstream_concurrency = args.upstream_concurrency
+    settings.shutdown_grace_period = args.grace_period
+
+    # 预先导入应用，worker通过fork共享已加载的模块
+    from main import app
+
+    workers = args.workers or os.cpu_count() or 1
+
+    if not hasattr(os, "fork"):
+        logger.warning("os.fork is not available, running a single worker")
+        uvicorn.run(app, host=args.host, port=args.port, log_level=settings.log_level.lower(),
+                    timeout_graceful_shutdown=args.grace_period)
+        return
+
+    sock = create_socket(args.host, args.port)
+    logger.info(f"Listening on {args.host}:{args.port} with {workers} workers")
+    sys.exit(Supervisor(app, sock, workers, args.grace_period).run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import os
+import json
+import math
+import zlib
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from models.book_text import Passage
+from utils.helpers import normalize_book_name
+from utils.text_index import tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows下只支持单进程运行，不需要跨进程加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# numpy为可选依赖，导入耗时较长，只在启用语义索引后第一次使用时导入
+_np = None
+
+def _numpy():
+    """导入numpy，未安装时返回None"""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        _np = numpy
+    return _np
+
+def hash_features(text: str) -> Counter:
+    """文本的n-gram特征：分词结果（中文相邻两字）及相邻两个词的组合"""
+    tokens = tokenize(text)
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return features
+
+def hash_vector(text: str, dim: int) -> "np.ndarray":
+    """把文本散列为L2归一化的向量（特征哈希，带符号以抵消冲突）"""
+    np = _numpy()
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, count in hash_features(text).items():
+        # crc32在不同进程间结果一致，可以持久化
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += (1.0 if h & 0x80000000 else -1.0) * (1.0 + math.log(count))
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector
+
+class _BookVectors:
+    """一本书已索引的条目与向量矩阵
+
+    每行向量由两部分组成：内容向量（用于检索片段）与问题向量（报告片段为零向量，用于匹配相似问题）。
+    矩阵按容量倍增，追加时不必每次复制全部向量。
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.entries: List[Dict[str, str]] = []
+        self.keys: Set[str] = set()
+        self.entries_offset = 0  # 已读取的 entries.jsonl 字节数，其他worker追加后增量读取
+        self.lock = threading.RLock()
+        np = _numpy()
+        self._buffer = np.zeros((16, 2 * dim), dtype=np.float32)
+        self._count = 0
+
+    @property
+    def matrix(self) -> "np.ndarray":
+        return self._buffer[:self._count]
+
+    def extend(self, entries: List[Dict[str, str]], rows: "np.ndarray"):
+        count = self._count + len(rows)
+        if count > len(self._buffer):
+            np = _numpy()
+            buffer = np.zeros((max(count, 2 * len(self._buffer)), 2 * self.dim), dtype=np.float32)
+            buffer[:self._count] = self._buffer[:self._count]
+            self._buffer = buffer
+        self._buffer[self._count:count] = rows
+        # 先追加条目再增加行数，检索时条目数总不少于矩阵行数
+        self.entries.extend(entries)
+        self.keys.update(entry["key"] for entry in entries)
+        self._count = count
+
+class AnswerIndexService:
+    """已生成的报告与回答的本地语义索引
+
+    每本书的详细报告（按段落切分）和历史回答散列为n-gram向量，追加写入磁盘，
+    各worker共享。新问题与历史问题非常相似时直接返回历史回答；
+    否则取内容最相关的若干条作为参考内容交给Gemini（与书中原文片段分开标注），复用已经生成过的内容。
+    """
+
+    def __init__(self, storage_dir: str = "data/answer_index", dim: int = 2048,
+                 passage_chars: int = 600, top_k: int = 3, min_similarity: float = 0.05,
+                 direct_similarity: float = 0.92, max_loaded: int = 64):
+        self.storage_dir = storage_dir
+        self.dim = dim
+        self.passage_chars = passage_chars
+        self.top_k = top_k
+        self.min_similarity = min_similarity
+        self.direct_similarity = direct_similarity
+        self.max_loaded = max(1, max_loaded)
+        self._books: "OrderedDict[str, _BookVectors]" = OrderedDict()  # 最近使用的书，按目录名
+        self._lock = threading.Lock()
+        self.direct_hits = 0
+        self.grounded = 0
+
+    @property
+    def available(self) -> bool:
+        return _numpy() is not None
+
+    def index_answer(self, book_name: str, question: str, answer: str, reusable: bool = True) -> bool:
+        """索引一条问答，相同的问题只索引一次（阻塞，应在线程中调用）
+
+        reusable 为False的回答（如依赖对话历史）只用作参考片段，不会被直接返回。
+        """
+        key = f"answer:{normalize_book_name(question)}"
+        text = f"问：{question.strip()}\n答：{answer.strip()}"
+        return self._append(book_name, [(key, "answer", question.strip() if reusable else "", text)])
+
+    def index_report(self, book_name: str, report: str) -> bool:
+        """把详细报告按段落切分后索引，每本书只索引一次（阻塞，应在线程中调用）"""
+        items = [(f"report:{number}", "report", "", passage)
+                 for number, passage in enumerate(self._split_passages(report))]
+        return self._append(book_name, items)
+
+    def has_report(self, book_name: str) -> bool:
+        book = self._load(book_name)
+        return book is not None and "report:0" in book.keys
+
+    def lookup(self, book_name: str, question: str, allow_direct: bool = True) -> Tuple[Optional[str], List[Passage]]:
+        """返回 (可直接使用的历史回答, 相关片段)；有可直接使用的回答时片段为空（阻塞，应在线程中调用）"""
+        book = self._load(book_name)
+        if book is None:
+            return None, []
+        matrix = book.matrix
+        if not len(matrix):
+            return None, []
+        np = _numpy()
+        query = hash_vector(question, self.dim)
+        content_scores = matrix[:, :self.dim] @ query
+        question_scores = matrix[:, self.dim:] @ query
+
+        best = int(np.argmax(question_scores))
+        if allow_direct and question_scores[best] >= self.direct_similarity:
+            entry = book.entries[best]
+            self.direct_hits += 1
+            logger.info(f"Semantic index answered {book_name}: {question!r} ~ {entry['question']!r} "
+                        f"({question_scores[best]:.3f})")
+            return entry["text"].split("\n答：", 1)[-1], []
+
+        top = np.argsort(-content_scores)[:self.top_k]
+        passages = [
+            Passage(chunk_id=int(row), text=book.entries[row]["text"], score=round(float(content_scores[row]), 4))
+            for row in top if content_scores[row] >= self.min_similarity
+        ]
+        if passages:
+            self.grounded += 1
+        return None, passages
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            loaded = list(self._books.values())
+        return {
+            "loaded_books": len(loaded),
+            "loaded_entries": sum(len(book.entries) for book in loaded),
+            "direct_hits": self.direct_hits,
+            "grounded": self.grounded,
+        }
+
+    def _split_passages(self, report: str) -> List[str]:
+        """按段落切分报告，相邻的短段落合并，超长段落按长度切开"""
+        passages: List[str] = []
+        current = ""
+        for paragraph in report.split("\n"):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            for start in range(0, len(paragraph), self.passage_chars):
+                piece = paragraph[start:start + self.passage_chars]
+                if current and len(current) + len(piece) > self.passage_chars:
+                    passages.append(current)
+                    current = ""
+                current = f"{current}\n{piece}" if current else piece
+        if current:
+            passages.append(current)
+        return passages
+
+    def _append(self, book_name: str, items: List[Tuple[str, str, str, str]]) -> bool:
+        """追加条目并写入磁盘；已索引的键跳过"""
+        book = self._load(book_name)
+        if book is None or not items:
+            return False
+        book_dir = self._book_dir(book_name)
+        os.makedirs(book_dir, exist_ok=True)
+        with book.lock, open(os.path.join(book_dir, "lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            # 持锁后读入其他worker追加的条目，再判断是否已索引
+            self._read_new(book_dir, book)
+            items = [item for item in items if item[0] not in book.keys]
+            if not items:
+                return False
+            np = _numpy()
+            rows = np.zeros((len(items), 2 * self.dim), dtype=np.float32)
+            entries = []
+            for row, (key, source, question, text) in enumerate(items):
+                rows[row, :self.dim] = hash_vector(text, self.dim)
+                if question:
+                    rows[row, self.dim:] = hash_vector(question, self.dim)
+                entries.append({"key": key, "source": source, "question": question, "text": text})
+            # 先写向量再写条目：读取时以条目数为准，中断时多出的向量行被忽略
+            with open(os.path.join(book_dir, "vectors.f32"), "ab") as f:
+                f.seek(0, os.SEEK_END)
+                expected = len(book.entries) * 2 * self.dim * 4
+                if f.tell() != expected:
+                    f.truncate(expected)
+                f.write(rows.tobytes())
+            with open(os.path.join(book_dir, "entries.jsonl"), "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                book.entries_offset = f.tell()
+            book.extend(entries, rows)
+        return True
+
+    def _load(self, book_name: str) -> Optional[_BookVectors]:
+        """取得一本书的索引，其他worker追加过的条目增量读入"""
+        if _numpy() is None:
+            return None
+        book_dir = self._book_dir(book_name)
+        key = os.path.basename(book_dir)
+        with self._lock:
+            book = self._books.get(key)
+            if book is None:
+                book = _BookVectors(self.dim)
+                self._books[key] = book
+            self._books.move_to_end(key)
+            while len(self._books) > self.max_loaded:
+                self._books.popitem(last=False)
+        try:
+            self._read_new(book_dir, book)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read answer index {book_dir}: {str(e)}")
+        return book
+
+    def _read_new(self, book_dir: str, book: _BookVectors):
+        with book.lock:
+            self._read_new_locked(book_dir, book)
+
+    def _read_new_locked(self, book_dir: str, book: _BookVectors):
+        entries_path = os.path.join(book_dir, "entries.jsonl")
+        try:
+            size = os.path.getsize(entries_path)
+        except FileNotFoundError:
+            return
+        if size <= book.entries_offset:
+            return
+        with open(entries_path, "rb") as f:
+            f.seek(book.entries_offset)
+            data = f.read()
+        # 只读取完整的行
+        data = data[:data.rfind(b"\n") + 1]
+        if not data:
+            return
+        entries = [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+        np = _numpy()
+        row_bytes = 2 * self.dim * 4
+        with open(os.path.join(book_dir, "vectors.f32"), "rb") as f:
+            f.seek(len(book.entries) * row_bytes)
+            rows = np.frombuffer(f.read(len(entries) * row_bytes), dtype=np.float32)
+        if len(rows) != len(entries) * 2 * self.dim:
+            raise ValueError("Vector file is shorter than entries")
+        book.entries_offset += len(data)
+        book.extend(entries, rows.reshape(len(entries), 2 * self.dim).copy())
+
+    def _book_dir(self, book_name: str) -> str:
+        digest = hashlib.sha1(normalize_book_name(book_name).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.storage_dir, digest)
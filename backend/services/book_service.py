@@ -1,13 +1,39 @@
+import os
 import re
 import json
+import time
+import uuid
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+import sqlite3
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator, Callable, Awaitable
 from models.book import BookInfo
+from models.book_text import Passage
 from services.gemini_service import GeminiService
 from utils.conversation_logger import log_conversation
+from utils.helpers import normalize_book_name
+from utils.cache import TTLCache, CacheEntry
+from utils.shared_cache import SharedCache, is_busy_error
+from utils.catalog import BookCatalog
+from utils.circuit_breaker import CircuitOpenError
+from services.report_sections import REPORT_SECTIONS, SECTIONS_BY_ID, ReportSection, assemble_report
+from services.preset_prompts import QA_PRESETS, PresetPrompt, match_preset
+from services.model_router import MODEL_HINTS
+from services.book_text_service import BookTextService
+from services.answer_index_service import AnswerIndexService
+from services.library_index import LibraryIndex
 
 logger = logging.getLogger(__name__)
 
+# 等待其他worker生成结果时轮询共享缓存的间隔秒数
+SHARED_POLL_INTERVAL = 0.5
+
+# 书目库中的书只向Gemini请求这些描述性字段
+CATALOG_GENERATED_FIELDS = ("author", "description", "summary", "genre")
+
+# 书库检索时从共享缓存补充其他worker缓存的书籍的最短间隔秒数
+LIBRARY_SYNC_INTERVAL = 60
+
 def clean_json_response(text: str) -> Optional[Dict[str, Any]]:
     """清理并解析JSON响应"""
     try:
@@ -59,11 +85,74 @@ def format_book_response(book_info: BookInfo) -> Dict[str, Any]:
     }
 
 class BookService:
-    """书籍业务逻辑处理"""
+    """书籍业务逻辑处理
+
+    缓存分两级：本进程的TTLCache，以及可选的跨worker共享缓存（SharedCache）。
+    同一个键同时只生成一次：进程内合并并发请求，多worker时通过共享缓存认领。
+    上游熔断时返回最近一次的结果（即使已过期），调用方可通过条目的 is_expired 判断。
+    """
     
-    def __init__(self, gemini_service: GeminiService):
+    # 各级内存缓存的条目上限，达到上限后淘汰最久未访问的条目
+    BOOK_CACHE_MAX_SIZE = 10000
+    REPORT_CACHE_MAX_SIZE = 1000
+    QA_CACHE_MAX_SIZE = 10000
+    REPORT_SECTION_CACHE_MAX_SIZE = 5000
+    PRESET_CACHE_MAX_SIZE = 10000
+    LIBRARY_SEARCH_MAX_LIMIT = 50
+    
+    def __init__(self, gemini_service: GeminiService, cache_ttl: Optional[int] = None,
+                 shared_cache: Optional[SharedCache] = None, claim_timeout: float = 300,
+                 stale_ttl: float = 0, refresh_ahead: float = 0.1, hot_hits: int = 3,
+                 report_mode: str = "single", preset_ttl: Optional[int] = None,
+                 book_text_service: Optional[BookTextService] = None, book_text_top_k: int = 5,
+                 answer_index: Optional[AnswerIndexService] = None, catalog: Optional[BookCatalog] = None):
         self.gemini_service = gemini_service
-        self.book_cache = {}  # 简单的内存缓存
+        # 已上传全文的书籍，问答时检索原文片段放入提示词
+        self.book_text_service = book_text_service
+        self.book_text_top_k = book_text_top_k
+        # 已生成的报告与回答的语义索引：相似问题直接复用回答，其余取相关内容作为参考
+        self.answer_index = answer_index
+        # 本地书目库：出版社、年份、ISBN等事实信息优先从中读取
+        self.catalog = catalog
+        self.catalog_hits = 0
+        # 已缓存书籍信息的检索索引，随缓存写入增量更新
+        self.library_index = LibraryIndex()
+        self._library_synced_at = 0.0
+        # 内存缓存；cache_ttl为None表示永不过期，为0表示禁用缓存。
+        # 过期条目只保留 stale_ttl 秒（供后台刷新与熔断时返回旧值），更早的过期条目写入时清理
+        # 书库检索索引与书籍信息缓存保持一致：缓存淘汰的书同时移出索引
+        self.book_cache = TTLCache(ttl=cache_ttl, max_size=self.BOOK_CACHE_MAX_SIZE, stale_ttl=stale_ttl,
+                                   on_remove=self.library_index.remove)
+        self.report_cache = TTLCache(ttl=cache_ttl, max_size=self.REPORT_CACHE_MAX_SIZE, stale_ttl=stale_ttl)
+        self.qa_cache = TTLCache(ttl=cache_ttl, max_size=self.QA_CACHE_MAX_SIZE, stale_ttl=stale_ttl)
+        self.report_section_cache = TTLCache(ttl=cache_ttl, max_size=self.REPORT_SECTION_CACHE_MAX_SIZE,
+                                             stale_ttl=stale_ttl)
+        # 推荐问题的回答与用户无关，单独缓存，可设置更长的有效期
+        self.preset_cache = TTLCache(ttl=cache_ttl if not cache_ttl or preset_ttl is None else preset_ttl,
+                                     max_size=self.PRESET_CACHE_MAX_SIZE, stale_ttl=stale_ttl)
+        self._caches: Dict[str, TTLCache] = {
+            "book_info": self.book_cache,
+            "report": self.report_cache,
+            "qa": self.qa_cache,
+            "report_section": self.report_section_cache,
+            "preset": self.preset_cache,
+        }
+        # single: 整篇报告一次生成；sectioned: 各章节并发生成后按顺序拼接
+        self.report_mode = report_mode
+        self.shared_cache = shared_cache
+        self.claim_timeout = claim_timeout
+        self._instance_id = uuid.uuid4().hex[:8]
+        self._pending: Dict[str, asyncio.Future] = {}  # 正在生成中的任务，键为 "命名空间:缓存键"
+        self.stale_served = 0  # 因上游熔断返回过期数据的次数
+        # 书籍信息的后台刷新：过期不超过 stale_ttl 秒的条目先返回旧值再刷新；
+        # 命中次数达到 hot_hits 的条目在剩余有效期不足 refresh_ahead（占TTL的比例）时提前刷新
+        self.stale_ttl = stale_ttl
+        self.refresh_ahead = refresh_ahead
+        self.hot_hits = hot_hits
+        self.stale_revalidations = 0
+        self.refresh_ahead_count = 0
+        self.preset_hits = 0
+        self._preset_tasks: Dict[str, asyncio.Task] = {}  # 书名键 -> 后台预生成推荐问题回答的任务
     
     async def get_book_info(self, book_name: str) -> Optional[BookInfo]:
         """获取书籍信息"""
@@ -71,25 +160,171 @@ class BookService:
         if not validate_book_name(book_name):
             raise ValueError("Invalid book name")
         
-        # 检查缓存
-        cache_key = book_name.lower().strip()
-        if cache_key in self.book_cache:
-            return self.book_cache[cache_key]
+        # 检查缓存；过期不久的条目直接返回，同时在后台刷新
+        cache_key = normalize_book_name(book_name)
+        entry = self._lookup("book_info", cache_key, allow_expired=self.stale_ttl > 0)
+        if entry is not None and self._within_stale_window(entry):
+            entry.hits += 1
+            entry.last_access = time.time()
+            self._maybe_refresh_book_info(book_name, cache_key, entry)
+            return entry.value
+        
+        # 同一本书已在生成中时，等待同一个结果而不是重复调用Gemini
+        try:
+            return await self._single_flight("book_info", cache_key, lambda: self._fetch_book_info(book_name, cache_key))
+        except CircuitOpenError as e:
+            return self._serve_stale("book_info", cache_key, e)
+    
+    def _within_stale_window(self, entry: CacheEntry) -> bool:
+        """未过期，或过期时间未超过 stale_ttl"""
+        if not entry.is_expired:
+            return True
+        return time.time() - entry.expires_at <= self.stale_ttl
+    
+    def _maybe_refresh_book_info(self, book_name: str, cache_key: str, entry: CacheEntry):
+        """过期条目，或临近过期的热门条目，在后台刷新（同一本书只刷新一次）"""
+        if entry.expires_at is None:
+            return
+        if not entry.is_expired:
+            remaining = entry.expires_at - time.time()
+            ttl = entry.expires_at - entry.created_at
+            if entry.hits < self.hot_hits or remaining > ttl * self.refresh_ahead:
+                return
+        
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # 不在事件循环中（如同步调用），不做后台刷新
         
-        # 调用Gemini服务
-        book_info = await self.gemini_service.generate_book_info(book_name)
+        if f"book_info:{cache_key}" in self._pending:
+            return
+        if entry.is_expired:
+            self.stale_revalidations += 1
+        else:
+            self.refresh_ahead_count += 1
+        self._start_flight(
+            "book_info", cache_key,
+            lambda: self._fetch_book_info(book_name, cache_key, refresh=True),
+            newer_than=entry.expires_at
+        )
+    
+    async def _fetch_book_info(self, book_name: str, cache_key: str, refresh: bool = False) -> Optional[BookInfo]:
+        """调用Gemini生成书籍信息并写入缓存（书目库中有的书只生成缺少的描述性字段）"""
+        book_info, complete = await self._book_info_from_catalog(book_name)
+        if book_info is not None and not complete:
+            # 描述性字段生成失败：先返回书目库中的信息，不写入缓存，下次查询时重试
+            return book_info
+        if book_info is None:
+            book_info = await self.gemini_service.generate_book_info(book_name)
+        
+        if refresh and book_info and not book_info.is_found:
+            # 后台刷新失败（多为上游出错）时保留原来找到的结果，不用"未找到"覆盖
+            previous = self._lookup("book_info", cache_key, allow_expired=True)
+            if previous is not None and previous.value.is_found:
+                logger.warning(f"Refresh of {cache_key} returned not found, keeping previous entry")
+                return previous.value
         
         # 记录交互
         if book_info:
             log_conversation(book_name, "Get book info", json.dumps(book_info.dict(), ensure_ascii=False, indent=2))
-            self.book_cache[cache_key] = book_info
+            self._store("book_info", cache_key, book_info)
         else:
             log_conversation(book_name, "Get book info", "Failed: Book not found")
         
         return book_info
     
-    async def answer_book_question(self, book_name: str, question: str) -> Optional[str]:
-        """回答书籍相关问题"""
+    async def _book_info_from_catalog(self, book_name: str) -> Tuple[Optional[BookInfo], bool]:
+        """从书目库组装书籍信息，返回 (书籍信息, 是否完整)；书目库中没有时返回 (None, False)"""
+        if self.catalog is None:
+            return None, False
+        try:
+            record = await asyncio.to_thread(self.catalog.lookup, book_name)
+        except sqlite3.Error as e:
+            logger.error(f"Catalog lookup failed for {book_name}: {str(e)}")
+            return None, False
+        if record is None:
+            return None, False
+        self.catalog_hits += 1
+        
+        missing = [field for field in CATALOG_GENERATED_FIELDS if not record.get(field)]
+        details: Optional[Dict[str, Any]] = {}
+        if missing:
+            try:
+                details = await self.gemini_service.generate_book_details(record["title"], record["author"], missing)
+            except CircuitOpenError:
+                details = None
+            if details is None:
+                logger.warning(f"Book details generation failed for {book_name}, returning catalog fields only")
+        # 书目库中的事实信息优先
+        catalog_fields = {field: value for field, value in record.items() if value}
+        try:
+            return BookInfo(**{**(details or {}), **catalog_fields}, is_found=True), details is not None
+        except ValueError as e:
+            # 生成的字段不符合模型时只返回书目库中的字段
+            logger.warning(f"Invalid generated book details for {book_name}: {str(e)}")
+            return BookInfo(**catalog_fields, is_found=True), False
+    
+    async def iter_book_info_batch(self, book_names: List[str], concurrency: int = 8) -> AsyncIterator[Dict[str, Any]]:
+        """批量获取书籍信息，按完成顺序逐条产出结果
+
+        书名先按规范化结果去重，缓存命中的条目立即返回，
+        其余条目在并发上限内同时向Gemini请求。
+        """
+        groups: Dict[str, List[str]] = {}
+        for name in book_names:
+            if not validate_book_name(name):
+                yield {"book_name": name, "inputs": [name], "status": "invalid", "data": None,
+                       "error": "Invalid book name"}
+                continue
+            groups.setdefault(normalize_book_name(name), []).append(name)
+        
+        misses = []
+        for cache_key, inputs in groups.items():
+            cached = self._cached_value("book_info", cache_key)
+            if cached is not None:
+                yield self._batch_item(inputs, "cached", cached)
+            else:
+                misses.append(inputs)
+        
+        if not misses:
+            return
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def fetch(inputs: List[str]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    book_info = await self.get_book_info(inputs[0])
+                except Exception as e:
+                    logger.error(f"Batch lookup failed for {inputs[0]}: {str(e)}")
+                    return {"book_name": inputs[0], "inputs": inputs, "status": "error", "data": None,
+                            "error": str(e)}
+            status = "found" if book_info and book_info.is_found else "not_found"
+            return self._batch_item(inputs, status, book_info)
+        
+        tasks = [asyncio.ensure_future(fetch(inputs)) for inputs in misses]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端中途断开时取消尚未完成的请求
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    @staticmethod
+    def _batch_item(inputs: List[str], status: str, book_info: Optional[BookInfo]) -> Dict[str, Any]:
+        """构建批量查询的单条结果"""
+        return {
+            "book_name": inputs[0],
+            "inputs": inputs,
+            "status": status,
+            "data": book_info.dict() if book_info else None,
+            "error": None
+        }
+    
+    async def answer_book_question(self, book_name: str, question: str, hint: Optional[str] = None) -> Optional[str]:
+        """回答书籍相关问题（hint 为客户端的模型偏好，见 ModelRouter）"""
         # 验证输入
         if not validate_book_name(book_name):
             raise ValueError("Invalid book name")
@@ -97,16 +332,147 @@ class BookService:
         if not question or not question.strip():
             raise ValueError("Question cannot be empty")
         
-        # 调用Gemini服务
-        answer = await self.gemini_service.answer_question(book_name, question)
+        if hint is not None and hint not in MODEL_HINTS:
+            raise ValueError(f"Invalid model hint: {hint}")
+        
+        # 推荐问题使用预先生成的回答
+        preset = match_preset(question)
+        if preset is not None and preset.kind == "qa":
+            return await self.answer_preset_question(book_name, preset)
+        
+        # 检查缓存（相同书籍的相同问题；指定了模型偏好的回答单独缓存）
+        cache_key = self._qa_key(book_name, question)
+        if hint:
+            cache_key = f"{cache_key}|{hint}"
+        # 基于原文片段的回答按全文版本缓存，重新上传后不再使用旧回答；缓存命中时不检索片段
+        text_version = await self._text_version(book_name)
+        if text_version:
+            cache_key = f"{cache_key}|text:{text_version}"
+        cached = self._cached_value("qa", cache_key)
+        if cached is not None:
+            return cached
+        
+        passages: List[Passage] = []
+        notes: List[Passage] = []
+        if text_version:
+            passages = await self._retrieve_passages(book_name, question)
+        else:
+            # 指定了模型偏好时不复用其他回答
+            reused, notes = await self._semantic_lookup(book_name, question, allow_direct=hint is None)
+            if reused is not None:
+                self._store("qa", cache_key, reused)
+                return reused
+        
+        try:
+            return await self._single_flight(
+                "qa", cache_key, lambda: self._fetch_answer(book_name, question, cache_key, hint, passages, notes)
+            )
+        except CircuitOpenError as e:
+            return self._serve_stale("qa", cache_key, e)
+    
+    async def _fetch_answer(self, book_name: str, question: str, cache_key: str,
+                            hint: Optional[str] = None, passages: Optional[List[Passage]] = None,
+                            notes: Optional[List[Passage]] = None) -> Optional[str]:
+        """调用Gemini回答问题并写入缓存（passages 为书中原文片段，notes 为之前生成的报告与回答）"""
+        answer = await self.gemini_service.answer_question(
+            book_name, question, hint=hint, passages=passages, notes=notes
+        )
         
         # 记录对话
         if answer:
             log_conversation(book_name, question, answer)
+            self._store("qa", cache_key, answer)
+            await self._index_answer(book_name, question, answer)
+        
+        return answer
+    
+    async def answer_preset_question(self, book_name: str, preset: PresetPrompt) -> Optional[str]:
+        """回答推荐问题（各用户共用同一份回答）"""
+        if not validate_book_name(book_name):
+            raise ValueError("Invalid book name")
+        
+        cache_key = self._qa_key(book_name, preset.id)
+        cached = self._cached_value("preset", cache_key)
+        if cached is not None:
+            self.preset_hits += 1
+            return cached
         
+        try:
+            return await self._single_flight(
+                "preset", cache_key, lambda: self._fetch_preset_answer(book_name, preset, cache_key)
+            )
+        except CircuitOpenError as e:
+            return self._serve_stale("preset", cache_key, e)
+    
+    async def _fetch_preset_answer(self, book_name: str, preset: PresetPrompt, cache_key: str) -> Optional[str]:
+        """调用Gemini回答推荐问题并写入缓存"""
+        # 推荐问题虽短但要求深入分析，不按简短问题路由到快速模型
+        answer = await self.gemini_service.answer_question(book_name, preset.prompt, hint="balanced")
+        if answer:
+            log_conversation(book_name, preset.prompt, answer)
+            self._store("preset", cache_key, answer)
+            await self._index_answer(book_name, preset.prompt, answer)
         return answer
     
-    async def answer_book_question_with_context(self, book_name: str, question: str, context: str = "") -> Optional[str]:
+    async def precompute_preset_answers(self, book_name: str) -> Dict[str, Dict[str, str]]:
+        """生成一本书全部推荐问题的回答（已缓存的直接返回），
+        返回 {"answers": {推荐问题ID: 回答}, "failed": {推荐问题ID: 错误信息}}"""
+        if not validate_book_name(book_name):
+            raise ValueError("Invalid book name")
+        
+        results = await asyncio.gather(
+            *(self.answer_preset_question(book_name, preset) for preset in QA_PRESETS),
+            return_exceptions=True
+        )
+        answers: Dict[str, str] = {}
+        failed: Dict[str, str] = {}
+        for preset, result in zip(QA_PRESETS, results):
+            if isinstance(result, Exception):
+                failed[preset.id] = str(result)
+            elif result:
+                answers[preset.id] = result
+            else:
+                failed[preset.id] = "No answer generated"
+        return {"answers": answers, "failed": failed}
+    
+    def schedule_preset_answers(self, book_name: str) -> bool:
+        """查到书籍后在后台预生成推荐问题的回答；全部已缓存或已在生成中时不重复提交"""
+        book_key = normalize_book_name(book_name)
+        if book_key in self._preset_tasks or not validate_book_name(book_name):
+            return False
+        if not self.preset_cache.enabled or len(self.get_cached_preset_answers(book_name)) == len(QA_PRESETS):
+            return False
+        try:
+            task = asyncio.get_running_loop().create_task(self.precompute_preset_answers(book_name))
+        except RuntimeError:
+            return False
+        self._preset_tasks[book_key] = task
+        task.add_done_callback(lambda t: self._on_preset_task_done(book_key, t))
+        return True
+    
+    def _on_preset_task_done(self, book_key: str, task: asyncio.Task):
+        self._preset_tasks.pop(book_key, None)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"Preset answer precompute failed for {book_key}: {str(error)}")
+            return
+        failed = task.result()["failed"]
+        if failed:
+            logger.warning(f"Preset answers failed for {book_key}: {failed}")
+    
+    def get_cached_preset_answers(self, book_name: str) -> Dict[str, str]:
+        """获取已缓存的推荐问题回答，键为推荐问题ID"""
+        answers = {}
+        for preset in QA_PRESETS:
+            answer = self._cached_value("preset", self._qa_key(book_name, preset.id))
+            if answer is not None:
+                answers[preset.id] = answer
+        return answers
+    
+    async def answer_book_question_with_context(self, book_name: str, question: str, context: str = "",
+                                                hint: Optional[str] = None) -> Optional[str]:
         """回答书籍相关问题（带上下文）"""
         # 验证输入
         if not validate_book_name(book_name):
@@ -115,44 +481,540 @@ class BookService:
         if not question or not question.strip():
             raise ValueError("Question cannot be empty")
         
+        if hint is not None and hint not in MODEL_HINTS:
+            raise ValueError(f"Invalid model hint: {hint}")
+        
+        passages = await self._retrieve_passages(book_name, question)
+        # 已上传全文的书以原文为准，否则参考之前生成过的报告与回答
+        notes: List[Passage] = []
+        if not passages:
+            # 有对话历史时问题的含义依赖上下文，复用的回答只作为参考内容
+            reused, notes = await self._semantic_lookup(book_name, question,
+                                                        allow_direct=not context.strip() and hint is None)
+            if reused is not None:
+                return reused
+        
         # 调用Gemini服务（传入上下文）
-        answer = await self.gemini_service.answer_question_with_context(book_name, question, context)
+        answer = await self.gemini_service.answer_question_with_context(
+            book_name, question, context, hint=hint, passages=passages, notes=notes
+        )
         
         # 记录对话
         if answer:
             log_conversation(book_name, f"{context}\n\nQuestion: {question}", answer)
+            # 依赖对话历史的回答不单独复用，只作为参考内容
+            await self._index_answer(book_name, question, answer, reusable=False)
 
         return answer
 
+    async def _text_version(self, book_name: str) -> Optional[str]:
+        """已上传全文的版本，未上传全文时返回None（只读取 meta.json，不检索）"""
+        if self.book_text_service is None:
+            return None
+        meta = await asyncio.to_thread(self.book_text_service.get_meta, book_name)
+        return meta.version if meta is not None else None
+    
+    async def _retrieve_passages(self, book_name: str, question: str) -> List[Passage]:
+        """检索已上传全文中与问题相关的片段；未上传全文时返回空列表"""
+        if self.book_text_service is None:
+            return []
+        try:
+            return await asyncio.to_thread(
+                self.book_text_service.search, book_name, question, self.book_text_top_k
+            )
+        except Exception as e:
+            logger.error(f"Passage retrieval failed for {book_name}: {str(e)}")
+            return []
+    
+    async def _semantic_lookup(self, book_name: str, question: str,
+                               allow_direct: bool = True) -> Tuple[Optional[str], List[Passage]]:
+        """在语义索引中查找，返回 (可直接复用的回答, 之前生成的相关内容)"""
+        if self.answer_index is None:
+            return None, []
+        try:
+            if not await asyncio.to_thread(self.answer_index.has_report, book_name):
+                # 启用索引之前生成的报告在第一次提问时补充索引
+                entry = self._lookup("report", self._report_key(book_name, None))
+                if entry is not None:
+                    await asyncio.to_thread(self.answer_index.index_report, book_name, entry.value)
+            return await asyncio.to_thread(self.answer_index.lookup, book_name, question, allow_direct)
+        except Exception as e:
+            logger.error(f"Semantic lookup failed for {book_name}: {str(e)}")
+            return None, []
+    
+    async def _index_answer(self, book_name: str, question: str, answer: str, reusable: bool = True):
+        if self.answer_index is None:
+            return
+        try:
+            await asyncio.to_thread(self.answer_index.index_answer, book_name, question, answer, reusable)
+        except Exception as e:
+            logger.error(f"Failed to index answer for {book_name}: {str(e)}")
+    
+    async def _index_report(self, book_name: str, report: str):
+        if self.answer_index is None:
+            return
+        try:
+            await asyncio.to_thread(self.answer_index.index_report, book_name, report)
+        except Exception as e:
+            logger.error(f"Failed to index report for {book_name}: {str(e)}")
+    
     async def generate_detailed_report(self, book_name: str, author: Optional[str] = None) -> Optional[str]:
         """生成详细的书籍报告"""
         # 验证输入
         if not validate_book_name(book_name):
             raise ValueError("Invalid book name")
         
-        # 调用Gemini服务生成报告
+        # 检查缓存
+        cache_key = self._report_key(book_name, author)
+        cached = self._cached_value("report", cache_key)
+        if cached is not None:
+            return cached
+        
+        fetch = self._fetch_sectioned_report if self.report_mode == "sectioned" else self._fetch_report
+        try:
+            return await self._single_flight("report", cache_key, lambda: fetch(book_name, author, cache_key))
+        except CircuitOpenError as e:
+            return self._serve_stale("report", cache_key, e)
+    
+    async def _fetch_report(self, book_name: str, author: Optional[str], cache_key: str) -> Optional[str]:
+        """调用Gemini生成报告并写入缓存"""
         report = await self.gemini_service.generate_detailed_report(book_name, author)
         
         # 记录交互
         if report:
             log_conversation(book_name, "Generate detailed report", report)
+            self._store("report", cache_key, report)
+            await self._index_report(book_name, report)
         else:
             log_conversation(book_name, "Generate detailed report", "Failed: Report generation failed")
         
         return report
     
+    async def _fetch_sectioned_report(self, book_name: str, author: Optional[str], cache_key: str) -> Optional[str]:
+        """分章节并发生成报告，全部成功后拼接并写入缓存"""
+        texts: Dict[str, str] = {}
+        failed = []
+        async for item in self.iter_report_sections(book_name, author):
+            if item["status"] == "failed":
+                failed.append(item["section_id"])
+            else:
+                texts[item["section_id"]] = item["text"]
+        
+        if failed:
+            # 已生成的章节各自缓存，重试时只需生成失败的章节
+            log_conversation(book_name, "Generate detailed report", f"Failed: sections {', '.join(failed)} not generated")
+            return None
+        
+        report = assemble_report(texts)
+        log_conversation(book_name, "Generate detailed report", report)
+        self._store("report", cache_key, report)
+        await self._index_report(book_name, report)
+        return report
+    
+    async def iter_report_sections(self, book_name: str, author: Optional[str] = None,
+                                   section_ids: Optional[List[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """分章节并发生成详细报告，按完成顺序逐个产出章节
+
+        各章节是共享同一书籍上下文的独立调用，分别缓存；
+        缓存中已有的章节立即返回，整体耗时接近最慢的单个章节。
+        section_ids 为空时生成全部章节，否则只生成指定的章节。
+        """
+        if not validate_book_name(book_name):
+            raise ValueError("Invalid book name")
+        sections = self._resolve_sections(section_ids)
+        
+        report_key = self._report_key(book_name, author)
+        misses: List[ReportSection] = []
+        for section in sections:
+            cached = self._cached_value("report_section", f"{report_key}|{section.id}")
+            if cached is not None:
+                yield self._section_item(section, "cached", cached)
+            else:
+                misses.append(section)
+        
+        if not misses:
+            return
+        
+        async def fetch(section: ReportSection) -> Dict[str, Any]:
+            cache_key = f"{report_key}|{section.id}"
+            try:
+                text = await self._single_flight(
+                    "report_section", cache_key,
+                    lambda: self._fetch_report_section(book_name, author, section, cache_key)
+                )
+            except CircuitOpenError as e:
+                try:
+                    text = self._serve_stale("report_section", cache_key, e)
+                except CircuitOpenError:
+                    return self._section_item(section, "failed", None, str(e))
+            except Exception as e:
+                logger.error(f"Report section {section.id} failed for {book_name}: {str(e)}")
+                return self._section_item(section, "failed", None, str(e))
+            
+            if not text:
+                return self._section_item(section, "failed", None, "No content generated")
+            return self._section_item(section, "generated", text)
+        
+        tasks = [asyncio.ensure_future(fetch(section)) for section in misses]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端中途断开时取消尚未完成的章节（已在生成的章节受shield保护，仍会写入缓存）
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def get_report_sections(self, book_name: str, author: Optional[str] = None,
+                                  section_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """按章节获取报告，返回 {"sections": {章节ID: 文本}, "failed": {章节ID: 错误}}（按报告顺序）"""
+        texts: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        async for item in self.iter_report_sections(book_name, author, section_ids):
+            if item["status"] == "failed":
+                errors[item["section_id"]] = item["error"]
+            else:
+                texts[item["section_id"]] = item["text"]
+        
+        order = [section.id for section in REPORT_SECTIONS]
+        return {
+            "sections": {section_id: texts[section_id] for section_id in order if section_id in texts},
+            "failed": {section_id: errors[section_id] for section_id in order if section_id in errors}
+        }
+    
+    @staticmethod
+    def _resolve_sections(section_ids: Optional[List[str]]) -> List[ReportSection]:
+        """校验章节ID并去重，保持报告顺序"""
+        if not section_ids:
+            return list(REPORT_SECTIONS)
+        unknown = [section_id for section_id in section_ids if section_id not in SECTIONS_BY_ID]
+        if unknown:
+            raise ValueError(f"Unknown report sections: {', '.join(unknown)}")
+        requested = set(section_ids)
+        return [section for section in REPORT_SECTIONS if section.id in requested]
+    
+    async def _fetch_report_section(self, book_name: str, author: Optional[str],
+                                    section: ReportSection, cache_key: str) -> Optional[str]:
+        """调用Gemini生成单个章节并写入缓存"""
+        text = await self.gemini_service.generate_report_section(book_name, author, section)
+        if text:
+            self._store("report_section", cache_key, text)
+        return text
+    
+    @staticmethod
+    def _section_item(section: ReportSection, status: str, text: Optional[str],
+                      error: Optional[str] = None) -> Dict[str, Any]:
+        """构建章节结果"""
+        return {
+            "section_id": section.id,
+            "index": REPORT_SECTIONS.index(section),
+            "title": section.title,
+            "status": status,
+            "text": text,
+            "error": error
+        }
+    
+    async def _single_flight(self, namespace: str, cache_key: str, produce: Callable[[], Awaitable[Any]]) -> Any:
+        """同一个键的并发请求共享一次生成"""
+        task = self._start_flight(namespace, cache_key, produce)
+        # shield: 单个请求断开时不取消共享的生成任务，结果仍会写入缓存
+        return await asyncio.shield(task)
+    
+    def _start_flight(self, namespace: str, cache_key: str, produce: Callable[[], Awaitable[Any]],
+                      newer_than: Optional[float] = None) -> asyncio.Future:
+        """启动生成任务；同一个键已有任务在进行时直接复用"""
+        pending_key = f"{namespace}:{cache_key}"
+        task = self._pending.get(pending_key)
+        if task is None:
+            task = asyncio.ensure_future(self._produce_once(namespace, cache_key, produce, newer_than))
+            self._pending[pending_key] = task
+            task.add_done_callback(lambda t: self._on_pending_done(pending_key, t))
+        return task
+    
+    def _on_pending_done(self, pending_key: str, task: asyncio.Future):
+        """生成任务结束后移出等待表"""
+        self._pending.pop(pending_key, None)
+        if task.cancelled() or task.exception() is None:
+            return
+        if isinstance(task.exception(), CircuitOpenError):
+            logger.warning(f"Generation skipped for {pending_key}: {task.exception()}")
+        else:
+            logger.error(f"Generation failed for {pending_key}: {task.exception()}")
+    
+    async def _produce_once(self, namespace: str, cache_key: str, produce: Callable[[], Awaitable[Any]],
+                            newer_than: Optional[float] = None) -> Any:
+        """启用共享缓存时先认领再生成；已被其他worker认领则等待其结果
+
+        刷新已有条目时传入其过期时间 newer_than，只有更新的共享结果才视为已完成。
+        """
+        if self.shared_cache is None or not self._caches[namespace].enabled:
+            return await produce()
+        
+        while True:
+            if newer_than is None:
+                entry = self._lookup(namespace, cache_key)
+            else:
+                entry = self._lookup_shared(namespace, cache_key, newer_than=newer_than)
+            if entry is not None:
+                return entry.value
+            
+            if self._try_claim(namespace, cache_key):
+                try:
+                    return await produce()
+                finally:
+                    self._release_claim(namespace, cache_key)
+            
+            # 认领者失败或退出后认领会释放/过期，下一轮由本进程重新认领
+            await asyncio.sleep(SHARED_POLL_INTERVAL)
+    
+    @property
+    def _owner_id(self) -> str:
+        # 包含pid：fork出的worker即使继承了同一个实例也不会被当作同一持有者
+        return f"{os.getpid()}:{self._instance_id}"
+    
+    def _try_claim(self, namespace: str, cache_key: str) -> bool:
+        try:
+            return self.shared_cache.try_claim(namespace, cache_key, self._owner_id, self.claim_timeout)
+        except sqlite3.Error as e:
+            if is_busy_error(e):
+                # 其他worker正在写入，视为未认领，下一轮再试
+                logger.warning(f"Shared cache busy, claim deferred for {namespace}:{cache_key}")
+                return False
+            # 共享缓存不可用时退化为本进程内生成
+            logger.error(f"Shared cache claim failed for {namespace}:{cache_key}: {str(e)}")
+            return True
+    
+    def _release_claim(self, namespace: str, cache_key: str):
+        try:
+            self.shared_cache.release(namespace, cache_key, self._owner_id)
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache release failed for {namespace}:{cache_key}: {str(e)}")
+    
+    def _serve_stale(self, namespace: str, cache_key: str, error: CircuitOpenError) -> Any:
+        """上游熔断时返回过期的缓存结果；没有可用的旧结果则继续抛出"""
+        entry = self._lookup(namespace, cache_key, allow_expired=True)
+        if entry is None:
+            raise error
+        self.stale_served += 1
+        logger.warning(f"Serving stale {namespace} for {cache_key}: {str(error)}")
+        return entry.value
+    
+    def _lookup(self, namespace: str, cache_key: str, allow_expired: bool = False) -> Optional[CacheEntry]:
+        """依次查询本进程缓存与共享缓存，共享缓存命中时回填本进程缓存
+
+        allow_expired 时，两级都没有未过期的条目才返回过期条目。
+        """
+        cache = self._caches[namespace]
+        entry = cache.get_entry(cache_key) or self._lookup_shared(namespace, cache_key)
+        if entry is not None or not allow_expired:
+            return entry
+        return (cache.get_entry(cache_key, allow_expired=True)
+                or self._lookup_shared(namespace, cache_key, allow_expired=True))
+    
+    def _lookup_shared(self, namespace: str, cache_key: str, allow_expired: bool = False,
+                       newer_than: Optional[float] = None) -> Optional[CacheEntry]:
+        """查询共享缓存并回填本进程缓存；newer_than 用于只接受比已知条目更新的结果"""
+        cache = self._caches[namespace]
+        if self.shared_cache is None or not cache.enabled:
+            return None
+        
+        try:
+            shared = self.shared_cache.get(namespace, cache_key, allow_expired=allow_expired)
+        except sqlite3.Error as e:
+            # 等待写锁超时按未命中处理
+            log = logger.warning if is_busy_error(e) else logger.error
+            log(f"Shared cache read failed for {namespace}:{cache_key}: {str(e)}")
+            return None
+        if shared is None:
+            return None
+        
+        text, expires_at = shared
+        # 同一次写入在两级缓存中的过期时间相差极小，留出余量避免把旧条目当成新结果
+        if newer_than is not None and expires_at is not None and expires_at <= newer_than + 1:
+            return None
+        ttl = expires_at - time.time() if expires_at is not None else None
+        value = self._decode(namespace, text)
+        # 过期的共享条目回填后仍为过期状态
+        cache.set(cache_key, value, ttl=ttl)
+        if namespace == "book_info":
+            self.library_index.add(cache_key, value)
+        return cache.get_entry(cache_key, allow_expired=True)
+    
+    def _cached_value(self, namespace: str, cache_key: str) -> Any:
+        """查询两级缓存并计入命中"""
+        entry = self._lookup(namespace, cache_key)
+        if entry is None:
+            return None
+        entry.hits += 1
+        entry.last_access = time.time()
+        return entry.value
+    
+    def _store(self, namespace: str, cache_key: str, value: Any):
+        """写入本进程缓存，并同步到共享缓存"""
+        cache = self._caches[namespace]
+        cache.set(cache_key, value)
+        if namespace == "book_info" and cache.enabled:
+            self.library_index.add(cache_key, value)
+        if self.shared_cache is None or not cache.enabled:
+            return
+        try:
+            self.shared_cache.set(namespace, cache_key, self._encode(value), ttl=cache.ttl)
+        except sqlite3.Error as e:
+            # 等待写锁超时时只保留本进程缓存
+            log = logger.warning if is_busy_error(e) else logger.error
+            log(f"Shared cache write failed for {namespace}:{cache_key}: {str(e)}")
+    
+    @staticmethod
+    def _encode(value: Any) -> str:
+        if isinstance(value, BookInfo):
+            value = value.dict()
+        return json.dumps(value, ensure_ascii=False)
+    
+    @staticmethod
+    def _decode(namespace: str, text: str) -> Any:
+        data = json.loads(text)
+        if namespace == "book_info":
+            return BookInfo(**data)
+        return data
+    
     def get_cached_book_info(self, book_name: str) -> Optional[BookInfo]:
         """获取缓存的书籍信息"""
-        cache_key = book_name.lower().strip()
-        return self.book_cache.get(cache_key)
+        return self._cached_value("book_info", normalize_book_name(book_name))
+    
+    def get_book_info_entry(self, book_name: str, allow_expired: bool = False) -> Optional[CacheEntry]:
+        """获取书籍信息的缓存条目（用于复用条目上已序列化的响应）"""
+        cache_key = normalize_book_name(book_name)
+        entry = self._lookup("book_info", cache_key, allow_expired=allow_expired)
+        if entry is not None:
+            entry.hits += 1
+            self._maybe_refresh_book_info(book_name, cache_key, entry)
+        return entry
+    
+    def get_report_entry(self, book_name: str, author: Optional[str] = None,
+                         allow_expired: bool = False) -> Optional[CacheEntry]:
+        """获取详细报告的缓存条目"""
+        entry = self._lookup("report", self._report_key(book_name, author), allow_expired=allow_expired)
+        if entry is not None:
+            entry.hits += 1
+        return entry
+    
+    def get_cached_report(self, book_name: str, author: Optional[str] = None) -> Optional[str]:
+        """获取缓存的详细报告"""
+        return self._cached_value("report", self._report_key(book_name, author))
+    
+    @staticmethod
+    def _report_key(book_name: str, author: Optional[str]) -> str:
+        return f"{normalize_book_name(book_name)}|{normalize_book_name(author or '')}"
+    
+    @staticmethod
+    def _qa_key(book_name: str, question: str) -> str:
+        return f"{normalize_book_name(book_name)}|{normalize_book_name(question)}"
+    
+    async def search_library(self, query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """在已缓存的书籍信息中检索，按相关度排序分页返回，不调用Gemini"""
+        if not query or not query.strip():
+            raise ValueError("Query cannot be empty")
+        if not (1 <= limit <= self.LIBRARY_SEARCH_MAX_LIMIT):
+            raise ValueError(f"Limit must be between 1 and {self.LIBRARY_SEARCH_MAX_LIMIT}")
+        if offset < 0:
+            raise ValueError("Offset must not be negative")
+        await self._sync_library()
+        result = self.library_index.search(query, limit=limit, offset=offset)
+        items = []
+        for item in result["results"]:
+            book_info = item["book"]
+            entry = self.book_cache.get_entry(item["key"], allow_expired=True)
+            items.append({
+                "title": book_info.title,
+                "author": book_info.author,
+                "genre": book_info.genre,
+                "year": book_info.year,
+                "rating": book_info.rating,
+                "score": item["score"],
+                # 已过期的条目在下次查询书籍信息时刷新
+                "stale": entry is None or entry.is_expired,
+            })
+        return {"query": query, "total": result["total"], "offset": offset, "limit": limit, "results": items}
+    
+    async def _sync_library(self):
+        """把其他worker写入共享缓存、本进程尚未见过的书籍回填到本进程缓存与检索索引
+
+        只补充到书籍信息缓存的容量上限，索引始终与缓存一致。共享缓存在线程中读取，不阻塞事件循环。
+        """
+        if (self.shared_cache is None or not self.book_cache.enabled
+                or time.time() - self._library_synced_at < LIBRARY_SYNC_INTERVAL):
+            return
+        self._library_synced_at = time.time()
+        capacity = self.BOOK_CACHE_MAX_SIZE - len(self.library_index)
+        if capacity <= 0:
+            return
+        known = set(self.library_index.books)
+        try:
+            books = await asyncio.to_thread(self._read_shared_books, known, capacity)
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache read failed while syncing library index: {str(e)}")
+            return
+        for key, text, expires_at in books:
+            if key in self.library_index:
+                continue
+            ttl = expires_at - time.time() if expires_at is not None else None
+            value = self._decode("book_info", text)
+            self.book_cache.set(key, value, ttl=ttl)
+            self.library_index.add(key, value)
+    
+    def _read_shared_books(self, known: set, limit: int) -> List[Tuple[str, str, Optional[float]]]:
+        """读取共享缓存中不在 known 里的书籍信息，最多 limit 条（阻塞，应在线程中调用）"""
+        books = []
+        for key in self.shared_cache.keys("book_info"):
+            if key in known:
+                continue
+            shared = self.shared_cache.get("book_info", key)
+            if shared is not None:
+                books.append((key, shared[0], shared[1]))
+                if len(books) >= limit:
+                    break
+        return books
     
     def clear_cache(self):
-        """清空缓存"""
+        """清空缓存（共享缓存一并清空，其他worker的本进程缓存在过期后失效）"""
         self.book_cache.clear()
+        self.library_index.clear()
+        self.report_cache.clear()
+        self.qa_cache.clear()
+        self.report_section_cache.clear()
+        self.preset_cache.clear()
+        if self.shared_cache is not None:
+            try:
+                for namespace in self._caches:
+                    self.shared_cache.clear(namespace)
+            except sqlite3.Error as e:
+                logger.error(f"Shared cache clear failed: {str(e)}")
     
-    def get_cache_stats(self) -> Dict[str, int]:
+    def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        return {
+        stats = {
             "total_cached_books": len(self.book_cache),
+            "total_cached_reports": len(self.report_cache),
+            "total_cached_answers": len(self.qa_cache),
+            "total_cached_report_sections": len(self.report_section_cache),
+            "total_cached_preset_answers": len(self.preset_cache),
+            "preset_hits": self.preset_hits,
+            "library_books": len(self.library_index),
+            "catalog_hits": self.catalog_hits,
+            "stale_served": self.stale_served,
+            "stale_revalidations": self.stale_revalidations,
+            "refresh_ahead": self.refresh_ahead_count,
             "cache_keys": list(self.book_cache.keys())
-        }
\ No newline at end of file
+        }
+        if self.shared_cache is not None:
+            try:
+                stats["shared_cache"] = {
+                    "books": self.shared_cache.count("book_info"),
+                    "reports": self.shared_cache.count("report"),
+                    "answers": self.shared_cache.count("qa"),
+                    "report_sections": self.shared_cache.count("report_section"),
+                    "preset_answers": self.shared_cache.count("preset"),
+                }
+            except sqlite3.Error as e:
+                logger.error(f"Shared cache stats failed: {str(e)}")
+        return stats
\ No newline at end of file
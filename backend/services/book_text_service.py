@@ -0,0 +1,353 @@
+import os
+import json
+import mmap
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import logging
+import zipfile
+import posixpath
+import threading
+import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from models.book_text import BookTextMeta, Passage
+from utils.helpers import normalize_book_name, validate_book_name
+from utils.text_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+COPY_BLOCK_SIZE = 1024 * 1024
+SUPPORTED_FORMATS = ("txt", "epub")
+# 检索时最多使用的查询词数
+MAX_QUERY_TERMS = 64
+
+class BookTextTooLargeError(Exception):
+    """上传的文件超过大小限制"""
+    pass
+
+class _XhtmlTextParser(HTMLParser):
+    """提取XHTML章节中的段落文本"""
+
+    BLOCK_TAGS = {"p", "div", "br", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "tr", "section"}
+    SKIP_TAGS = {"script", "style", "head", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs: List[str] = []
+        self._current: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._current.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        text = " ".join("".join(self._current).split())
+        if text:
+            self.paragraphs.append(text)
+        self._current = []
+
+class _LoadedText:
+    """已打开的分块存储与索引
+
+    分块文件通过mmap按需读取；倒排索引是磁盘上的SQLite FTS5表，
+    检索时只读取查询词的倒排列表，内存占用与书的篇幅无关。
+    """
+
+    def __init__(self, directory: str, meta: BookTextMeta):
+        self.meta = meta
+        self.offsets = array("Q")
+        with open(os.path.join(directory, "offsets.bin"), "rb") as f:
+            self.offsets.frombytes(f.read())
+        with open(os.path.join(directory, "chunks.bin"), "rb") as f:
+            # 只映射文件，读取片段时才按需载入对应的页
+            self.chunks = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else None
+        # 只读打开，索引文件不存在时报错而不是新建空库
+        index_uri = "file:{}?mode=ro".format(os.path.abspath(os.path.join(directory, "index.sqlite3")))
+        self.index = sqlite3.connect(index_uri, uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def chunk(self, chunk_id: int) -> str:
+        return self.chunks[self.offsets[chunk_id]:self.offsets[chunk_id + 1]].decode("utf-8")
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """按BM25得分返回 [(分块序号, 得分)]"""
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        match = " OR ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        with self._lock:
+            rows = self.index.execute(
+                "SELECT rowid, bm25(chunks_fts) FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        # FTS5的bm25()越小越相关，取负数作为得分
+        return [(chunk_id, -score) for chunk_id, score in rows]
+
+class BookTextService:
+    """上传的书籍全文：分块存储与检索
+
+    上传的TXT/EPUB按块写入磁盘，流式读取，不把整本书载入内存；
+    每本书在磁盘上建立SQLite FTS5倒排索引（中文按二元组分词，BM25排序），问答时只取最相关的若干片段放入提示词，
+    提示词长度与书的篇幅无关。检索时分块文件通过mmap按需读取，索引只读取查询词的倒排列表。
+    """
+
+    def __init__(self, storage_dir: str = "data/book_texts", chunk_chars: int = 800,
+                 max_bytes: int = 20 * 1024 * 1024, max_loaded: int = 4):
+        self.storage_dir = storage_dir
+        self.chunk_chars = max(100, chunk_chars)
+        self.max_bytes = max_bytes
+        self.max_loaded = max(1, max_loaded)
+        self._loaded: "OrderedDict[str, _LoadedText]" = OrderedDict()  # 最近使用的书，按目录名
+        self._lock = threading.Lock()
+
+    def get_meta(self, book_name: str) -> Optional[BookTextMeta]:
+        """获取已上传全文的信息，未上传时返回None"""
+        path = os.path.join(self._book_dir(book_name), "meta.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return BookTextMeta(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read book text meta {path}: {str(e)}")
+            return None
+
+    def ingest(self, book_name: str, file_obj: BinaryIO, filename: str) -> BookTextMeta:
+        """保存上传的文件并建立分块存储与索引（阻塞，应在线程中调用）"""
+        if not validate_book_name(book_name):
+            raise ValueError("Invalid book name")
+        text_format = self._detect_format(filename)
+        book_dir = self._book_dir(book_name)
+        os.makedirs(self.storage_dir, exist_ok=True)
+        build_dir = f"{book_dir}.tmp-{uuid.uuid4().hex[:8]}"
+        os.makedirs(build_dir)
+        try:
+            upload_path = os.path.join(build_dir, "upload")
+            self._save_upload(file_obj, upload_path)
+            if text_format == "epub":
+                paragraphs = self._iter_epub_paragraphs(upload_path)
+            else:
+                paragraphs = self._iter_txt_paragraphs(upload_path)
+            chunk_count, characters = self._build_store(paragraphs, build_dir)
+            os.remove(upload_path)
+            if not chunk_count:
+                raise ValueError("No text found in uploaded file")
+
+            meta = BookTextMeta(book_name=book_name, filename=filename, format=text_format,
+                                chunks=chunk_count, characters=characters, version=uuid.uuid4().hex)
+            with open(os.path.join(build_dir, "meta.json"), "w", encoding="utf-8") as f:
+                f.write(meta.json())
+            self._replace_dir(build_dir, book_dir)
+        except BaseException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+
+        logger.info(f"Ingested {text_format} text for {book_name}: {chunk_count} chunks, {characters} chars")
+        return meta
+
+    def delete(self, book_name: str) -> bool:
+        book_dir = self._book_dir(book_name)
+        if not os.path.isdir(book_dir):
+            return False
+        with self._lock:
+            self._loaded.pop(os.path.basename(book_dir), None)
+        shutil.rmtree(book_dir, ignore_errors=True)
+        return True
+
+    def search(self, book_name: str, query: str, top_k: int = 5) -> List[Passage]:
+        """检索与问题最相关的片段，按原文顺序返回（阻塞，应在线程中调用）"""
+        loaded = self._load(book_name)
+        if loaded is None:
+            return []
+        try:
+            top = loaded.search(query, top_k)
+        except sqlite3.Error as e:
+            logger.error(f"Book text search failed for {book_name}: {str(e)}")
+            return []
+        passages = [Passage(chunk_id=chunk_id, text=loaded.chunk(chunk_id), score=round(score, 4))
+                    for chunk_id, score in top]
+        return sorted(passages, key=lambda passage: passage.chunk_id)
+
+    def _load(self, book_name: str) -> Optional[_LoadedText]:
+        """打开书的分块存储与索引（最近使用的若干本保留在内存中）"""
+        meta = self.get_meta(book_name)
+        if meta is None:
+            return None
+        book_dir = self._book_dir(book_name)
+        key = os.path.basename(book_dir)
+        with self._lock:
+            loaded = self._loaded.get(key)
+            if loaded is not None and loaded.meta.version == meta.version:
+                self._loaded.move_to_end(key)
+                return loaded
+        try:
+            loaded = _LoadedText(book_dir, meta)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            # 读取期间被重新上传替换
+            logger.error(f"Failed to load book text {book_dir}: {str(e)}")
+            return None
+        with self._lock:
+            self._loaded[key] = loaded
+            self._loaded.move_to_end(key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return loaded
+
+    def _book_dir(self, book_name: str) -> str:
+        digest = hashlib.sha1(normalize_book_name(book_name).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.storage_dir, digest)
+
+    @staticmethod
+    def _detect_format(filename: str) -> str:
+        extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+        if extension not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported file type: {extension or filename}, expected .txt or .epub")
+        return extension
+
+    def _save_upload(self, file_obj: BinaryIO, path: str):
+        """分块复制上传的文件，超过大小限制时中止"""
+        size = 0
+        with open(path, "wb") as out:
+            while True:
+                block = file_obj.read(COPY_BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if size > self.max_bytes:
+                    raise BookTextTooLargeError(f"File exceeds {self.max_bytes} bytes")
+                out.write(block)
+
+    @staticmethod
+    def _iter_txt_paragraphs(path: str) -> Iterator[str]:
+        """逐行读取TXT，每个非空行视为一段"""
+        with open(path, "rb") as f:
+            head = f.read(64 * 1024)
+        encoding = "utf-8-sig"
+        try:
+            head.decode(encoding)
+        except UnicodeDecodeError as e:
+            # 截断在多字节字符中间不算解码失败
+            if e.start < len(head) - 4:
+                encoding = "gb18030"
+        with open(path, "r", encoding=encoding, errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+    def _iter_epub_paragraphs(self, path: str) -> Iterator[str]:
+        """按书脊（spine）顺序逐章读取EPUB的段落
+
+        解压后的总字节数同样受 max_bytes 限制，避免小文件解压出大量内容。
+        """
+        total = 0
+
+        def read(epub: zipfile.ZipFile, name: str) -> bytes:
+            nonlocal total
+            # 解压时不会超过条目记录的大小（否则校验失败），可以在解压前检查
+            total += epub.getinfo(name).file_size
+            if total > self.max_bytes:
+                raise BookTextTooLargeError(f"Decompressed EPUB content exceeds {self.max_bytes} bytes")
+            return epub.read(name)
+
+        try:
+            with zipfile.ZipFile(path) as epub:
+                container = ET.fromstring(read(epub, "META-INF/container.xml"))
+                rootfile = next(el for el in container.iter() if el.tag.endswith("rootfile"))
+                opf_path = rootfile.get("full-path")
+                opf = ET.fromstring(read(epub, opf_path))
+                manifest = {item.get("id"): item.get("href")
+                            for item in opf.iter() if item.tag.endswith("}item") or item.tag == "item"}
+                spine = [ref.get("idref")
+                         for ref in opf.iter() if ref.tag.endswith("itemref")]
+                base = posixpath.dirname(opf_path)
+                for idref in spine:
+                    href = manifest.get(idref)
+                    if not href:
+                        continue
+                    name = posixpath.normpath(posixpath.join(base, href.split("#")[0]))
+                    parser = _XhtmlTextParser()
+                    parser.feed(read(epub, name).decode("utf-8", errors="replace"))
+                    parser.close()
+                    yield from parser.paragraphs
+        except (zipfile.BadZipFile, KeyError, StopIteration, ET.ParseError) as e:
+            raise ValueError(f"Invalid EPUB file: {str(e)}")
+
+    def _build_store(self, paragraphs: Iterator[str], build_dir: str) -> Tuple[int, int]:
+        """把段落合并为不超过 chunk_chars 的分块写入磁盘，同时建立索引
+
+        索引为SQLite FTS5表（无内容表，只保存倒排列表），每个分块存入分好的词（中文二元组），
+        建索引时未写入的数据由SQLite按固定大小分批落盘，内存占用不随书的篇幅增长。
+        """
+        offsets = array("Q", [0])
+        characters = 0
+        index = sqlite3.connect(os.path.join(build_dir, "index.sqlite3"), isolation_level=None)
+        try:
+            # 构建目录中的临时文件，中断时整个目录被删除，不需要日志与同步写入
+            index.execute("PRAGMA journal_mode=OFF")
+            index.execute("PRAGMA synchronous=OFF")
+            index.execute("CREATE VIRTUAL TABLE chunks_fts USING fts5(tokens, content='', detail=full)")
+            index.execute("BEGIN")
+            with open(os.path.join(build_dir, "chunks.bin"), "wb") as out:
+                def write_chunk(text: str):
+                    data = text.encode("utf-8")
+                    out.write(data)
+                    index.execute("INSERT INTO chunks_fts (rowid, tokens) VALUES (?, ?)",
+                                  (len(offsets) - 1, " ".join(tokenize(text))))
+                    offsets.append(offsets[-1] + len(data))
+
+                current: List[str] = []
+                current_chars = 0
+                for paragraph in paragraphs:
+                    characters += len(paragraph)
+                    # 超长段落按长度切开
+                    pieces = [paragraph[i:i + self.chunk_chars] for i in range(0, len(paragraph), self.chunk_chars)]
+                    for piece in pieces:
+                        if current and current_chars + len(piece) > self.chunk_chars:
+                            write_chunk("\n".join(current))
+                            current, current_chars = [], 0
+                        current.append(piece)
+                        current_chars += len(piece)
+                if current:
+                    write_chunk("\n".join(current))
+            index.execute("COMMIT")
+            # 合并索引段，检索时每个词只需读取一个倒排列表
+            index.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('optimize')")
+        finally:
+            index.close()
+
+        with open(os.path.join(build_dir, "offsets.bin"), "wb") as f:
+            f.write(offsets.tobytes())
+        return len(offsets) - 1, characters
+
+    @staticmethod
+    def _replace_dir(build_dir: str, book_dir: str):
+        """用新建好的目录替换旧版本"""
+        old_dir = None
+        if os.path.isdir(book_dir):
+            old_dir = f"{book_dir}.old-{uuid.uuid4().hex[:8]}"
+            os.rename(book_dir, old_dir)
+        os.rename(build_dir, book_dir)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
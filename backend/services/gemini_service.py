@@ -1,17 +1,41 @@
 import os
+import time
 import logging
 import asyncio
-from typing import Optional, Dict, Any
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig
+import textwrap
+import threading
+from typing import Optional, Dict, Any, List
 from models.book import BookInfo
+from models.book_text import Passage
 from utils.helpers import clean_json_response
+from utils.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError
 from config.settings import settings
+from services.report_sections import REPORT_SECTIONS, ReportSection
+from services.model_router import ModelRouter, ModelRoute
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# google.generativeai 导入耗时较长（约占应用导入时间的一半），延迟到第一次使用时
+_genai = None
+_genai_lock = threading.Lock()
+
+def _load_genai():
+    """导入Gemini SDK"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                _genai = genai
+    return _genai
+
+def _generation_config(**kwargs):
+    """构建生成配置"""
+    from google.generativeai.types import GenerationConfig
+    return GenerationConfig(**kwargs)
+
 class GeminiBookInfoError(Exception):
     """Custom exception for when book info generation fails but we have a text response."""
     def __init__(self, message, raw_response=None):
@@ -21,15 +45,35 @@ class GeminiBookInfoError(Exception):
 class GeminiService:
     """Google Gemini API服务封装"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, max_concurrency: Optional[int] = None):
         """初始化Gemini服务"""
         self.api_key = api_key or settings.google_api_key or os.getenv('GOOGLE_API_KEY')
         if not self.api_key:
             raise ValueError("Google API key is required")
         
-        genai.configure(api_key=self.api_key)
         self.model_name = "gemini-2.5-flash"  # 默认模型
-        self.client = genai.GenerativeModel(self.model_name)
+        self._client = None  # 第一次使用时创建，见 warm_up
+        self._client_lock = threading.Lock()
+        self._model_clients: Dict[str, Any] = {}  # 模型名 -> 客户端，按路由结果取用
+        
+        # 本进程同时向Gemini发起的请求上限
+        self.max_concurrency = max(1, max_concurrency or settings.upstream_concurrency)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.inflight = 0  # 正在进行的请求数
+        self.waiting = 0  # 等待并发名额的请求数
+        
+        # 按 模型:操作 划分的熔断器；上游持续出错时快速失败
+        self.breakers = CircuitBreakerRegistry(
+            failure_rate=settings.circuit_failure_rate,
+            min_calls=settings.circuit_min_calls,
+            window_seconds=settings.circuit_window_seconds,
+            slow_call_seconds=settings.circuit_slow_call_seconds,
+            open_seconds=settings.circuit_open_seconds,
+            half_open_calls=settings.circuit_half_open_calls
+        )
+        # 报告生成本身耗时较长，使用单独的慢调用阈值
+        self.breakers.overrides["report"] = {"slow_call_seconds": settings.circuit_report_slow_call_seconds}
+        self.breakers.overrides["report_section"] = {"slow_call_seconds": settings.circuit_report_slow_call_seconds}
         
         # 可用模型选项
         self.model_options = {
@@ -38,12 +82,118 @@ class GeminiService:
             "2.0-flash": "gemini-2.0-flash",
             "2.0-thinking-exp": "gemini-2.0-flash-thinking-exp-01-21",
         }
+        
+        # 每次调用按请求特征选择模型与输出上限
+        self.router = ModelRouter(
+            default_model=self.model_name,
+            fast_model=settings.route_fast_model,
+            quality_model=settings.route_quality_model,
+            enabled=settings.routing_enabled,
+            short_question_chars=settings.route_short_question_chars,
+            fast_max_tokens=settings.route_fast_max_tokens
+        )
+    
+    @property
+    def is_ready(self) -> bool:
+        """SDK是否已导入且客户端已创建"""
+        return self._client is not None
+    
+    @property
+    def client(self):
+        """Gemini客户端（首次访问时创建）"""
+        if self._client is None:
+            self.warm_up()
+        return self._client
+    
+    def warm_up(self):
+        """导入SDK并创建客户端（阻塞，可在后台线程中提前执行）"""
+        with self._client_lock:
+            if self._client is None:
+                genai = _load_genai()
+                genai.configure(api_key=self.api_key)
+                self._client = genai.GenerativeModel(self.model_name)
+                self._model_clients[self.model_name] = self._client
+    
+    async def _get_client(self):
+        """获取客户端，必要时在线程中完成初始化，避免阻塞事件循环"""
+        if self._client is None:
+            await asyncio.to_thread(self.warm_up)
+        return self._client
+    
+    async def _model_client(self, model_name: str):
+        """获取指定模型的客户端（按模型名复用，不影响默认客户端）"""
+        await self._get_client()
+        client = self._model_clients.get(model_name)
+        if client is None:
+            client = self._model_clients.setdefault(model_name, _load_genai().GenerativeModel(model_name))
+        return client
+    
+    async def _generate_routed(self, route: ModelRoute, prompt, operation: str):
+        """按路由结果选择客户端与生成配置并调用"""
+        client = await self._model_client(route.model)
+        config = _generation_config(
+            temperature=route.temperature,
+            max_output_tokens=route.max_output_tokens
+        )
+        return await self._generate(client, prompt, config, operation=operation)
+    
+    async def _generate(self, client, prompt, config, operation: str = "generate"):
+        """调用Gemini生成内容（受熔断器与并发上限约束）
+
+        熔断器打开时抛出 CircuitOpenError，不占用并发名额也不等待上游。
+        """
+        model = getattr(client, "model_name", self.model_name).replace("models/", "")
+        breaker = self.breakers.get(model, operation)
+        breaker.before_call()
+        
+        if self._semaphore is None:
+            # 在事件循环中创建，保证绑定到正确的循环
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            breaker.release()
+            raise
+        finally:
+            self.waiting -= 1
+        
+        self.inflight += 1
+        start = time.monotonic()
+        try:
+            response = await asyncio.to_thread(
+                client.generate_content,
+                contents=prompt,
+                generation_config=config
+            )
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure(time.monotonic() - start, str(e))
+            raise
+        finally:
+            self.inflight -= 1
+            self._semaphore.release()
+        
+        breaker.record_success(time.monotonic() - start)
+        return response
+    
+    async def probe(self, timeout: float = 10) -> Dict[str, Any]:
+        """探测上游是否可用：查询模型元数据，不消耗生成配额"""
+        await self._get_client()
+        genai = _load_genai()
+        model = await asyncio.wait_for(
+            asyncio.to_thread(genai.get_model, f"models/{self.model_name}"),
+            timeout=timeout
+        )
+        return {"model": getattr(model, "name", self.model_name)}
     
     def set_model(self, model_key: str):
-        """设置使用的模型"""
+        """设置默认模型（只影响之后的路由结果，不重建共享的客户端）"""
         if model_key in self.model_options:
-            self.model_name = self.model_options[model_key]
-            self.client = genai.GenerativeModel(self.model_name)
+            self.router.default_model = self.model_options[model_key]
         else:
             raise ValueError(f"Invalid model key: {model_key}")
     
@@ -52,17 +202,8 @@ class GeminiService:
         content_text = f"No valid response from Gemini for book: {book_name}"  # Default error
         try:
             prompt = self._build_book_info_prompt(book_name)
-
-            config = GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=4000
-            )
-
-            response = await asyncio.to_thread(
-                self.client.generate_content,
-                contents=prompt,
-                generation_config=config
-            )
+            route = self.router.route("book_info")
+            response = await self._generate_routed(route, prompt, operation="book_info")
 
             if response and hasattr(response, 'candidates') and response.candidates:
                 candidate = response.candidates[0]
@@ -88,6 +229,8 @@ class GeminiService:
                 not_found_reason="AI service failed to produce a valid response."
             )
 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error in generate_book_info: {str(e)}")
             return BookInfo(
@@ -96,23 +239,55 @@ class GeminiService:
                 not_found_reason=f"An unexpected error occurred: {str(e)}"
             )
     
-    async def answer_question(self, book_name: str, question: str) -> Optional[str]:
-        """回答关于书籍的问题"""
+    async def generate_book_details(self, title: str, author: Optional[str],
+                                    fields: List[str]) -> Optional[Dict[str, Any]]:
+        """只生成书目库中缺少的描述性字段（如简介、摘要），返回 {字段: 内容}"""
         try:
-            prompt = self._build_qa_prompt(book_name, question)
-            
-            # 生成配置
-            config = GenerationConfig(
-                temperature=0.5,
-                max_output_tokens=2000
-            )
+            prompt = self._build_book_details_prompt(title, author, fields)
+            route = self.router.route("book_details")
+            response = await self._generate_routed(route, prompt, operation="book_details")
+
+            if response and hasattr(response, 'candidates') and response.candidates:
+                candidate = response.candidates[0]
+                if hasattr(candidate, 'content') and candidate.content:
+                    raw_text = ''.join(part.text for part in candidate.content.parts if hasattr(part, 'text'))
+                    details = clean_json_response(raw_text)
+                    if details:
+                        # 转换为字符串以匹配BookInfo模型，无法转换的字段丢弃
+                        values = {field: self._detail_text(details.get(field)) for field in fields}
+                        return {field: value for field, value in values.items() if value}
+
+            logger.error(f"Failed to generate book details for: {title}")
+            return None
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.error(f"Error generating book details: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _detail_text(value: Any) -> Optional[str]:
+        """把模型返回的字段值转换为字符串：列表按逗号连接，对象等其他结构返回None"""
+        if isinstance(value, list):
+            parts = [str(item).strip() for item in value if isinstance(item, (str, int, float)) and str(item).strip()]
+            return ", ".join(parts) or None
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            return str(value).strip() or None
+        return None
+    
+    async def answer_question(self, book_name: str, question: str, hint: Optional[str] = None,
+                              passages: Optional[List[Passage]] = None,
+                              notes: Optional[List[Passage]] = None) -> Optional[str]:
+        """回答关于书籍的问题（hint 为客户端的模型偏好，passages 为检索到的原文片段，
+        notes 为之前生成的报告与回答，只作参考）"""
+        passage_section = self._build_passage_section(passages) + self._build_notes_section(notes)
+        route = self.router.route("qa", question=question, context=passage_section, hint=hint)
+        try:
+            prompt = self._build_qa_prompt(book_name, question, passage_section, has_passages=bool(passages))
             
             # 调用Gemini API
-            response = await asyncio.to_thread(
-                self.client.generate_content,
-                contents=prompt,
-                generation_config=config
-            )
+            response = await self._generate_routed(route, prompt, operation="qa")
             
             # 解析响应
             if response and hasattr(response, 'candidates') and response.candidates:
@@ -126,27 +301,25 @@ class GeminiService:
             logger.error(f"Failed to generate answer for question: {question}")
             return None
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error answering question: {str(e)}")
             return None
     
-    async def answer_question_with_context(self, book_name: str, question: str, context: str = "") -> Optional[str]:
+    async def answer_question_with_context(self, book_name: str, question: str, context: str = "",
+                                           hint: Optional[str] = None,
+                                           passages: Optional[List[Passage]] = None,
+                                           notes: Optional[List[Passage]] = None) -> Optional[str]:
         """回答关于书籍的问题（带对话上下文）"""
+        passage_section = self._build_passage_section(passages) + self._build_notes_section(notes)
+        route = self.router.route("qa_context", question=question, context=context + passage_section, hint=hint)
         try:
-            prompt = self._build_qa_prompt_with_context(book_name, question, context)
-            
-            # 生成配置
-            config = GenerationConfig(
-                temperature=0.5,
-                max_output_tokens=2000
-            )
+            prompt = self._build_qa_prompt_with_context(book_name, question, context, passage_section,
+                                                        has_passages=bool(passages))
             
             # 调用Gemini API
-            response = await asyncio.to_thread(
-                self.client.generate_content,
-                contents=prompt,
-                generation_config=config
-            )
+            response = await self._generate_routed(route, prompt, operation="qa_context")
             
             # 解析响应
             if response and hasattr(response, 'candidates') and response.candidates:
@@ -160,6 +333,8 @@ class GeminiService:
             logger.error(f"Failed to generate answer for question with context: {question}")
             return None
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error answering question with context: {str(e)}")
             return None
@@ -168,24 +343,11 @@ class GeminiService:
     async def generate_detailed_report(self, book_name: str, author: Optional[str] = None) -> Optional[str]:
         """生成详细的书籍报告"""
         try:
-            # 为了速度，我们使用 gemini-2.5-flash 模型来生成报告
-            pro_model_name = self.model_options.get("2.5-flash", "gemini-2.5-flash")
-            pro_client = genai.GenerativeModel(pro_model_name)
-
             prompt = self._build_detailed_report_prompt(book_name, author)
 
-            # 为长篇报告生成特定配置
-            config = GenerationConfig(
-                temperature=0.4,
-                max_output_tokens=8192  # 增加Token上限以生成详细报告
-            )
-
-            # 调用Gemini API
-            response = await asyncio.to_thread(
-                pro_client.generate_content,
-                contents=prompt,
-                generation_config=config
-            )
+            # 长篇报告使用更高的输出上限
+            route = self.router.route("report")
+            response = await self._generate_routed(route, prompt, operation="report")
 
             # 解析响应
             if response and hasattr(response, 'candidates') and response.candidates:
@@ -197,11 +359,38 @@ class GeminiService:
                     )
 
             logger.error(f"未能为书籍生成详细报告：{book_name}")
-            return "生成详细报告失败，请稍后再试。"
+            return None
 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"生成详细报告时出错：{str(e)}")
-            return f"生成报告时发生错误: {str(e)}"
+            return None
+
+    async def generate_report_section(self, book_name: str, author: Optional[str],
+                                      section: ReportSection) -> Optional[str]:
+        """生成详细报告中的单个章节"""
+        try:
+            prompt = self._build_report_section_prompt(book_name, author, section)
+            route = self.router.route("report_section", max_output_tokens=section.max_output_tokens)
+            response = await self._generate_routed(route, prompt, operation="report_section")
+
+            if response and hasattr(response, 'candidates') and response.candidates:
+                candidate = response.candidates[0]
+                if hasattr(candidate, 'content') and candidate.content:
+                    return ''.join(
+                        part.text for part in candidate.content.parts
+                        if hasattr(part, 'text')
+                    )
+
+            logger.error(f"未能生成报告章节：{book_name} / {section.id}")
+            return None
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.error(f"生成报告章节时出错：{section.id}: {str(e)}")
+            return None
 
     def _build_book_info_prompt(self, book_name: str) -> str:
         """构建书籍信息查询提示词"""
@@ -236,19 +425,73 @@ class GeminiService:
 
 请开始搜索并整理信息："""
     
-    def _build_qa_prompt(self, book_name: str, question: str) -> str:
-        """构建问答提示词"""
-        return f"""你是一个专业的图书阅读助手，专门回答关于书籍内容的问题。
+    def _build_book_details_prompt(self, title: str, author: Optional[str], fields: List[str]) -> str:
+        """构建补充书籍描述信息的提示词"""
+        field_descriptions = {
+            "author": "作者姓名",
+            "description": "书籍简介（详细的书籍介绍，200-300字）",
+            "summary": "内容摘要（书籍主要内容和主题概述，300-500字）",
+            "genre": "类型/分类（如：科幻、小说、历史等）",
+        }
+        field_lines = "\n".join(f"- {field}: {field_descriptions[field]}" for field in fields)
+        author_line = f"\n作者：{author}" if author else ""
+        return f"""你是一个专业的图书信息查询助手。书籍的出版信息已经确定，请只补充下列字段。
 
+书籍名称：{title}{author_line}
+
+请以JSON格式返回结果，只包含以下字段：
+{field_lines}
+
+要求：
+1. 内容必须与上面这本书（书名和作者）一致
+2. 如果某些信息确实无法获取，请将对应字段设为null
+3. 返回格式必须是严格有效的JSON，不要包含任何其他文字说明"""
+
+    def _build_passage_section(self, passages: Optional[List[Passage]]) -> str:
+        """构建原文片段部分，总长度不超过 book_text_max_context_chars"""
+        if not passages:
+            return ""
+        budget = settings.book_text_max_context_chars
+        lines = []
+        for number, passage in enumerate(passages, 1):
+            text = passage.text[:budget]
+            if not text:
+                break
+            lines.append(f"[{number}] {text}")
+            budget -= len(text)
+        return "\n以下是书中与问题相关的原文片段：\n" + "\n\n".join(lines) + "\n\n"
+
+    def _build_notes_section(self, notes: Optional[List[Passage]]) -> str:
+        """构建之前生成的报告与回答部分（不是书中原文），总长度不超过 book_text_max_context_chars"""
+        if not notes:
+            return ""
+        budget = settings.book_text_max_context_chars
+        lines = []
+        for number, note in enumerate(notes, 1):
+            text = note.text[:budget]
+            if not text:
+                break
+            lines.append(f"({number}) {text}")
+            budget -= len(text)
+        return ("\n以下是之前为这本书生成的分析笔记与回答，仅供参考，并非书中原文，不要作为原文引用：\n"
+                + "\n\n".join(lines) + "\n\n")
+
+    def _build_qa_prompt(self, book_name: str, question: str, passage_section: str = "",
+                         has_passages: bool = False) -> str:
+        """构建问答提示词（has_passages 表示 passage_section 中含有书中原文片段）"""
+        source_hint = "请优先依据上面的原文片段回答，必要时可引用原文。" if has_passages else ""
+        return f"""你是一个专业的图书阅读助手，专门回答关于书籍内容的问题。
+{passage_section}
 书籍名称：{book_name}
 用户问题：{question}
 
-请基于这本书的内容和相关信息，准确、详细地回答用户的问题。如果信息不足，请说明需要更多信息。
+请基于这本书的内容和相关信息，准确、详细地回答用户的问题。{source_hint}如果信息不足，请说明需要更多信息。
 回答要清晰易懂，结构合理。
 
 重要提示：请确保您的整个回复都使用纯文本格式，避免使用任何Markdown语法（例如，不要使用`#`、`*`、`-`、`>`或代码块）来格式化您的回答。请使用自然的段落分隔来组织内容。"""
     
-    def _build_qa_prompt_with_context(self, book_name: str, question: str, context: str) -> str:
+    def _build_qa_prompt_with_context(self, book_name: str, question: str, context: str,
+                                      passage_section: str = "", has_passages: bool = False) -> str:
         """构建带上下文的问答提示词"""
         context_section = f"""
 对话历史：
@@ -256,10 +499,12 @@ class GeminiService:
 
 """ if context.strip() else ""
         
-        return f"""你是一个专业的图书阅读助手，专门回答关于书籍内容的问题。{context_section}书籍名称：{book_name}
+        source_hint = "请优先依据原文片段回答，必要时可引用原文。" if has_passages else ""
+
+        return f"""你是一个专业的图书阅读助手，专门回答关于书籍内容的问题。{context_section}{passage_section}书籍名称：{book_name}
 用户问题：{question}
 
-请基于这本书的内容和相关信息，准确、详细地回答用户的问题。回答时要考虑之前的对话历史，保持连贯性和上下文关联性。
+请基于这本书的内容和相关信息，准确、详细地回答用户的问题。{source_hint}回答时要考虑之前的对话历史，保持连贯性和上下文关联性。
 如果信息不足，请说明需要更多信息。
 回答要清晰易懂，结构合理。
 
@@ -267,66 +512,55 @@ class GeminiService:
     
 
     def _build_detailed_report_prompt(self, book_name: str, author: Optional[str] = None) -> str:
-        """构建生成详细书籍报告的提示词"""
+        """构建生成详细书籍报告的提示词（各部分的写作要求取自 REPORT_SECTIONS）"""
         author_info = f"作者：{author}" if author else ""
+        sections = "\n\n".join(
+            f"{index}.  **{section.title}：**\n" + textwrap.indent(section.instructions, "    ")
+            for index, section in enumerate(REPORT_SECTIONS, 1)
+        )
         return f"""我希望你扮演一位深刻的书籍分析专家，运用你的专业知识和洞察力，为我剖析一本书。请根据文末提供的书籍信息，生成一份极其详尽且富有深度的分析报告。
 
 **报告的核心目标是：** 彻底挖掘并清晰阐释书籍的**核心洞见**与**主要观点**，同时全面覆盖其他重要分析维度。
 
 请在报告中包含以下方面的内容，并确保分析的深度和广度：
 
-1.  **基本信息：**
-    *   作者简介：深入介绍作者的学术/创作背景、知识体系、写作风格特点、所属流派或领域。提及可能深刻影响本书创作的其他关键作品、人生经历或思想转变。
-    *   出版信息：首次出版的确切时间与背景。
-    *   书籍分类：精准定位本书所属的大类（如社科、哲学、文学、历史、科普、心理学、传记等），并尽可能细化至具体子领域（如社科中的批判理论、人类学民族志；文学中的魔幻现实主义、成长小说等）。
-
-2.  **核心内容精粹：**
-    *   **（重点）** 提纲挈领地概述全书探讨的核心议题、试图解答的关键问题或（若是小说）驱动情节发展的核心冲突与脉络。
-    *   梳理全书的宏观结构（如章节安排、逻辑递进关系、叙事框架），点明各主要部分的关键内容和功能。
+{sections}
 
-3.  **【重中之重】核心洞见与主要观点深度剖析：**
-    *   **（极其重点）** **集中火力、不吝篇幅地**分析和提炼书中提出的**最核心、最具原创性、最具启发性的深刻洞见和关键论断**。作者通过本书究竟想向世界传达什么根本性的信息？
-    *   详细阐述这些核心观点是如何被论证的？作者运用了哪些证据、逻辑或叙事技巧来支撑它们？
-    *   这些观点的新颖性、颠覆性或深刻性体现在何处？它们挑战了哪些传统认知或流行观念？
-    *   （如果是小说）深入解读其核心主题（如爱、死亡、自由、正义等）、反复出现的象征意象、人物弧光背后揭示的人性或社会现实。
+请确保你的分析报告展现出真正的专家水准：**洞察深刻、论证严谨、信息翔实、结构清晰、语言精练且富有启发性。**
 
-4.  **关键概念与理论框架解读：**
-    *   识别并透彻解释书中反复出现、或对理解核心观点至关重要的**独特概念、术语、理论模型或分析框架**。
-    *   阐明这些概念的精确内涵、来源（是作者原创、借用还是批判性发展？），以及它们在构建全书论证体系或叙事世界中的核心作用。
+**重要提示**：请确保您的整个回复都使用纯文本格式，避免使用任何Markdown语法（例如，不要使用`#`、`*`、`-`、`>`或代码块）来格式化您的回答。请使用自然的段落分隔来组织内容。
 
-5.  **书中名言警句/精彩摘录：**
-    *   精选书中**最能体现核心思想、语言精辟、发人深省或极具代表性**的名言警句、经典段落。
-    *   摘录原文，并可选择性地附上简要的语境说明或意义解读，以展现其精华所在。
+如果书籍信息不足或无法进行详细分析，请在报告开头明确说明原因。
 
-6.  **书籍评价、争议与深远影响：**
-    *   客观总结本书在学术界、评论界及不同读者群体中的主流评价，务必包含**赞誉和批评**两方面的主要声音。
-    *   本书自问世以来，在思想界、特定学科领域、社会文化层面或后续创作中引发了哪些具体而重要的影响？（例如：开创了新的研究范式、引发了重大社会讨论、成为某领域的奠基之作、被广泛引用、获得重大奖项等）。
-    *   是否存在围绕本书的著名争议、重要的学术辩论或持续的批评焦点？具体内容是什么？
-    *   时效性与现代审视： 根据最新的科学研究、学术进展或社会观念变迁，评估本书内容的时代局限性。明确指出书中是否有观点因后续发展而被认为过时、存在错误，或者需要进行补充、修正和批判性看待？
 
-7.  **阅读策略与进阶建议：**
-    *   为渴望深度理解本书的读者提供具体的阅读方法建议：需要哪些学科背景或知识储备？阅读时应特别留意哪些线索或论证层次？适合快速把握脉络还是需要字斟句酌地精读？推荐采用何种笔记法（如思维导图、章节摘要、概念卡片）？
-    *   推荐哪些有助于加深理解的辅助阅读材料？（如：作者的其他著作、相关的学术论文、评论文章、纪录片、访谈、同一主题的其他经典书籍等）。
+---
+**需要分析的书籍信息：**
+书名：{book_name}
+{author_info}
+"""
 
-8.  **目标读者画像：**
-    *   清晰描绘本书最适合的读者群体特征：是专业研究者、高校学生、特定行业从业人员、对特定议题有浓厚兴趣的公众读者，还是寻求特定情感共鸣或人生启迪的读者？
-    *   阅读本书可能需要读者具备哪些先验的知识基础、思维能力或兴趣偏好？
+    def _build_report_section_prompt(self, book_name: str, author: Optional[str],
+                                     section: ReportSection) -> str:
+        """构建生成单个报告章节的提示词
 
-9.  **同类书比较与独特定位：**
-    *   列举若干本探讨相似主题、领域或体裁的重要书籍。
-    *   **着重对比分析**：本书与这些同类书籍相比，在核心观点、研究方法、论证风格、叙事策略、材料选择、结论或整体基调上有哪些**显著的异同**？本书的独特性和不可替代的价值体现在哪里？
+        前半部分（角色、书籍信息、格式要求）对所有章节相同，各章节只在末尾的写作要求上不同。
+        """
+        author_info = f"作者：{author}" if author else ""
+        return f"""我希望你扮演一位深刻的书籍分析专家，运用你的专业知识和洞察力，为我剖析一本书。这份分析报告分为多个部分，由不同的撰稿人分别撰写，你负责其中的一个部分。
 
-请确保你的分析报告展现出真正的专家水准：**洞察深刻、论证严谨、信息翔실、结构清晰、语言精练且富有启发性。**
+**需要分析的书籍信息：**
+书名：{book_name}
+{author_info}
 
-**重要提示**：请确保您的整个回复都使用纯文本格式，避免使用任何Markdown语法（例如，不要使用`#`、`*`、`-`、`>`或代码块）来格式化您的回答。请使用自然的段落分隔来组织内容。
+**报告的核心目标是：** 彻底挖掘并清晰阐释书籍的**核心洞见**与**主要观点**，同时全面覆盖其他重要分析维度。请确保分析展现出真正的专家水准：洞察深刻、论证严谨、信息翔实、结构清晰、语言精练且富有启发性。
 
-如果书籍信息不足或无法进行详细分析，请在报告开头明确说明原因。
+**重要提示**：请确保您的整个回复都使用纯文本格式，避免使用任何Markdown语法（例如，不要使用`#`、`*`、`-`、`>`或代码块）来格式化您的回答。请使用自然的段落分隔来组织内容。不要重复章节标题，也不要撰写其他部分的内容。
 
+如果书籍信息不足或无法进行详细分析，请简要说明原因。
 
 ---
-**需要分析的书籍信息：**
-书名：{book_name}
-{author_info}
+**你负责撰写的部分：{section.title}**
+{section.instructions}
 """
 
     def _handle_api_error(self, error: Exception) -> str:
@@ -0,0 +1,174 @@
+import os
+import time
+import asyncio
+import logging
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, Union
+from utils.response_cache import PreparedResponse, prepare_json_response
+
+logger = logging.getLogger(__name__)
+
+# 检查函数返回 (是否通过, 详情)，可以是普通函数或协程函数
+CheckResult = Tuple[bool, Dict[str, Any]]
+CheckFunc = Callable[[], Union[CheckResult, Awaitable[CheckResult]]]
+
+class HealthCheck:
+    """注册的单项检查"""
+
+    __slots__ = ("name", "func", "interval", "timeout", "critical",
+                 "ok", "detail", "checked_at", "duration", "next_run", "running")
+
+    def __init__(self, name: str, func: CheckFunc, interval: float, timeout: float, critical: bool):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.timeout = timeout
+        self.critical = critical  # 非关键检查失败时只标记为degraded，不影响就绪
+        self.ok: Optional[bool] = None  # 尚未执行
+        self.detail: Dict[str, Any] = {}
+        self.checked_at: Optional[float] = None
+        self.duration = 0.0
+        self.next_run = 0.0
+        self.running = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "critical": self.critical,
+            "checked_at": self.checked_at,
+            "duration_ms": round(self.duration * 1000, 1),
+            "detail": self.detail,
+        }
+
+class HealthService:
+    """存活与就绪探针
+
+    各项检查在后台按各自的间隔执行，结果汇总成预先序列化好的响应，
+    探针请求只返回缓存的字节，不做任何检查或上游调用。
+    """
+
+    def __init__(self, tick: float = 1.0):
+        self.tick = tick
+        self.checks: Dict[str, HealthCheck] = {}
+        self.started_at = time.time()
+        self._task: Optional[asyncio.Task] = None
+        self._check_tasks: Set[asyncio.Task] = set()
+        self._ready = False
+        self._readiness: PreparedResponse = self._build_readiness()
+        self._liveness: PreparedResponse = prepare_json_response({
+            "success": True,
+            "data": {"status": "alive", "pid": os.getpid(), "started_at": self.started_at},
+            "message": "Service is alive"
+        })
+
+    def register(self, name: str, func: CheckFunc, interval: float = 5.0,
+                 timeout: float = 5.0, critical: bool = True):
+        """注册检查项"""
+        self.checks[name] = HealthCheck(name, func, interval, timeout, critical)
+        self._readiness = self._build_readiness()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def liveness(self) -> PreparedResponse:
+        return self._liveness
+
+    def readiness(self) -> Tuple[int, PreparedResponse]:
+        """返回 (状态码, 响应)"""
+        return (200 if self._ready else 503), self._readiness
+
+    async def start(self):
+        """在后台定期执行检查；首轮检查完成前就绪探针返回503"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        tasks = list(self._check_tasks)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def refresh(self, force: bool = False):
+        """执行到期的检查并等待完成"""
+        await asyncio.gather(*(self._run_check(check) for check in self._due_checks(force)))
+
+    def _due_checks(self, force: bool = False):
+        now = time.monotonic()
+        return [check for check in self.checks.values()
+                if not check.running and (force or check.next_run <= now)]
+
+    async def _loop(self):
+        # 每项检查单独运行，较慢的上游探测不会推迟其他检查的刷新
+        while True:
+            for check in self._due_checks():
+                task = asyncio.create_task(self._run_check(check))
+                self._check_tasks.add(task)
+                task.add_done_callback(self._check_tasks.discard)
+            await asyncio.sleep(self.tick)
+
+    async def _run_check(self, check: HealthCheck):
+        """执行单项检查并重建缓存的响应"""
+        check.running = True
+        start = time.monotonic()
+        try:
+            result = check.func()
+            if asyncio.iscoroutine(result):
+                result = await asyncio.wait_for(result, timeout=check.timeout)
+            check.ok, check.detail = result
+        except asyncio.TimeoutError:
+            check.ok, check.detail = False, {"error": f"Timed out after {check.timeout}s"}
+        except Exception as e:
+            check.ok, check.detail = False, {"error": str(e)}
+        finally:
+            check.running = False
+        check.duration = time.monotonic() - start
+        check.checked_at = time.time()
+        check.next_run = time.monotonic() + check.interval
+        self._readiness = self._build_readiness()
+
+    def _build_readiness(self) -> PreparedResponse:
+        """根据最近一次检查结果生成就绪响应"""
+        # 未执行过的关键检查视为未就绪
+        critical_failed = [c.name for c in self.checks.values() if c.critical and not c.ok]
+        degraded = [c.name for c in self.checks.values() if not c.critical and c.ok is False]
+        self._ready = not critical_failed
+
+        if critical_failed:
+            status = "not_ready"
+        elif degraded:
+            status = "degraded"
+        else:
+            status = "ready"
+
+        data = {
+            "status": status,
+            "failed": critical_failed,
+            "degraded": degraded,
+            "checks": {name: check.to_dict() for name, check in self.checks.items()},
+            "generated_at": time.time(),
+        }
+        if self._ready:
+            return prepare_json_response({"success": True, "data": data, "message": "Service is ready"})
+        return prepare_json_response({
+            "success": False,
+            "data": data,
+            "error": "Service is not ready",
+            "message": f"Failed checks: {', '.join(critical_failed)}"
+        })
+
+def storage_check(path: str) -> CheckFunc:
+    """检查目录是否可写（在线程中执行，磁盘卡住时不阻塞事件循环）"""
+    def write_probe():
+        os.makedirs(path, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path, prefix=".health-", delete=True) as f:
+            f.write(b"ok")
+            f.flush()
+
+    async def check() -> CheckResult:
+        await asyncio.to_thread(write_probe)
+        return True, {"path": path}
+    return check
@@ -0,0 +1,96 @@
+import bisect
+from typing import Any, Dict, List
+from models.book import BookInfo
+from utils.text_index import BM25Index, tokenize
+
+# 各字段在索引中的权重（词频倍数），书名与作者匹配排在简介匹配之前
+FIELD_WEIGHTS = (
+    ("title", 4),
+    ("author", 3),
+    ("genre", 2),
+    ("description", 1),
+    ("summary", 1),
+)
+
+# 查询末尾未输完的词最多扩展的词数
+MAX_PREFIX_EXPANSIONS = 30
+
+class LibraryIndex:
+    """已缓存书籍信息的倒排索引
+
+    书籍信息写入缓存时增量更新，按书名、作者、类型、简介和摘要做BM25排序检索，不调用Gemini。
+    查询的最后一个词按前缀匹配，便于客户端边输入边补全。
+    """
+
+    def __init__(self):
+        self.index = BM25Index()
+        self.books: Dict[str, BookInfo] = {}  # 缓存键 -> 书籍信息
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    def __len__(self) -> int:
+        return len(self.books)
+
+    def __contains__(self, cache_key: str) -> bool:
+        return cache_key in self.books
+
+    def add(self, cache_key: str, book_info: BookInfo):
+        """添加或更新一本书；未找到的书籍不索引"""
+        if not book_info.is_found:
+            self.remove(cache_key)
+            return
+        tokens: List[str] = []
+        for field, weight in FIELD_WEIGHTS:
+            tokens.extend(tokenize(getattr(book_info, field) or "") * weight)
+        self.index.add_tokens(cache_key, tokens)
+        self.books[cache_key] = book_info
+        self._vocabulary_dirty = True
+
+    def remove(self, cache_key: str):
+        if self.books.pop(cache_key, None) is not None:
+            self.index.remove(cache_key)
+            self._vocabulary_dirty = True
+
+    def clear(self):
+        self.index.clear()
+        self.books.clear()
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """返回 {"total": 匹配总数, "results": [{"key", "score", "book"}]}"""
+        tokens = self._query_tokens(query)
+        total, top = self.index.search_tokens(tokens, limit=limit, offset=offset)
+        return {
+            "total": total,
+            "results": [
+                {"key": cache_key, "score": round(score, 4), "book": self.books[cache_key]}
+                for cache_key, score in top
+            ],
+        }
+
+    def _query_tokens(self, query: str) -> List[str]:
+        """分词后把最后一个未输完的词扩展为以它开头的已有词"""
+        tokens = tokenize(query)
+        if not tokens or query != query.rstrip():
+            return tokens
+        last = tokens[-1]
+        # 字母数字词按前缀扩展；单个汉字扩展为以它开头的二元组
+        if last[0] >= "぀" and len(last) > 1:
+            return tokens
+        expansions = [term for term in self._prefix_terms(last) if term != last]
+        return tokens + expansions[:MAX_PREFIX_EXPANSIONS]
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self.index.postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+            if len(terms) > MAX_PREFIX_EXPANSIONS:
+                break
+        return terms
@@ -0,0 +1,91 @@
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# 客户端可传入的模型偏好
+MODEL_HINTS = ("fast", "balanced", "quality")
+
+class ModelRoute(BaseModel):
+    """单次调用使用的模型与生成参数"""
+    model: str
+    max_output_tokens: int
+    temperature: float
+    reason: str
+
+class ModelRouter:
+    """按请求特征为每次调用选择模型与输出长度上限
+
+    路由结果随调用传递，不修改 GeminiService 的共享状态。
+    问答类操作根据问题长度、是否带对话上下文和客户端偏好选择模型：
+    不带上下文的简短问题使用最快的模型和较小的输出上限，较长的输入放宽输出上限；
+    其他操作使用默认模型和各自的输出上限。每次路由都写入日志并计数，便于分析。
+    """
+
+    # 各操作的默认 (temperature, max_output_tokens)
+    OPERATION_DEFAULTS: Dict[str, Tuple[float, int]] = {
+        "book_info": (0.3, 4000),
+        "book_details": (0.3, 2000),
+        "qa": (0.5, 2000),
+        "qa_context": (0.5, 2000),
+        "report": (0.4, 8192),
+        "report_section": (0.4, 2048),
+    }
+    QA_OPERATIONS = ("qa", "qa_context")
+
+    def __init__(self, default_model: str, fast_model: str, quality_model: str, enabled: bool = True,
+                 short_question_chars: int = 40, fast_max_tokens: int = 1024,
+                 long_input_chars: int = 2000, long_max_tokens: int = 3000, quality_max_tokens: int = 4096):
+        self.default_model = default_model
+        self.fast_model = fast_model
+        self.quality_model = quality_model
+        self.enabled = enabled
+        self.short_question_chars = short_question_chars
+        self.fast_max_tokens = fast_max_tokens
+        self.long_input_chars = long_input_chars
+        self.long_max_tokens = long_max_tokens
+        self.quality_max_tokens = quality_max_tokens
+        self.decisions: Counter = Counter()  # (操作, 模型, 原因) -> 次数
+
+    def route(self, operation: str, question: str = "", context: str = "",
+              hint: Optional[str] = None, max_output_tokens: Optional[int] = None) -> ModelRoute:
+        """为一次调用选择模型；max_output_tokens 为调用方指定的默认输出上限（如报告章节）"""
+        if hint is not None and hint not in MODEL_HINTS:
+            raise ValueError(f"Invalid model hint: {hint}")
+
+        temperature, default_tokens = self.OPERATION_DEFAULTS.get(operation, (0.5, 2000))
+        if max_output_tokens is not None:
+            default_tokens = max_output_tokens
+        model, tokens, reason = self.default_model, default_tokens, "default"
+
+        if self.enabled and operation in self.QA_OPERATIONS:
+            question_chars = len((question or "").strip())
+            context_chars = len((context or "").strip())
+            if hint == "quality":
+                model, tokens, reason = self.quality_model, max(default_tokens, self.quality_max_tokens), "hint:quality"
+            elif hint == "fast":
+                model, tokens, reason = self.fast_model, self.fast_max_tokens, "hint:fast"
+            elif hint == "balanced":
+                reason = "hint:balanced"
+            elif not context_chars and question_chars <= self.short_question_chars:
+                model, tokens, reason = self.fast_model, self.fast_max_tokens, "short_question"
+            elif question_chars + context_chars >= self.long_input_chars:
+                tokens, reason = max(default_tokens, self.long_max_tokens), "long_input"
+            logger.info(
+                f"Route {operation}: model={model} max_output_tokens={tokens} reason={reason} "
+                f"question_chars={question_chars} context_chars={context_chars} hint={hint}"
+            )
+        else:
+            logger.info(f"Route {operation}: model={model} max_output_tokens={tokens} reason={reason}")
+
+        self.decisions[(operation, model, reason)] += 1
+        return ModelRoute(model=model, max_output_tokens=tokens, temperature=temperature, reason=reason)
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        """各路由结果的次数"""
+        return [
+            {"operation": operation, "model": model, "reason": reason, "count": count}
+            for (operation, model, reason), count in self.decisions.most_common()
+        ]
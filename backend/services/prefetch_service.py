@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, Optional, Set
+from models.book import BookInfo
+from services.book_service import BookService
+from services.report_job_service import ReportJobService, JobQueueFullError, PRIORITY_PREFETCH
+from utils.cache import TTLCache
+from utils.helpers import normalize_book_name
+
+logger = logging.getLogger(__name__)
+
+class ReportPrefetchService:
+    """详细报告的预测性预取
+
+    用户查到一本书后往往会接着打开详细报告。书籍信息查询成功后，
+    若上游空闲且当日预算未用完，就以低优先级提交报告任务，
+    用户真正请求时直接命中缓存或已在进行中的任务。
+    同时统计预取后被请求的比例，用于调整预算与空闲阈值。
+    """
+
+    def __init__(self, book_service: BookService, job_service: ReportJobService,
+                 daily_budget: int = 100, idle_ratio: float = 0.5, tracking_ttl: float = 86400):
+        self.book_service = book_service
+        self.job_service = job_service
+        self.daily_budget = daily_budget
+        self.idle_ratio = idle_ratio  # 进行中的上游调用低于并发上限的该比例时视为空闲
+
+        self.prefetched = TTLCache(ttl=tracking_ttl, max_size=10000)  # 报告键 -> 预取任务ID
+        self._day = date.today()
+        self.used_today = 0
+        self.submitted = 0
+        self.hits = 0  # 预取后被用户请求的次数
+        self.ready_hits = 0  # 其中请求时报告已生成完毕的次数
+        self.skipped: Counter = Counter()  # 跳过原因 -> 次数
+        self._tasks: Set[asyncio.Task] = set()
+
+    def maybe_prefetch(self, book_info: BookInfo) -> bool:
+        """书籍信息查询成功后调用，满足条件时在后台提交预取任务"""
+        if not book_info.is_found:
+            return False
+
+        key = self._key(book_info.title, book_info.author)
+        if key in self.prefetched:
+            return False
+
+        reason = self._skip_reason(book_info)
+        if reason is not None:
+            self.skipped[reason] += 1
+            return False
+
+        # 先占用预算，避免并发的查询重复提交
+        self.used_today += 1
+        self.prefetched[key] = None
+        task = asyncio.create_task(self._submit(key, book_info.title, book_info.author))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def record_request(self, book_name: str, author: Optional[str] = None):
+        """用户请求详细报告时调用，统计预取命中"""
+        key = self._key(book_name, author)
+        if self.prefetched.get(key) is None:
+            # 未预取，或预取任务尚未提交完成
+            return
+        self.prefetched.delete(key)
+        self.hits += 1
+        if self.book_service.get_cached_report(book_name, author) is not None:
+            self.ready_hits += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预取统计信息"""
+        self._roll_day()
+        return {
+            "daily_budget": self.daily_budget,
+            "used_today": self.used_today,
+            "submitted": self.submitted,
+            "hits": self.hits,
+            "ready_hits": self.ready_hits,
+            "hit_ratio": round(self.hits / self.submitted, 4) if self.submitted else None,
+            "pending_tracking": len(self.prefetched),
+            "skipped": dict(self.skipped),
+        }
+
+    def _skip_reason(self, book_info: BookInfo) -> Optional[str]:
+        """不满足预取条件时返回原因"""
+        self._roll_day()
+        if self.used_today >= self.daily_budget:
+            return "budget"
+
+        gemini_service = self.book_service.gemini_service
+        if gemini_service.waiting > 0 or gemini_service.inflight >= gemini_service.max_concurrency * self.idle_ratio:
+            return "upstream_busy"
+        if gemini_service.breakers.open_circuits():
+            return "circuit_open"
+
+        if not self.job_service.is_running or self.job_service.get_stats()["queued"] > 0:
+            return "queue_busy"
+
+        if self.book_service.get_cached_report(book_info.title, book_info.author) is not None:
+            return "cached"
+        return None
+
+    async def _submit(self, key: str, book_name: str, author: Optional[str]):
+        try:
+            job, created = await self.job_service.submit(book_name, author, priority=PRIORITY_PREFETCH)
+        except (ValueError, JobQueueFullError) as e:
+            self._refund(key)
+            logger.warning(f"Report prefetch skipped for {book_name}: {str(e)}")
+            return
+        except Exception as e:
+            self._refund(key)
+            logger.error(f"Report prefetch failed for {book_name}: {str(e)}")
+            return
+
+        if not created or not job.speculative:
+            # 报告已缓存或已有用户提交的任务，不计入预取
+            self._refund(key)
+            return
+        self.prefetched[key] = job.id
+        self.submitted += 1
+        logger.info(f"Prefetching detailed report for {book_name} (job {job.id})")
+
+    def _refund(self, key: str):
+        """未实际提交预取任务时归还预算"""
+        self.prefetched.delete(key)
+        self.used_today = max(0, self.used_today - 1)
+
+    def _roll_day(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self.used_today = 0
+
+    @staticmethod
+    def _key(book_name: str, author: Optional[str]) -> str:
+        return f"{normalize_book_name(book_name)}|{normalize_book_name(author or '')}"
@@ -0,0 +1,66 @@
+import re
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from utils.helpers import normalize_book_name
+
+class PresetPrompt(BaseModel):
+    """客户端推荐问题中的一项"""
+    id: str
+    title: str
+    prompt: str
+    kind: str = "qa"  # qa: 作为问题提问；report: 客户端改为请求详细报告
+
+# 与 aireader_hm PromptService.getBookAnalysisPrompts 保持一致（id 与问题原文相同才能命中预先生成的回答）
+PRESET_PROMPTS: List[PresetPrompt] = [
+    PresetPrompt(
+        id="1",
+        title="核心洞见与主要观点",
+        prompt="请深入分析并提炼这本书最核心、最具原创性的深刻洞见和关键论断。"
+    ),
+    PresetPrompt(
+        id="2",
+        title="关键概念与理论框架",
+        prompt="请识别并透彻解释书中反复出现的关键概念、术语或理论模型。"
+    ),
+    PresetPrompt(
+        id="3",
+        title="名言警句/精彩摘录",
+        prompt="请精选书中能体现核心思想、语言精辟、发人深省的名言警句或经典段落。"
+    ),
+    PresetPrompt(
+        id="4",
+        title="评价、争议与影响",
+        prompt="请总结本书在学术界、评论界的主流评价（包含赞誉和批评），并分析其深远影响。"
+    ),
+    PresetPrompt(
+        id="5",
+        title="阅读策略与建议",
+        prompt="请为渴望深度理解本书的读者提供具体的阅读方法建议和辅助阅读材料。"
+    ),
+    PresetPrompt(
+        id="6",
+        title="目标读者与同类书比较",
+        prompt="请描绘本书最适合的读者群体，并与同类书籍进行对比分析，突出其独特性。"
+    ),
+    PresetPrompt(
+        id="7",
+        title="生成详细书籍报告",
+        prompt="生成一份关于这本书的详细报告。",
+        kind="report"
+    ),
+]
+
+PRESETS_BY_ID: Dict[str, PresetPrompt] = {preset.id: preset for preset in PRESET_PROMPTS}
+
+# 需要预先生成回答的推荐问题（详细报告走报告缓存）
+QA_PRESETS: List[PresetPrompt] = [preset for preset in PRESET_PROMPTS if preset.kind == "qa"]
+
+def _normalize_prompt(text: str) -> str:
+    # 忽略全半角、大小写、空白与结尾标点的差异
+    return re.sub(r"[\s。.?？!！]+$", "", normalize_book_name(text))
+
+_PRESETS_BY_PROMPT: Dict[str, PresetPrompt] = {_normalize_prompt(preset.prompt): preset for preset in PRESET_PROMPTS}
+
+def match_preset(question: str) -> Optional[PresetPrompt]:
+    """问题与某个推荐问题相同时返回该推荐问题"""
+    return _PRESETS_BY_PROMPT.get(_normalize_prompt(question or ""))
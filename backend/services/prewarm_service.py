@@ -0,0 +1,177 @@
+import os
+import re
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple
+from pydantic import BaseModel, Field
+from utils.conversation_logger import LOGS_DIR
+from utils.helpers import normalize_book_name
+
+logger = logging.getLogger(__name__)
+
+# 对话日志中的一条记录，见 utils/conversation_logger.py
+_LOG_ENTRY_PATTERN = re.compile(
+    r"--- Conversation Log: [^\n]* ---\nBook: ([^\n]*)\nUser Question: (.*?)\nAI Answer: ",
+    re.S
+)
+# 非问答类的日志记录
+_NON_QA_QUESTIONS = {"Get book info", "Generate detailed report"}
+
+class PrewarmTarget(BaseModel):
+    """需要预热的书籍"""
+    title: str = Field(..., description="书籍名称")
+    questions: List[str] = Field(default_factory=list, description="常见问题，按热度排序")
+    weight: int = Field(0, description="热度（日志中的记录数）")
+
+def parse_off_peak_hours(value: str) -> Optional[Tuple[int, int]]:
+    """解析低峰时段配置，如 "1-6" 或跨零点的 "22-6"；为空表示不限时段"""
+    if not value or not value.strip():
+        return None
+    match = re.fullmatch(r"\s*(\d{1,2})\s*-\s*(\d{1,2})\s*", value)
+    if not match:
+        raise ValueError(f"Invalid off-peak hours: {value}")
+    start, end = int(match.group(1)), int(match.group(2))
+    if not (0 <= start <= 23 and 0 <= end <= 24):
+        raise ValueError(f"Invalid off-peak hours: {value}")
+    return start, end
+
+def is_within_hours(hours: Optional[Tuple[int, int]], now: Optional[datetime] = None) -> bool:
+    """当前时间是否处于给定时段内"""
+    if hours is None:
+        return True
+    hour = (now or datetime.now()).hour
+    start, end = hours
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+def load_targets_from_file(path: str) -> List[PrewarmTarget]:
+    """从文本文件加载书名列表（每行一本，# 开头为注释）"""
+    targets = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            title = line.strip()
+            if not title or title.startswith("#"):
+                continue
+            key = normalize_book_name(title)
+            if key in seen:
+                continue
+            seen.add(key)
+            targets.append(PrewarmTarget(title=title))
+    return targets
+
+def load_targets_from_logs(logs_dir: str = LOGS_DIR, limit: Optional[int] = None) -> List[PrewarmTarget]:
+    """根据对话日志统计热门书籍及其常见问题"""
+    book_counts: Counter = Counter()
+    spellings: Dict[str, Counter] = {}
+    questions: Dict[str, Counter] = {}
+
+    if not os.path.isdir(logs_dir):
+        return []
+
+    for filename in os.listdir(logs_dir):
+        if not filename.endswith(".txt"):
+            continue
+        try:
+            with open(os.path.join(logs_dir, filename), "r", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"Failed to read conversation log {filename}: {e}")
+            continue
+
+        for match in _LOG_ENTRY_PATTERN.finditer(text):
+            book_name, question = match.group(1).strip(), match.group(2).strip()
+            key = normalize_book_name(book_name)
+            if not key:
+                continue
+            book_counts[key] += 1
+            spellings.setdefault(key, Counter())[book_name] += 1
+
+            if question in _NON_QA_QUESTIONS:
+                continue
+            # 带上下文的问答记录为 "{context}\n\nQuestion: {question}"
+            if "Question: " in question:
+                question = question.rsplit("Question: ", 1)[1].strip()
+            if question:
+                questions.setdefault(key, Counter())[question] += 1
+
+    targets = []
+    for key, count in book_counts.most_common(limit):
+        title = spellings[key].most_common(1)[0][0]
+        top_questions = [q for q, _ in questions.get(key, Counter()).most_common()]
+        targets.append(PrewarmTarget(title=title, questions=top_questions, weight=count))
+    return targets
+
+class PrewarmService:
+    """缓存预热
+
+    按给定的书名列表依次获取书籍信息、详细报告和常见问题的回答，
+    使其进入缓存。每次调用之间按固定间隔限速，并可限制在低峰时段运行。
+    book_service 可以是进程内的 BookService，也可以是提供相同方法的HTTP客户端。
+    """
+
+    def __init__(self, book_service, interval: float = 2.0, off_peak_hours: Optional[Tuple[int, int]] = None,
+                 include_reports: bool = True, questions_per_book: int = 3, include_presets: bool = False):
+        self.book_service = book_service
+        self.interval = max(0.0, interval)
+        self.off_peak_hours = off_peak_hours
+        self.include_reports = include_reports
+        self.questions_per_book = max(0, questions_per_book)
+        self.include_presets = include_presets
+
+    async def run(self, targets: List[PrewarmTarget]) -> Dict[str, int]:
+        """执行预热，返回统计信息"""
+        stats = {"books": 0, "reports": 0, "answers": 0, "preset_answers": 0, "not_found": 0, "errors": 0}
+        logger.info(f"Prewarming {len(targets)} books")
+
+        for target in targets:
+            book_info = await self._call(stats, self.book_service.get_book_info, target.title)
+            if book_info is None:
+                continue
+            if not book_info.is_found:
+                stats["not_found"] += 1
+                continue
+            stats["books"] += 1
+
+            # 客户端以书籍信息中的书名和作者请求报告，这里保持一致以命中缓存
+            if self.include_reports:
+                if await self._call(stats, self.book_service.generate_detailed_report, book_info.title, book_info.author):
+                    stats["reports"] += 1
+
+            if self.include_presets:
+                result = await self._call(stats, self.book_service.precompute_preset_answers, book_info.title)
+                if result:
+                    stats["preset_answers"] += len(result["answers"])
+                    stats["errors"] += len(result["failed"])
+
+            for question in target.questions[:self.questions_per_book]:
+                if await self._call(stats, self.book_service.answer_book_question, target.title, question):
+                    stats["answers"] += 1
+
+        logger.info(f"Prewarm finished: {stats}")
+        return stats
+
+    async def _call(self, stats: Dict[str, int], func, *args):
+        """在允许的时段内执行一次调用，之后等待限速间隔"""
+        await self._wait_for_off_peak()
+        try:
+            return await func(*args)
+        except Exception as e:
+            stats["errors"] += 1
+            logger.error(f"Prewarm call {getattr(func, '__name__', func)}{args} failed: {str(e)}")
+            return None
+        finally:
+            if self.interval:
+                await asyncio.sleep(self.interval)
+
+    async def _wait_for_off_peak(self):
+        """不在低峰时段时等待"""
+        logged = False
+        while not is_within_hours(self.off_peak_hours):
+            if not logged:
+                logger.info(f"Prewarm paused until off-peak hours {self.off_peak_hours}")
+                logged = True
+            await asyncio.sleep(60)
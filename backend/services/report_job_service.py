@@ -0,0 +1,393 @@
+import os
+import re
+import json
+import asyncio
+import logging
+from typing import Optional, Dict, List, Tuple, AsyncIterator
+from datetime import datetime, timedelta
+from models.job import JobStatus, ReportJob
+from services.book_service import BookService
+from utils.circuit_breaker import CircuitOpenError
+from utils.helpers import generate_id, normalize_book_name, validate_book_name
+
+try:
+    import fcntl
+except ImportError:  # Windows下只支持单进程运行，不需要跨进程加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 多进程部署时，轮询其他worker所执行任务状态的间隔秒数
+REMOTE_POLL_INTERVAL = 1.0
+
+# 任务优先级，数值越小越先执行；预取任务排在用户提交的任务之后
+PRIORITY_NORMAL = 0
+PRIORITY_PREFETCH = 10
+
+# 任务ID为uuid，读取磁盘前校验，避免路径穿越
+_JOB_ID_PATTERN = re.compile(r"[0-9a-f-]{36}")
+
+class JobQueueFullError(Exception):
+    """任务队列已满"""
+    pass
+
+class ReportJobService:
+    """详细报告的后台任务队列
+
+    报告生成耗时较长，请求只负责提交任务并拿到任务ID，
+    由固定数量的后台worker依次执行。任务状态与结果持久化到磁盘，
+    相同书籍的未完成任务会被合并。
+    """
+
+    def __init__(self, book_service: BookService, workers: int = 2, max_queue_size: int = 100,
+                 storage_dir: str = "data/report_jobs", retention_seconds: int = 86400):
+        self.book_service = book_service
+        self.workers = max(1, workers)
+        self.max_queue_size = max_queue_size
+        self.storage_dir = storage_dir
+        self.retention_seconds = retention_seconds
+
+        self.jobs: Dict[str, ReportJob] = {}
+        self._active_by_key: Dict[str, str] = {}  # 去重键 -> 未完成的任务ID
+        self._events: Dict[str, asyncio.Event] = {}  # 任务ID -> 状态变化通知
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = 0  # 同优先级的任务按提交顺序执行
+        self._worker_tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self._locks: Dict[str, int] = {}  # 任务ID -> 持有的锁文件描述符
+
+    @property
+    def is_running(self) -> bool:
+        """worker是否已启动"""
+        return bool(self._worker_tasks)
+
+    async def start(self):
+        """加载持久化的任务并启动worker"""
+        if self.is_running:
+            return
+
+        self._queue = asyncio.PriorityQueue()
+        os.makedirs(self.storage_dir, exist_ok=True)
+
+        # 恢复上次未完成的任务；多个worker进程同时启动时，每个任务只由取得锁的进程恢复
+        for job in self._load_jobs():
+            if not job.is_finished:
+                if not self._acquire_lock(job.id):
+                    continue
+                # 取得锁后重新读取，任务可能刚被其他进程完成
+                job = self._read_job(job.id) or job
+            self.jobs[job.id] = job
+            if not job.is_finished:
+                job.status = JobStatus.PENDING
+                job.started_at = None
+                self._active_by_key[self._dedupe_key(job.book_name, job.author)] = job.id
+                self._enqueue(job)
+
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        logger.info(f"Report job service started with {self.workers} workers, {self._queue.qsize()} pending jobs")
+
+    async def stop(self, timeout: float = 0):
+        """停止worker
+
+        不再领取新任务，正在执行的任务最多再等待 timeout 秒；
+        未开始的任务保留在磁盘上，下次启动时继续执行。
+        """
+        self._stopping = True
+        running = [job_id for job_id, job in self.jobs.items() if job.status == JobStatus.RUNNING]
+        if running and timeout > 0:
+            logger.info(f"Waiting up to {timeout}s for {len(running)} running report jobs")
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(self.wait_for(job_id) for job_id in running)),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Report jobs did not finish before shutdown deadline")
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def submit(self, book_name: str, author: Optional[str] = None,
+                     priority: int = PRIORITY_NORMAL) -> Tuple[ReportJob, bool]:
+        """提交报告生成任务，返回 (任务, 是否为新建任务)"""
+        if not validate_book_name(book_name):
+            raise ValueError("Invalid book name")
+
+        if self._stopping:
+            raise JobQueueFullError("Report job service is shutting down")
+
+        await self.start()
+        self._prune_finished()
+
+        key = self._dedupe_key(book_name, author)
+        existing_id = self._active_by_key.get(key)
+        if existing_id and existing_id in self.jobs:
+            existing = self.jobs[existing_id]
+            if priority < PRIORITY_PREFETCH and existing.speculative:
+                # 用户请求了尚在执行的预取任务，之后按普通任务对待
+                existing.speculative = False
+                self._persist(existing)
+            if existing.status == JobStatus.PENDING and priority < existing.priority:
+                # 以更高的优先级重新入队，原队列项出队时会被跳过
+                existing.priority = priority
+                self._persist(existing)
+                self._enqueue(existing)
+            return existing, False
+
+        # 已有缓存的报告直接生成已完成的任务，不占用worker
+        cached = self.book_service.get_cached_report(book_name, author)
+        if cached is not None:
+            now = datetime.now()
+            job = ReportJob(id=generate_id(), book_name=book_name, author=author,
+                            status=JobStatus.COMPLETED, result=cached,
+                            started_at=now, finished_at=now)
+            self.jobs[job.id] = job
+            self._persist(job)
+            return job, True
+
+        if self._queue.qsize() >= self.max_queue_size:
+            raise JobQueueFullError("Report job queue is full")
+
+        job = ReportJob(id=generate_id(), book_name=book_name, author=author,
+                        priority=priority, speculative=priority >= PRIORITY_PREFETCH)
+        self._acquire_lock(job.id)
+        self.jobs[job.id] = job
+        self._active_by_key[key] = job.id
+        self._persist(job)
+        self._enqueue(job)
+        return job, True
+
+    def get_job(self, job_id: str) -> Optional[ReportJob]:
+        """获取任务（不在本进程中时从磁盘读取，任务可能由其他worker进程执行）"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = self._read_job(job_id)
+        return job
+
+    async def wait_for(self, job_id: str, timeout: Optional[float] = None) -> Optional[ReportJob]:
+        """等待任务结束"""
+        async for job in self.watch(job_id, timeout=timeout):
+            if job.is_finished:
+                return job
+        return self.get_job(job_id)
+
+    async def watch(self, job_id: str, timeout: Optional[float] = None) -> AsyncIterator[ReportJob]:
+        """依次产出任务的状态变化，直到任务结束或超时"""
+        if job_id not in self.jobs:
+            async for job in self._watch_remote(job_id, timeout):
+                yield job
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        last_status = None
+        while True:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            if job.is_finished:
+                # 已结束的任务不会再有状态变化，不保留通知事件
+                self._events.pop(job_id, None)
+                if job.status != last_status:
+                    yield job
+                return
+            # 在产出之前取得事件，产出期间发生的状态变化也能被通知到
+            event = self._event_for(job_id)
+            if job.status != last_status:
+                last_status = job.status
+                yield job
+
+            remaining = deadline - loop.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def _watch_remote(self, job_id: str, timeout: Optional[float]) -> AsyncIterator[ReportJob]:
+        """轮询磁盘上由其他worker进程执行的任务"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        last_status = None
+        while True:
+            job = self._read_job(job_id)
+            if job is None:
+                return
+            if job.status != last_status:
+                last_status = job.status
+                yield job
+            if job.is_finished:
+                return
+            if deadline is not None and loop.time() >= deadline:
+                return
+            await asyncio.sleep(REMOTE_POLL_INTERVAL)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取任务统计信息"""
+        counts = {status.value: 0 for status in JobStatus}
+        for job in self.jobs.values():
+            counts[job.status.value] += 1
+        counts["queued"] = self._queue.qsize() if self._queue else 0
+        counts["workers"] = len(self._worker_tasks)
+        return counts
+
+    async def _worker(self, index: int):
+        """从队列中取任务执行"""
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"Report worker {index} failed on job {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str):
+        """执行单个报告任务"""
+        job = self.jobs.get(job_id)
+        # 提高优先级后重新入队的任务在队列中有两项，只执行先出队的一项
+        if job is None or job.status != JobStatus.PENDING or self._stopping:
+            return
+
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.now()
+        self._update(job)
+
+        try:
+            report = await self.book_service.generate_detailed_report(job.book_name, job.author)
+            if report:
+                job.status = JobStatus.COMPLETED
+                job.result = report
+            else:
+                job.status = JobStatus.FAILED
+                job.error = "No report generated"
+        except CircuitOpenError as e:
+            # 记录熔断剩余时间，等待任务的请求据此返回 503
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            job.retry_after = e.retry_after
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+
+        job.finished_at = datetime.now()
+        self._active_by_key.pop(self._dedupe_key(job.book_name, job.author), None)
+        self._update(job)
+        self._release_lock(job.id)
+
+    def _enqueue(self, job: ReportJob):
+        self._sequence += 1
+        self._queue.put_nowait((job.priority, self._sequence, job.id))
+
+    def _prune_finished(self):
+        """移除超过保留期的已完成任务"""
+        cutoff = datetime.now() - timedelta(seconds=self.retention_seconds)
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.is_finished and job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+            self._events.pop(job_id, None)
+            self._remove_job_files(job_id)
+
+    def _update(self, job: ReportJob):
+        """持久化任务并通知等待者（每次状态变化后事件即被取出，已结束的任务不再创建新事件）"""
+        self._persist(job)
+        event = self._events.pop(job.id, None)
+        if event is not None:
+            event.set()
+
+    def _event_for(self, job_id: str) -> asyncio.Event:
+        """获取任务当前的状态通知事件"""
+        event = self._events.get(job_id)
+        if event is None:
+            event = self._events[job_id] = asyncio.Event()
+        return event
+
+    @staticmethod
+    def _dedupe_key(book_name: str, author: Optional[str]) -> str:
+        """相同书籍与作者的任务视为重复"""
+        return f"{normalize_book_name(book_name)}|{normalize_book_name(author or '')}"
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.storage_dir, f"{job_id}.json")
+
+    def _acquire_lock(self, job_id: str) -> bool:
+        """获取任务的跨进程锁；进程退出时锁自动释放"""
+        if fcntl is None or job_id in self._locks:
+            return True
+        path = f"{self._job_path(job_id)}.lock"
+        fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # 锁文件在加锁前被删除（过期任务清理）时，锁住的是已不存在的文件，视为未取得
+            if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                raise OSError("Lock file was replaced")
+        except OSError:
+            os.close(fd)
+            return False
+        self._locks[job_id] = fd
+        return True
+
+    def _release_lock(self, job_id: str):
+        """释放锁；锁文件保留到任务过期清理时删除，删除持有中的锁文件会让其他进程锁住不同的文件"""
+        fd = self._locks.pop(job_id, None)
+        if fd is None:
+            return
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _remove_job_files(self, job_id: str):
+        """删除过期任务的任务文件与锁文件"""
+        path = self._job_path(job_id)
+        for file_path in (path, f"{path}.lock"):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+    def _read_job(self, job_id: str) -> Optional[ReportJob]:
+        """从磁盘读取任务"""
+        if not _JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        try:
+            with open(self._job_path(job_id), "r", encoding="utf-8") as f:
+                return ReportJob(**json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def _persist(self, job: ReportJob):
+        """将任务写入磁盘（先写临时文件再替换，避免写入一半）"""
+        path = self._job_path(job.id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(job.json())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to persist report job {job.id}: {e}")
+
+    def _load_jobs(self) -> List[ReportJob]:
+        """加载磁盘上的任务，并清理过期的已完成任务"""
+        jobs = []
+        cutoff = datetime.now() - timedelta(seconds=self.retention_seconds)
+        for filename in os.listdir(self.storage_dir):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.storage_dir, filename)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    job = ReportJob(**json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load report job {filename}: {e}")
+                continue
+
+            if job.is_finished and job.finished_at and job.finished_at < cutoff:
+                self._remove_job_files(job.id)
+                continue
+            jobs.append(job)
+        return jobs
@@ -0,0 +1,96 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+class ReportSection(BaseModel):
+    """详细报告中的一个章节"""
+    id: str
+    title: str
+    instructions: str
+    max_output_tokens: int = 2048
+
+# 报告的各个部分，按报告顺序排列；整篇生成与分章节生成的提示词都由此构建
+REPORT_SECTIONS: List[ReportSection] = [
+    ReportSection(
+        id="basic_info",
+        title="基本信息",
+        instructions="""*   作者简介：深入介绍作者的学术/创作背景、知识体系、写作风格特点、所属流派或领域。提及可能深刻影响本书创作的其他关键作品、人生经历或思想转变。
+*   出版信息：首次出版的确切时间与背景。
+*   书籍分类：精准定位本书所属的大类（如社科、哲学、文学、历史、科普、心理学、传记等），并尽可能细化至具体子领域。""",
+        max_output_tokens=1024
+    ),
+    ReportSection(
+        id="core_content",
+        title="核心内容精粹",
+        instructions="""*   **（重点）** 提纲挈领地概述全书探讨的核心议题、试图解答的关键问题或（若是小说）驱动情节发展的核心冲突与脉络。
+*   梳理全书的宏观结构（如章节安排、逻辑递进关系、叙事框架），点明各主要部分的关键内容和功能。"""
+    ),
+    ReportSection(
+        id="core_insights",
+        title="核心洞见与主要观点",
+        instructions="""*   **（极其重点）** **集中火力、不吝篇幅地**分析和提炼书中提出的**最核心、最具原创性、最具启发性的深刻洞见和关键论断**。作者通过本书究竟想向世界传达什么根本性的信息？
+*   详细阐述这些核心观点是如何被论证的？作者运用了哪些证据、逻辑或叙事技巧来支撑它们？
+*   这些观点的新颖性、颠覆性或深刻性体现在何处？它们挑战了哪些传统认知或流行观念？
+*   （如果是小说）深入解读其核心主题（如爱、死亡、自由、正义等）、反复出现的象征意象、人物弧光背后揭示的人性或社会现实。""",
+        max_output_tokens=3072
+    ),
+    ReportSection(
+        id="key_concepts",
+        title="关键概念与理论框架",
+        instructions="""*   识别并透彻解释书中反复出现、或对理解核心观点至关重要的**独特概念、术语、理论模型或分析框架**。
+*   阐明这些概念的精确内涵、来源（是作者原创、借用还是批判性发展？），以及它们在构建全书论证体系或叙事世界中的核心作用。"""
+    ),
+    ReportSection(
+        id="quotes",
+        title="名言警句与精彩摘录",
+        instructions="""*   精选书中**最能体现核心思想、语言精辟、发人深省或极具代表性**的名言警句、经典段落。
+*   摘录原文，并可选择性地附上简要的语境说明或意义解读，以展现其精华所在。""",
+        max_output_tokens=1536
+    ),
+    ReportSection(
+        id="reception",
+        title="评价、争议与深远影响",
+        instructions="""*   客观总结本书在学术界、评论界及不同读者群体中的主流评价，务必包含**赞誉和批评**两方面的主要声音。
+*   本书自问世以来，在思想界、特定学科领域、社会文化层面或后续创作中引发了哪些具体而重要的影响？
+*   是否存在围绕本书的著名争议、重要的学术辩论或持续的批评焦点？具体内容是什么？
+*   时效性与现代审视：根据最新的科学研究、学术进展或社会观念变迁，评估本书内容的时代局限性，指出是否有观点已过时、存在错误或需要补充修正。"""
+    ),
+    ReportSection(
+        id="reading_strategy",
+        title="阅读策略与进阶建议",
+        instructions="""*   为渴望深度理解本书的读者提供具体的阅读方法建议：需要哪些学科背景或知识储备？阅读时应特别留意哪些线索或论证层次？适合快速把握脉络还是需要字斟句酌地精读？推荐采用何种笔记法？
+*   推荐哪些有助于加深理解的辅助阅读材料？（如：作者的其他著作、相关的学术论文、评论文章、纪录片、访谈、同一主题的其他经典书籍等）。""",
+        max_output_tokens=1536
+    ),
+    ReportSection(
+        id="target_readers",
+        title="目标读者画像",
+        instructions="""*   清晰描绘本书最适合的读者群体特征：是专业研究者、高校学生、特定行业从业人员、对特定议题有浓厚兴趣的公众读者，还是寻求特定情感共鸣或人生启迪的读者？
+*   阅读本书可能需要读者具备哪些先验的知识基础、思维能力或兴趣偏好？""",
+        max_output_tokens=1024
+    ),
+    ReportSection(
+        id="comparison",
+        title="同类书比较与独特定位",
+        instructions="""*   列举若干本探讨相似主题、领域或体裁的重要书籍。
+*   **着重对比分析**：本书与这些同类书籍相比，在核心观点、研究方法、论证风格、叙事策略、材料选择、结论或整体基调上有哪些**显著的异同**？本书的独特性和不可替代的价值体现在哪里？"""
+    ),
+]
+
+SECTIONS_BY_ID: Dict[str, ReportSection] = {section.id: section for section in REPORT_SECTIONS}
+
+_CHINESE_NUMERALS = "一二三四五六七八九十"
+
+def section_heading(section: ReportSection) -> str:
+    """章节标题，如 "三、核心洞见与主要观点" """
+    index = REPORT_SECTIONS.index(section)
+    numeral = _CHINESE_NUMERALS[index] if index < len(_CHINESE_NUMERALS) else str(index + 1)
+    return f"{numeral}、{section.title}"
+
+def assemble_report(texts: Dict[str, str], sections: Optional[List[ReportSection]] = None) -> str:
+    """按报告顺序拼接各章节（纯文本，与整篇生成的格式一致）"""
+    parts = []
+    for section in sections or REPORT_SECTIONS:
+        text = texts.get(section.id)
+        if text:
+            parts.append(f"{section_heading(section)}\n\n{text.strip()}")
+    return "\n\n".join(parts)
@@ -0,0 +1,136 @@
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# 每写入多少次清理一次超过保留期的过期条目
+PURGE_EVERY = 1000
+
+class CacheEntry:
+    """缓存条目"""
+
+    __slots__ = ("value", "created_at", "expires_at", "hits", "last_access", "artifacts")
+
+    def __init__(self, value: Any, ttl: Optional[float]):
+        now = time.time()
+        self.value = value
+        self.created_at = now
+        self.expires_at = now + ttl if ttl is not None else None
+        self.hits = 0
+        self.last_access = now
+        # 由value派生的数据（如序列化后的响应），随条目一起失效
+        self.artifacts: Dict[str, Any] = {}
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+class TTLCache:
+    """带过期时间的内存缓存
+
+    用法与dict相近；过期条目对 get/in/[] 不可见，但仍保留在缓存中，
+    可通过 get_entry(allow_expired=True) 取回，直到被覆盖、清除，或过期超过 stale_ttl 秒后被清理。
+    ttl为None表示永不过期，ttl为0表示禁用缓存；stale_ttl为None表示过期条目一直保留。
+    设置 max_size 时条目数达到上限后淘汰最久未访问的条目。
+    on_remove 在条目被淘汰、清理或删除时以键调用（clear 除外），用于同步维护由缓存派生的索引。
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_size: Optional[int] = None,
+                 stale_ttl: Optional[float] = None, on_remove: Optional[Callable[[str], None]] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stale_ttl = stale_ttl
+        self.on_remove = on_remove
+        self._data: Dict[str, CacheEntry] = {}
+        self._writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl is None or self.ttl > 0
+
+    def get_entry(self, key: str, allow_expired: bool = False) -> Optional[CacheEntry]:
+        """获取缓存条目（不计入命中）"""
+        entry = self._data.get(key)
+        if entry is None or (entry.is_expired and not allow_expired):
+            return None
+        return entry
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        if entry is None:
+            return default
+        entry.hits += 1
+        entry.last_access = time.time()
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if not self.enabled:
+            return
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge()
+        if self.max_size and key not in self._data and len(self._data) >= self.max_size:
+            self._evict()
+        self._data[key] = CacheEntry(value, ttl if ttl is not None else self.ttl)
+
+    def delete(self, key: str):
+        if self._data.pop(key, None) is not None:
+            self._removed(key)
+
+    def clear(self):
+        self._data.clear()
+
+    def keys(self) -> List[str]:
+        """未过期的键"""
+        return [key for key, entry in self._data.items() if not entry.is_expired]
+
+    def items(self) -> Iterator:
+        """未过期的 (键, 值)"""
+        for key, entry in list(self._data.items()):
+            if not entry.is_expired:
+                yield key, entry.value
+
+    def purge(self) -> int:
+        """删除过期超过 stale_ttl 秒的条目（连同其派生数据），返回删除的条数"""
+        if self.stale_ttl is None:
+            return 0
+        cutoff = time.time() - self.stale_ttl
+        stale = [key for key, entry in self._data.items()
+                 if entry.expires_at is not None and entry.expires_at < cutoff]
+        for key in stale:
+            del self._data[key]
+            self._removed(key)
+        return len(stale)
+
+    def _evict(self):
+        """优先淘汰已过期条目，否则淘汰最久未访问的条目"""
+        if self.purge():
+            return
+        expired = [key for key, entry in self._data.items() if entry.is_expired]
+        if expired:
+            for key in expired:
+                del self._data[key]
+                self._removed(key)
+            return
+        oldest = min(self._data, key=lambda k: self._data[k].last_access)
+        del self._data[oldest]
+        self._removed(oldest)
+
+    def _removed(self, key: str):
+        if self.on_remove is not None:
+            self.on_remove(key)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get_entry(key) is not None
+
+    def __getitem__(self, key: str) -> Any:
+        entry = self.get_entry(key)
+        if entry is None:
+            raise KeyError(key)
+        entry.hits += 1
+        entry.last_access = time.time()
+        return entry.value
+
+    def __setitem__(self, key: str, value: Any):
+        self.set(key, value)
+
+    def __len__(self) -> int:
+        return len(self.keys())
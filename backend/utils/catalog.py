@@ -0,0 +1,286 @@
+import os
+import re
+import csv
+import gzip
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from utils.helpers import normalize_book_name
+
+# 书目库中保存的字段，与 BookInfo 的同名字段对应
+CATALOG_FIELDS = ("title", "author", "publisher", "year", "isbn", "pages", "language", "genre", "description", "summary")
+
+# 常见书目数据中各字段的别名（Open Library、Goodreads导出等）
+FIELD_ALIASES = {
+    "title": ("title", "book_title", "name"),
+    # Open Library 版本数据的 authors 只有作者ID引用，优先使用 by_statement 中的作者名
+    "author": ("author", "author_name", "author_names", "by_statement", "authors"),
+    "publisher": ("publisher", "publishers"),
+    "year": ("year", "publish_year", "publication_year", "first_publish_year", "publish_date", "date"),
+    "isbn": ("isbn", "isbn_13", "isbn13", "isbn_10", "isbn10"),
+    "pages": ("pages", "number_of_pages", "num_pages", "page_count"),
+    "language": ("language", "languages"),
+    "genre": ("genre", "genres", "category", "categories", "subjects"),
+    "description": ("description",),
+    "summary": ("summary",),
+}
+
+# 值为代码引用、可以直接取 {"key": ...} 最后一段的字段
+KEY_REFERENCE_FIELDS = ("language",)
+
+_YEAR_PATTERN = re.compile(r"\b(1[0-9]{3}|20[0-9]{2})\b")
+_SUBTITLE_PATTERN = re.compile(r"\s*[:：(（—]")
+
+def normalize_isbn(text: Optional[str]) -> Optional[str]:
+    """校验ISBN并统一为13位；不是有效的ISBN时返回None"""
+    digits = re.sub(r"[\s-]", "", str(text or "")).upper()
+    if re.fullmatch(r"[0-9]{9}[0-9X]", digits):
+        total = sum((10 - i) * (10 if c == "X" else int(c)) for i, c in enumerate(digits))
+        if total % 11:
+            return None
+        digits = "978" + digits[:9]
+        check = (10 - sum((3 if i % 2 else 1) * int(c) for i, c in enumerate(digits)) % 10) % 10
+        return digits + str(check)
+    if re.fullmatch(r"97[89][0-9]{10}", digits):
+        total = sum((3 if i % 2 else 1) * int(c) for i, c in enumerate(digits))
+        return digits if total % 10 == 0 else None
+    return None
+
+def main_title_key(title: str) -> str:
+    """去掉副标题后的书名键"""
+    return normalize_book_name(_SUBTITLE_PATTERN.split(title or "", 1)[0])
+
+def _flatten(value: Any, resolve_keys: bool = False) -> Optional[str]:
+    """把列表、Open Library 的 {"value": ...} 等结构转换为字符串
+
+    {"key": ...} 引用（如作者ID "/authors/OL34184A"）不是可读的名称，
+    只有 resolve_keys 时（如语言代码 "/languages/eng"）才取引用的最后一段。
+    """
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        if "value" in value:
+            return _flatten(value["value"], resolve_keys)
+        if "name" in value:
+            return _flatten(value["name"], resolve_keys)
+        if "key" in value and resolve_keys:
+            return str(value["key"]).rstrip("/").rsplit("/", 1)[-1]
+        return None
+    if isinstance(value, (list, tuple)):
+        parts = [part for part in (_flatten(item, resolve_keys) for item in value) if part]
+        return ", ".join(dict.fromkeys(parts)) or None
+    text = str(value).strip()
+    return text or None
+
+def normalize_record(raw: Dict[str, Any]) -> Optional[Dict[str, Optional[str]]]:
+    """把一条原始书目数据转换为书目库字段；没有书名的记录返回None"""
+    record: Dict[str, Optional[str]] = {}
+    for field, aliases in FIELD_ALIASES.items():
+        if field == "isbn":
+            # 取第一个有效的ISBN
+            candidates = []
+            for alias in aliases:
+                value = raw.get(alias)
+                candidates.extend(value if isinstance(value, list) else [value])
+            record["isbn"] = next((isbn for isbn in map(normalize_isbn, candidates) if isbn), None)
+            continue
+        resolve_keys = field in KEY_REFERENCE_FIELDS
+        values = (_flatten(raw.get(alias), resolve_keys) for alias in aliases)
+        record[field] = next((value for value in values if value), None)
+    if not record["title"]:
+        return None
+    if record["year"]:
+        match = _YEAR_PATTERN.search(record["year"])
+        record["year"] = match.group(1) if match else None
+    return record
+
+def iter_dump_records(path: str) -> Iterator[Dict[str, Any]]:
+    """逐条读取书目数据文件（可为.gz压缩）
+
+    支持 JSON Lines、带表头的 CSV/TSV，以及 Open Library 的数据转储
+    （制表符分隔，最后一列为JSON）。
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="replace", newline="") as f:
+        if name.endswith(".csv") or name.endswith(".tsv"):
+            yield from csv.DictReader(f, delimiter="\t" if name.endswith(".tsv") else ",")
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("{"):
+                # Open Library：type, key, revision, last_modified, JSON
+                line = line.rsplit("\t", 1)[-1]
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(data, dict):
+                yield data
+
+class BookCatalog:
+    """本地书目库
+
+    从批量书目数据导入到SQLite，按ISBN和书名查询出版社、年份、页数等事实信息，
+    书名另建FTS5全文索引用于模糊检索。由 catalog_loader.py 导入，服务只读取。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            conn = self._connection()
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS books (
+                    id INTEGER PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    title_key TEXT NOT NULL,
+                    main_title_key TEXT NOT NULL,
+                    author TEXT,
+                    publisher TEXT,
+                    year TEXT,
+                    isbn TEXT,
+                    pages TEXT,
+                    language TEXT,
+                    genre TEXT,
+                    description TEXT,
+                    summary TEXT
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS books_isbn ON books(isbn) WHERE isbn IS NOT NULL;
+                CREATE INDEX IF NOT EXISTS books_title_key ON books(title_key);
+                CREATE INDEX IF NOT EXISTS books_main_title_key ON books(main_title_key);
+                """
+            )
+            try:
+                # trigram分词可检索中文子串（SQLite 3.34+）
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+                             "title, author, content='books', content_rowid='id', tokenize='trigram')")
+            except sqlite3.OperationalError:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+                             "title, author, content='books', content_rowid='id')")
+
+    def _connection(self) -> sqlite3.Connection:
+        """每个进程使用自己的连接（SQLite连接不能跨fork共享）"""
+        pid = os.getpid()
+        if self._conn is None or self._pid != pid:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._conn = conn
+            self._pid = pid
+        return self._conn
+
+    def lookup(self, book_name: str) -> Optional[Dict[str, Optional[str]]]:
+        """按ISBN或书名查询；同名的多个版本取信息最完整的一条"""
+        isbn = normalize_isbn(book_name)
+        if isbn:
+            return self.lookup_isbn(isbn)
+        return self.lookup_title(book_name)
+
+    def lookup_isbn(self, isbn: str) -> Optional[Dict[str, Optional[str]]]:
+        isbn = normalize_isbn(isbn)
+        if not isbn:
+            return None
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM books WHERE isbn = ?", (isbn,)).fetchone()
+        return self._record(row)
+
+    def lookup_title(self, title: str) -> Optional[Dict[str, Optional[str]]]:
+        title_key = normalize_book_name(title)
+        if not title_key:
+            return None
+        completeness = " + ".join(f"({field} IS NOT NULL)" for field in CATALOG_FIELDS)
+        with self._lock:
+            conn = self._connection()
+            # 先精确匹配完整书名，再匹配去掉副标题的书名
+            for column in ("title_key", "main_title_key"):
+                row = conn.execute(
+                    f"SELECT * FROM books WHERE {column} = ? ORDER BY {completeness} DESC, id LIMIT 1",
+                    (title_key,)
+                ).fetchone()
+                if row is not None:
+                    return self._record(row)
+        return None
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Optional[str]]]:
+        """按书名和作者全文检索"""
+        terms = query.split()
+        if not terms:
+            return []
+        with self._lock:
+            conn = self._connection()
+            if min(len(term) for term in terms) < 3:
+                # trigram索引无法匹配少于三个字符的词，改为逐条扫描
+                conditions = " AND ".join("(title LIKE ? OR author LIKE ?)" for _ in terms)
+                params = [f"%{term}%" for term in terms for _ in range(2)]
+                rows = conn.execute(f"SELECT * FROM books WHERE {conditions} LIMIT ?", params + [limit]).fetchall()
+            else:
+                match = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+                try:
+                    rows = conn.execute(
+                        "SELECT books.* FROM books_fts JOIN books ON books.id = books_fts.rowid "
+                        "WHERE books_fts MATCH ? ORDER BY rank LIMIT ?",
+                        (match, limit)
+                    ).fetchall()
+                except sqlite3.OperationalError:
+                    return []
+        return [self._record(row) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    def load(self, records: Iterable[Dict[str, Any]], batch_size: int = 5000) -> int:
+        """导入书目数据，返回导入的条数
+
+        相同ISBN的记录合并，新数据中为空的字段保留原值。导入完成后重建全文索引。
+        """
+        columns = ("title", "title_key", "main_title_key") + CATALOG_FIELDS[1:]
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{column} = COALESCE(excluded.{column}, {column})" for column in columns)
+        sql = (f"INSERT INTO books ({', '.join(columns)}) VALUES ({placeholders}) "
+               f"ON CONFLICT(isbn) WHERE isbn IS NOT NULL DO UPDATE SET {updates}")
+
+        loaded = 0
+        batch = []
+        with self._lock:
+            conn = self._connection()
+            for raw in records:
+                record = normalize_record(raw)
+                if record is None:
+                    continue
+                batch.append((record["title"], normalize_book_name(record["title"]), main_title_key(record["title"]))
+                             + tuple(record[field] for field in CATALOG_FIELDS[1:]))
+                if len(batch) >= batch_size:
+                    loaded += self._insert(conn, sql, batch)
+                    batch = []
+            if batch:
+                loaded += self._insert(conn, sql, batch)
+            conn.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+        return loaded
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, sql: str, batch: List[tuple]) -> int:
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(sql, batch)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(batch)
+
+    @staticmethod
+    def _record(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Optional[str]]]:
+        if row is None:
+            return None
+        return {field: row[field] for field in CATALOG_FIELDS}
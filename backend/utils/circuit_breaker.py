@@ -0,0 +1,150 @@
+import time
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """熔断器打开时拒绝调用"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit {name} is open, retry after {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """熔断器
+
+    统计时间窗口内的调用结果，失败率（超时的慢调用也计为失败）达到阈值后打开，
+    打开期间直接拒绝调用；经过 open_seconds 后进入半开状态，放行少量试探调用，
+    试探成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 5,
+                 window_seconds: float = 60, slow_call_seconds: Optional[float] = None,
+                 open_seconds: float = 30, half_open_calls: int = 1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._calls: Deque[Tuple[float, bool]] = deque()  # (结束时间, 是否失败)
+        self._trials = 0  # 半开状态下进行中的试探调用数
+        self.rejected = 0
+
+    def before_call(self):
+        """调用前检查，熔断时抛出 CircuitOpenError"""
+        if self.state == OPEN:
+            remaining = self.opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._trials >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self._trials += 1
+
+    def record_success(self, duration: float):
+        if self.slow_call_seconds is not None and duration >= self.slow_call_seconds:
+            self.record_failure(duration, f"Slow call: {duration:.1f}s")
+            return
+        if self.state == HALF_OPEN:
+            self._trials -= 1
+            self._transition(CLOSED)
+            return
+        self._add(False)
+
+    def record_failure(self, duration: float, error: Optional[str] = None):
+        self.last_error = error
+        if self.state == HALF_OPEN:
+            self._trials -= 1
+            self._transition(OPEN)
+            return
+        self._add(True)
+        if self.state == CLOSED and self._should_open():
+            self._transition(OPEN)
+
+    def release(self):
+        """调用被取消、结果未知时归还试探名额"""
+        if self.state == HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._trim()
+        failures = sum(1 for _, failed in self._calls if failed)
+        snapshot = {
+            "state": self.state,
+            "calls": len(self._calls),
+            "failures": failures,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+        if self.state == OPEN:
+            snapshot["retry_after"] = max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+        return snapshot
+
+    def _add(self, failed: bool):
+        self._calls.append((time.monotonic(), failed))
+        self._trim()
+
+    def _trim(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _should_open(self) -> bool:
+        if len(self._calls) < self.min_calls:
+            return False
+        failures = sum(1 for _, failed in self._calls if failed)
+        return failures / len(self._calls) >= self.failure_rate
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"Circuit {self.name}: {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == CLOSED:
+            self.opened_at = None
+            self._calls.clear()
+        if state != HALF_OPEN:
+            self._trials = 0
+
+class CircuitBreakerRegistry:
+    """按名称（模型:操作）管理熔断器"""
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self.overrides: Dict[str, Dict[str, Any]] = {}  # 操作名 -> 覆盖的参数
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, model: str, operation: str) -> CircuitBreaker:
+        name = f"{model}:{operation}"
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            options = dict(self.defaults)
+            options.update(self.overrides.get(operation, {}))
+            breaker = CircuitBreaker(name, **options)
+            self.breakers[name] = breaker
+        return breaker
+
+    def open_circuits(self) -> Dict[str, CircuitBreaker]:
+        return {name: breaker for name, breaker in self.breakers.items() if breaker.state == OPEN}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
@@ -2,11 +2,12 @@ import os
 from datetime import datetime
 
 LOGS_DIR = "logs"
-if not os.path.exists(LOGS_DIR):
-    os.makedirs(LOGS_DIR)
 
 def log_conversation(book_name: str, question: str, answer: str):
     """将用户问题和AI回答记录到文件中"""
+    # 首次写入时再创建目录，避免导入模块时产生文件系统操作
+    os.makedirs(LOGS_DIR, exist_ok=True)
+
     # 清理书名以创建有效的文件名
     safe_book_name = "".join(c for c in book_name if c.isalnum() or c in (' ', '.', '_')).rstrip()
     log_file = os.path.join(LOGS_DIR, f"{safe_book_name}.txt")
@@ -1,6 +1,7 @@
 import re
 import json
 import logging
+import unicodedata
 from typing import Optional, Dict, Any
 
 logger = logging.getLogger(__name__)
@@ -73,6 +74,14 @@ def validate_book_name(book_name: str) -> bool:
     
     return True
 
+def normalize_book_name(book_name: str) -> str:
+    """规范化书名，作为缓存与去重的键"""
+    # 全角转半角、统一大小写，并去掉书名号和多余空白
+    text = unicodedata.normalize("NFKC", book_name or "")
+    text = text.strip().strip("《》<>\"'“”‘’「」").strip()
+    text = re.sub(r'\s+', ' ', text)
+    return text.lower()
+
 def format_book_response(book_info) -> Dict[str, Any]:
     """格式化书籍信息响应"""
     return {
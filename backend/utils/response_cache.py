@@ -0,0 +1,130 @@
+import json
+import gzip
+import hashlib
+from typing import Any, Callable, Dict, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from utils.cache import CacheEntry
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时退回标准库
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 未安装brotli时只提供gzip
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def dumps_json_bytes(data: Any) -> bytes:
+    """序列化为UTF-8编码的JSON字节"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class PreparedResponse:
+    """预先序列化好的JSON响应
+
+    压缩后的版本在第一次需要时生成并保存在对象上，
+    随缓存条目一起复用，不会每次请求重新压缩。
+    """
+
+    __slots__ = ("body", "etag", "_encoded")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        """获取指定编码的响应体（br或gzip）"""
+        body = self._encoded.get(encoding)
+        if body is None:
+            if encoding == "br":
+                body = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+            self._encoded[encoding] = body
+        return body
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """不同编码的响应使用不同的强校验ETag"""
+        return self.etag if not encoding else f'{self.etag[:-1]}-{encoding}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """If-None-Match中是否包含当前内容的ETag"""
+        if not if_none_match:
+            return False
+        candidates = {self.etag, self.etag_for("gzip"), self.etag_for("br")}
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag in candidates:
+                return True
+        return False
+
+    def to_response(self, status_code: int = 200) -> Response:
+        return Response(
+            content=self.body,
+            status_code=status_code,
+            media_type="application/json",
+            headers={"ETag": self.etag}
+        )
+
+    def render(self, request: Request, min_compress_size: int = 1024) -> Response:
+        """根据请求头返回304、压缩或原始响应"""
+        encoding = None
+        if len(self.body) >= min_compress_size:
+            encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+
+        headers = {"ETag": self.etag_for(encoding), "Vary": "Accept-Encoding"}
+        if self.matches(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+
+        if encoding is None:
+            return Response(content=self.body, media_type="application/json", headers=headers)
+
+        headers["Content-Encoding"] = encoding
+        return Response(content=self.encoded(encoding), media_type="application/json", headers=headers)
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """从Accept-Encoding中选择压缩方式，优先br"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        parts = item.strip().split(";")
+        name = parts[0].strip()
+        q = 1.0
+        for param in parts[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name)
+
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def prepare_json_response(payload: Any) -> PreparedResponse:
+    """序列化响应内容并计算ETag"""
+    return PreparedResponse(dumps_json_bytes(payload))
+
+def cached_response(entry: CacheEntry, build_payload: Callable[[Any], Any],
+                    artifact_key: str = "response") -> PreparedResponse:
+    """取缓存条目上已序列化的响应，没有时生成一次并保存"""
+    prepared: Optional[PreparedResponse] = entry.artifacts.get(artifact_key)
+    if prepared is None:
+        prepared = prepare_json_response(build_payload(entry.value))
+        entry.artifacts[artifact_key] = prepared
+    return prepared
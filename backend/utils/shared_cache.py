@@ -0,0 +1,167 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+# 过期条目在删除前额外保留的秒数（供上游故障时返回过期数据）
+STALE_RETENTION = 7 * 86400
+# 每写入多少次清理一次过期数据
+PURGE_EVERY = 1000
+
+def is_busy_error(error: sqlite3.Error) -> bool:
+    """是否为等待其他连接的写锁超时"""
+    return isinstance(error, sqlite3.OperationalError) and "locked" in str(error)
+
+class SharedCache:
+    """基于SQLite的跨进程共享缓存
+
+    同一台机器上的多个worker进程共用一个数据库文件。除了读写之外，
+    提供"认领"操作：缺失的条目只由认领成功的进程生成，其余进程等待结果。
+    认领带有过期时间，持有者异常退出后可被重新认领。
+
+    所有操作都在请求处理中同步执行，busy_timeout 限制等待其他进程写锁的秒数，
+    超时抛出 sqlite3.OperationalError（见 is_busy_error），由调用方按未命中处理，不长时间阻塞事件循环。
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 0.1):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            conn = self._connection()
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL,
+                    PRIMARY KEY (namespace, key)
+                );
+                CREATE TABLE IF NOT EXISTS claims (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                );
+                """
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """每个进程使用自己的连接（SQLite连接不能跨fork共享）"""
+        pid = os.getpid()
+        if self._conn is None or self._pid != pid:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            self._pid = pid
+        return self._conn
+
+    def get(self, namespace: str, key: str, allow_expired: bool = False) -> Optional[Tuple[str, Optional[float]]]:
+        """读取条目，返回 (value, expires_at)"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if not allow_expired and expires_at is not None and expires_at <= time.time():
+            return None
+        return value, expires_at
+
+    def set(self, namespace: str, key: str, value: str, ttl: Optional[float] = None):
+        """写入条目；ttl为None表示永不过期"""
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value, now, expires_at)
+            )
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?",
+                             (now - STALE_RETENTION,))
+                conn.execute("DELETE FROM claims WHERE expires_at < ?", (now,))
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            conn = self._connection()
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+                conn.execute("DELETE FROM claims")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+                conn.execute("DELETE FROM claims WHERE namespace = ?", (namespace,))
+
+    def keys(self, namespace: str) -> List[str]:
+        """未过期的键"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key FROM entries WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT COUNT(*) FROM entries WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time())
+            ).fetchone()
+        return row[0]
+
+    def try_claim(self, namespace: str, key: str, owner: str, ttl: float) -> bool:
+        """原子地认领一个键，成功返回True；已被他人认领且未过期时返回False"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "DELETE FROM claims WHERE namespace = ? AND key = ? AND expires_at < ?",
+                    (namespace, key, now)
+                )
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO claims (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, owner, now + ttl)
+                )
+                claimed = cursor.rowcount == 1
+                if not claimed:
+                    # 同一持有者重复认领时视为成功
+                    row = conn.execute(
+                        "SELECT owner FROM claims WHERE namespace = ? AND key = ?", (namespace, key)
+                    ).fetchone()
+                    claimed = row is not None and row[0] == owner
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def release(self, namespace: str, key: str, owner: str):
+        """释放认领"""
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM claims WHERE namespace = ? AND key = ? AND owner = ?",
+                (namespace, key, owner)
+            )
@@ -0,0 +1,106 @@
+import re
+import math
+import heapq
+import unicodedata
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+# 连续的中日韩字符，或连续的字母数字
+_TOKEN_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿぀-ヿ가-힯]+|[0-9a-z]+")
+_CJK_START = "぀"
+
+def tokenize(text: str) -> List[str]:
+    """分词：字母数字按单词切分并转小写，中日韩文本按相邻两字（bigram）切分，单字保留为一个词"""
+    tokens = []
+    for run in _TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if run[0] < _CJK_START:
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+class BM25Index:
+    """可增量更新的BM25倒排索引
+
+    文档以任意可哈希的ID标识，add 重复的ID时替换原文档。只保存在内存中，
+    适合已缓存书籍信息这类小规模数据；书籍全文的索引见 BookTextService（SQLite FTS5）。
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}  # 词 -> {文档ID: 词频}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self._doc_terms: Dict[Hashable, List[str]] = {}  # 文档ID -> 包含的词，用于删除
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: Hashable, text: str):
+        """添加或替换文档"""
+        self.add_tokens(doc_id, tokenize(text))
+
+    def add_tokens(self, doc_id: Hashable, tokens: Iterable[str]):
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        counts = Counter(tokens)
+        length = sum(counts.values())
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_lengths[doc_id] = length
+        self._doc_terms[doc_id] = list(counts)
+        self._total_length += length
+
+    def remove(self, doc_id: Hashable):
+        if doc_id not in self.doc_lengths:
+            return
+        for term in self._doc_terms.pop(doc_id):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self._total_length -= self.doc_lengths.pop(doc_id)
+
+    def clear(self):
+        self.postings.clear()
+        self.doc_lengths.clear()
+        self._doc_terms.clear()
+        self._total_length = 0
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> Tuple[int, List[Tuple[Hashable, float]]]:
+        """返回 (匹配的文档总数, 按得分排序的 [(文档ID, 得分)] 中 offset 起的 limit 项)"""
+        return self.search_tokens(tokenize(query), limit=limit, offset=offset)
+
+    def search_tokens(self, tokens: Iterable[str], limit: int = 10,
+                      offset: int = 0) -> Tuple[int, List[Tuple[Hashable, float]]]:
+        """与 search 相同，查询为已分好的词"""
+        scores = self.score_tokens(tokens)
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])
+        return len(scores), top[offset:offset + limit]
+
+    def score(self, query: str) -> Dict[Hashable, float]:
+        """计算与查询匹配的所有文档的BM25得分"""
+        return self.score_tokens(tokenize(query))
+
+    def score_tokens(self, tokens: Iterable[str]) -> Dict[Hashable, float]:
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return {}
+        avg_length = self._total_length / doc_count or 1.0
+        scores: Dict[Hashable, float] = {}
+        for term, query_tf in Counter(tokens).items():
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + query_tf * idf * tf * (self.k1 + 1) / norm
+        return scores
@@ -74,3 +74,12 @@ BOOK_MODE_PROMPT = """
 
 TRANSLATE_TO_ENGLISH_PROMPT_TEMPLATE = "请将以下中文文本翻译成英文：\n{text}"
 TRANSLATE_TO_CHINESE_PROMPT_TEMPLATE = "请将以下英文文本翻译成中文：\n{text}"
+
+HISTORY_SUMMARY_PROMPT_TEMPLATE = """请将以下对话压缩为一段简洁的摘要，保留用户关心的主题、已经给出的关键结论、事实与约定，供后续对话参考。只输出摘要本身。
+
+已有摘要：
+{summary}
+
+新增对话：
+{conversation}
+"""
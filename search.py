@@ -1,9 +1,18 @@
+import io
 import os
+import re
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import logging
 from google import genai
 from google.genai.types import Tool, GenerateContentConfig, GoogleSearch, GenerateContentResponse
-from PIL import Image
+from PIL import Image, ImageOps
 import prompts # Import the new prompts module
 
 # 配置日志记录器
@@ -24,7 +33,51 @@ if not GOOGLE_API_KEY:
     st.error("请设置 GOOGLE_API_KEY")
     st.stop()
 
-client = genai.Client(api_key=GOOGLE_API_KEY)
+@st.cache_resource
+def get_client(api_key):
+    """Creates the Gemini client once per process instead of on every rerun."""
+    return genai.Client(api_key=api_key)
+
+@st.cache_resource
+def get_system_message():
+    """The static system prompt message, shared by all sessions."""
+    return {"role": "user", "parts": [{"text": prompts.SYSTEM_PROMPT}]}
+
+class GroundedResponseCache:
+    """Process-wide TTL cache of search-grounded answers and their rendered search entry points."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, answer, rendered_content)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key, answer, rendered_content):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, answer, rendered_content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def get_grounded_cache():
+    """Grounded answers are shared across sessions: repeat questions are common."""
+    return GroundedResponseCache(GROUNDED_CACHE_TTL, GROUNDED_CACHE_MAX_ENTRIES)
+
+client = get_client(GOOGLE_API_KEY)
 
 # 初始化 Gemini-Pro 模型
 MODEL_OPTIONS = {
@@ -34,6 +87,29 @@ MODEL_OPTIONS = {
     "2.0-thinking-exp": "gemini-2.0-flash-thinking-exp-01-21",
 }
 
+# 流式输出的重绘节奏：每次重绘整段 markdown 的开销随长度增长，
+# 因此合并相邻的 chunk，最多每 STREAM_RENDER_INTERVAL 秒重绘一次；
+# 段落结束时只要距上次重绘超过 STREAM_PARAGRAPH_MIN_INTERVAL 秒就提前重绘
+STREAM_RENDER_INTERVAL = 0.25
+STREAM_PARAGRAPH_MIN_INTERVAL = 0.08
+
+# 上传图片发送给模型前的预处理：长边缩放到 IMAGE_MAX_SIDE 像素以内并重新编码为JPEG，
+# 手机原图的分辨率远超模型所需，缩小后上传更快、输入token更少
+IMAGE_MAX_SIDE = 1536
+IMAGE_JPEG_QUALITY = 85
+
+# 长文本翻译：按段落/句子切分为不超过 TRANSLATION_CHUNK_TOKENS（估算）的片段，
+# 最多 TRANSLATION_CONCURRENCY 个片段同时翻译，按原文顺序依次输出
+TRANSLATION_CHUNK_TOKENS = 1500
+TRANSLATION_CONCURRENCY = 4
+
+# 搜索增强回答的缓存：相同模型、问题与参数在 GROUNDED_CACHE_TTL 秒内直接复用
+GROUNDED_CACHE_TTL = int(os.getenv("GROUNDED_CACHE_TTL", "600"))
+GROUNDED_CACHE_MAX_ENTRIES = 256
+
+# 超出历史token预算的较早对话由该模型压缩成摘要
+HISTORY_SUMMARY_MODEL = "gemini-2.0-flash"
+
 # 初始化会话状态
 if "messages" not in st.session_state:
     st.session_state.messages = [{"role": "assistant", "content": "你好。我可以帮助你吗？"}]
@@ -43,11 +119,34 @@ if "uploaded_image" not in st.session_state:
     st.session_state.uploaded_image = None
 if "uploader_key" not in st.session_state:
     st.session_state.uploader_key = 0
+if "history_summary" not in st.session_state:
+    st.session_state.history_summary = None  # {"count": 已摘要的消息数, "text": 摘要}
 
 # 页面标题
 st.title("Gemini AI 聊天助手")
 
 # --- Helper Functions ---
+@st.cache_data(show_spinner=False, max_entries=16)
+def prepare_image(image_hash, _image_bytes):
+    """Decodes, downsamples and re-encodes an uploaded image once per content hash."""
+    image = Image.open(io.BytesIO(_image_bytes))
+    image = ImageOps.exif_transpose(image)  # 按照片的EXIF方向旋转，缩放后方向信息会丢失
+    original_size = image.size
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return {
+        "hash": image_hash,
+        "bytes": buffer.getvalue(),
+        "mime_type": "image/jpeg",
+        "size": image.size,
+        "original_size": original_size,
+        "original_bytes": len(_image_bytes),
+    }
+
 def configure_sidebar():
     """Configures and displays the sidebar elements."""
     with st.sidebar:
@@ -69,6 +168,14 @@ def configure_sidebar():
                 "最大 Token 数量", 128, 8192, 8192,
                 help="生成文本的最大长度"
             )
+            history_token_budget = st.number_input(
+                "历史 Token 上限", 0, 200000, 16000, step=1000,
+                help="每次请求携带的历史对话的估算 token 上限，超出部分不再发送"
+            )
+            summarize_history_enabled = st.checkbox(
+                "摘要较早的对话", value=True,
+                help="将超出上限的较早对话压缩成摘要一并发送"
+            )
         st.divider()
 
         st.subheader("输出与搜索设置")
@@ -91,16 +198,25 @@ def configure_sidebar():
             key=f"file_uploader_{st.session_state.uploader_key}"
         )
 
-        # Synchronize the PIL image object with the file uploader's state
+        # Synchronize the prepared image with the file uploader's state;
+        # the image is only decoded again when its content changes
         if upload_image_file is None:
             st.session_state.uploaded_image = None
         else:
-            st.session_state.uploaded_image = Image.open(upload_image_file)
+            image_bytes = upload_image_file.getvalue()
+            image_hash = hashlib.sha256(image_bytes).hexdigest()
+            current = st.session_state.uploaded_image
+            if current is None or current["hash"] != image_hash:
+                st.session_state.uploaded_image = prepare_image(image_hash, image_bytes)
 
         image = st.session_state.get("uploaded_image")
 
         if image and upload_image_file:
-            st.info(f"已上传图片: {upload_image_file.name}，将在聊天中使用")
+            width, height = image["size"]
+            st.info(
+                f"已上传图片: {upload_image_file.name}（{width}×{height}，"
+                f"{image['original_bytes'] // 1024} KB → {len(image['bytes']) // 1024} KB），将在聊天中使用"
+            )
 
         st.divider()
 
@@ -108,12 +224,13 @@ def configure_sidebar():
             st.session_state.messages = [{"role": "assistant", "content": "你好。我可以帮助你吗？"}]
             st.session_state.prompt_used = False
             st.session_state.uploaded_image = None
+            st.session_state.history_summary = None
             st.session_state.uploader_key += 1  # Increment key to reset file uploader
             st.rerun()
 
     return (current_model_name, temperature, max_tokens, stream_enabled,
             translate_enabled, computer_expert, book_mode, careful_check,
-            search_enabled, image)
+            search_enabled, image, history_token_budget, summarize_history_enabled)
 
 def display_chat_history():
     """Displays the chat history."""
@@ -121,32 +238,73 @@ def display_chat_history():
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
+def extract_chunk_text(chunk):
+    """Extracts the text from a streamed chunk; returns None for unknown chunk types."""
+    if isinstance(chunk, GenerateContentResponse):
+        text_chunk = ""
+        if hasattr(chunk, 'candidates') and chunk.candidates:
+            for candidate in chunk.candidates:
+                if hasattr(candidate, 'content') and candidate.content and candidate.content.parts:
+                    for part in candidate.content.parts:
+                        if hasattr(part, 'text') and part.text:
+                            text_chunk += part.text
+        return text_chunk
+    if isinstance(chunk, str): # Fallback for direct string chunks if API changes
+        return chunk
+    return None
+
 def handle_streaming_response(response_iter):
-    """Handles streaming responses from the API."""
+    """Handles streaming responses from the API.
+
+    Chunks are coalesced and the placeholder is re-rendered at a bounded rate
+    (or early on paragraph boundaries), followed by one final full render.
+    """
     message_placeholder = st.empty()
-    full_response = ""
+    parts = []
+    chunk_count = 0
+    render_count = 0
+    render_seconds = 0.0
+    output_tokens = None
+    start = last_render = time.monotonic()
+
+    def render(text):
+        nonlocal render_count, render_seconds, last_render
+        render_start = time.monotonic()
+        message_placeholder.markdown(text)
+        last_render = time.monotonic()
+        render_seconds += last_render - render_start
+        render_count += 1
+
     try:
         for chunk in response_iter:
-            text_chunk = ""
-            if isinstance(chunk, GenerateContentResponse):
-                if hasattr(chunk, 'candidates') and chunk.candidates:
-                    for candidate in chunk.candidates:
-                        if hasattr(candidate, 'content') and candidate.content:
-                            for part in candidate.content.parts:
-                                if hasattr(part, 'text'):
-                                    text_chunk += part.text
-            elif isinstance(chunk, str): # Fallback for direct string chunks if API changes
-                text_chunk = chunk
-            else:
+            text_chunk = extract_chunk_text(chunk)
+            if text_chunk is None:
                 # st.warning(f"未知类型的chunk: {type(chunk)}") # Can be noisy
                 continue
-            
-            full_response += text_chunk
-            message_placeholder.markdown(full_response + "▌")
+            usage = getattr(chunk, 'usage_metadata', None)
+            if usage is not None and getattr(usage, 'candidates_token_count', None):
+                output_tokens = usage.candidates_token_count
+            if not text_chunk:
+                continue
+
+            chunk_count += 1
+            parts.append(text_chunk)
+
+            elapsed = time.monotonic() - last_render
+            paragraph_done = "\n\n" in text_chunk
+            if elapsed >= STREAM_RENDER_INTERVAL or (paragraph_done and elapsed >= STREAM_PARAGRAPH_MIN_INTERVAL):
+                render("".join(parts) + "▌")
     except Exception as e:
         st.error(f"流式输出错误: {str(e)}")
         return None
-    message_placeholder.markdown(full_response)
+
+    full_response = "".join(parts)
+    render(full_response)
+    logging.info(
+        f"Stream render: {len(full_response)} chars, {output_tokens or 'unknown'} output tokens, "
+        f"{chunk_count} chunks, {render_count} renders, {render_seconds:.3f}s rendering, "
+        f"{time.monotonic() - start:.2f}s total"
+    )
     return full_response
 
 def handle_normal_response(response):
@@ -170,31 +328,133 @@ def build_prompt_prefix(computer_expert, careful_check, book_mode):
             st.session_state.prompt_used = True # Mark prompt as used for book mode
     return prefix
 
-def build_gemini_messages(system_prompt_text, history_messages, current_user_input_with_prefix):
+def estimate_tokens(text):
+    """Roughly estimates the token count: one per CJK character, one per four other characters."""
+    cjk_chars = sum(1 for char in text if '\u4e00' <= char <= '\u9fff')
+    return cjk_chars + (len(text) - cjk_chars) // 4 + 1
+
+def select_history_window(history_messages, token_budget):
+    """Splits the history into (dropped, kept): the newest messages that fit in the token budget are kept."""
+    used = 0
+    start = len(history_messages)
+    for index in range(len(history_messages) - 1, -1, -1):
+        used += estimate_tokens(history_messages[index]["content"])
+        if used > token_budget:
+            break
+        start = index
+    return history_messages[:start], history_messages[start:]
+
+def summarize_history(client_instance, dropped_messages):
+    """Returns a summary of the dropped messages, extending the cached summary incrementally."""
+    summary = st.session_state.history_summary
+    if summary and summary["count"] == len(dropped_messages):
+        return summary["text"]
+    if not summary or summary["count"] > len(dropped_messages):
+        # 历史被清空或预算调大，重新摘要
+        summary = {"count": 0, "text": ""}
+
+    conversation = "\n".join(
+        f"{'助手' if msg['role'] == 'assistant' else '用户'}: {msg['content']}"
+        for msg in dropped_messages[summary["count"]:]
+    )
+    prompt = prompts.HISTORY_SUMMARY_PROMPT_TEMPLATE.format(
+        summary=summary["text"] or "（无）", conversation=conversation
+    )
+    response = client_instance.models.generate_content(
+        model=HISTORY_SUMMARY_MODEL,
+        contents=prompt,
+        config=GenerateContentConfig(temperature=0.1, max_output_tokens=1024),
+    )
+    text = handle_normal_response(response)
+    if not text:
+        return summary["text"] or None
+    st.session_state.history_summary = {"count": len(dropped_messages), "text": text}
+    return text
+
+def build_gemini_messages(system_message, history_messages, current_user_input_with_prefix, history_summary=None):
     """Constructs the message list in the format expected by the Gemini API."""
-    messages = [{"role": "user", "parts": [{"text": system_prompt_text}]}]
+    messages = [system_message]
+    if history_summary:
+        messages.append({"role": "user", "parts": [{"text": f"以下是之前对话的摘要：\n{history_summary}"}]})
     for msg in history_messages:
         role = "model" if msg["role"] == "assistant" else "user"
         messages.append({"role": role, "parts": [{"text": msg["content"]}]})
     messages.append({"role": "user", "parts": [{"text": current_user_input_with_prefix}]})
     return messages
 
-def generate_response_with_search(client_instance, model_name, messages_list, gen_config):
-    """Generates a response using the search tool."""
-    response = client_instance.models.generate_content(
-        model=model_name,
-        contents=messages_list,
-        config=gen_config,
-    )
-    if (response and hasattr(response, 'candidates') and response.candidates and
-        hasattr(response.candidates[0], 'grounding_metadata') and
-        response.candidates[0].grounding_metadata and
-        hasattr(response.candidates[0].grounding_metadata, 'search_entry_point') and
-        response.candidates[0].grounding_metadata.search_entry_point and
-        hasattr(response.candidates[0].grounding_metadata.search_entry_point, 'rendered_content')):
+def normalize_question(text):
+    """Normalizes a question for cache keys: full/half width, case and whitespace are ignored."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize("NFKC", text)).strip().lower()
+
+def grounded_cache_key(model_name, question, gen_config, prompt_prefix):
+    """Cache key of a grounded answer: model, normalized question and generation config."""
+    payload = [model_name, normalize_question(question), normalize_question(prompt_prefix),
+               gen_config.temperature, gen_config.max_output_tokens]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def extract_search_entry_point(response):
+    """Returns the rendered Google search entry point of a (chunk of a) grounded response, if any."""
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return None
+    grounding_metadata = getattr(candidates[0], 'grounding_metadata', None)
+    search_entry_point = getattr(grounding_metadata, 'search_entry_point', None) if grounding_metadata else None
+    return getattr(search_entry_point, 'rendered_content', None) if search_entry_point else None
+
+def show_search_results(rendered_content):
+    if rendered_content:
         with st.expander("搜索结果"):
-            st.markdown(response.candidates[0].grounding_metadata.search_entry_point.rendered_content, unsafe_allow_html=True)
-    return handle_normal_response(response)
+            st.markdown(rendered_content, unsafe_allow_html=True)
+
+def generate_response_with_search(client_instance, model_name, messages_list, gen_config,
+                                  stream_enabled_flag=False, cache_key=None):
+    """Generates a response using the search tool (cached by cache_key, optionally streamed).
+
+    When streaming, the answer is rendered here; otherwise the caller renders the returned text.
+    """
+    grounded_cache = get_grounded_cache()
+    if cache_key is not None:
+        cached = grounded_cache.get(cache_key)
+        if cached is not None:
+            answer, rendered_content = cached
+            logging.info("Grounded response served from cache")
+            show_search_results(rendered_content)
+            if stream_enabled_flag:
+                st.markdown(answer)
+            return answer
+
+    if stream_enabled_flag:
+        # 搜索入口信息随最后的chunk返回，流式输出时顺带记录
+        grounding = {}
+        def record_grounding(response_iter):
+            for chunk in response_iter:
+                rendered = extract_search_entry_point(chunk)
+                if rendered:
+                    grounding["rendered_content"] = rendered
+                yield chunk
+
+        answer = handle_streaming_response(record_grounding(
+            client_instance.models.generate_content_stream(
+                model=model_name,
+                contents=messages_list,
+                config=gen_config,
+            )
+        ))
+        rendered_content = grounding.get("rendered_content")
+        show_search_results(rendered_content)
+    else:
+        response = client_instance.models.generate_content(
+            model=model_name,
+            contents=messages_list,
+            config=gen_config,
+        )
+        rendered_content = extract_search_entry_point(response)
+        show_search_results(rendered_content)
+        answer = handle_normal_response(response)
+
+    if answer and cache_key is not None:
+        grounded_cache.set(cache_key, answer, rendered_content)
+    return answer
 
 def generate_standard_response(client_instance, model_name, messages_list, gen_config, stream_enabled_flag):
     """Generates a standard text response (streaming or normal)."""
@@ -217,14 +477,81 @@ def generate_standard_response(client_instance, model_name, messages_list, gen_c
         st.error(f"生成响应时出错: {str(e)}")
         return None
 
+def split_translation_chunks(text, max_tokens=TRANSLATION_CHUNK_TOKENS):
+    """Splits text into chunks of at most max_tokens (estimated) on paragraph, then sentence boundaries."""
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text.strip()):
+        if not paragraph.strip():
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append((paragraph, True))
+            continue
+        # 保留句末标点后的空白，拼接后英文单词不会粘连
+        for sentence in re.findall(r'[^。！？；!?;.]*[。！？；!?;.]+\s*|[^。！？；!?;.]+$', paragraph):
+            # 超长的单句按字符硬切分
+            step = max(1, len(sentence) * max_tokens // estimate_tokens(sentence))
+            for start in range(0, len(sentence), step):
+                pieces.append((sentence[start:start + step], False))
+        pieces[-1] = (pieces[-1][0], True)  # 段落结束
+
+    chunks = []
+    current = ""
+    for piece, ends_paragraph in pieces:
+        candidate = current + piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current.strip())
+            candidate = piece
+        current = candidate + ("\n\n" if ends_paragraph else "")
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
+
+def generate_chunked_translation(client_instance, model_name, chunks, prompt_template, gen_config, stream_enabled_flag):
+    """Translates chunks concurrently and renders each completed in-order prefix."""
+    def translate(chunk):
+        response = client_instance.models.generate_content(
+            contents=prompt_template.format(text=chunk), model=model_name, config=gen_config
+        )
+        text = handle_normal_response(response)
+        if not text:
+            raise ValueError("Empty translation")
+        return text.strip()
+
+    message_placeholder = st.empty() if stream_enabled_flag else None
+    results = []
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=TRANSLATION_CONCURRENCY) as executor:
+        futures = [executor.submit(translate, chunk) for chunk in chunks]
+        try:
+            # 按原文顺序等待，已完成的前缀立即输出，后面的片段同时在翻译
+            for index, future in enumerate(futures):
+                results.append(future.result())
+                if message_placeholder is not None:
+                    suffix = "" if index == len(futures) - 1 else "\n\n▌"
+                    message_placeholder.markdown("\n\n".join(results) + suffix)
+        except Exception as e:
+            for future in futures:
+                future.cancel()
+            st.error(f"翻译第 {len(results) + 1} 段时出错: {str(e)}")
+            return None
+    logging.info(f"Chunked translation: {len(chunks)} chunks in {time.monotonic() - start:.2f}s")
+    return "\n\n".join(results)
+
 def generate_translation_response(client_instance, model_name, user_text, gen_config, stream_enabled_flag):
-    """Generates a translation response."""
+    """Generates a translation response; long texts are translated in parallel chunks."""
     is_chinese = any('\u4e00' <= char <= '\u9fff' for char in user_text)
     if is_chinese:
-        translation_prompt_text = prompts.TRANSLATE_TO_ENGLISH_PROMPT_TEMPLATE.format(text=user_text)
+        prompt_template = prompts.TRANSLATE_TO_ENGLISH_PROMPT_TEMPLATE
     else:
-        translation_prompt_text = prompts.TRANSLATE_TO_CHINESE_PROMPT_TEMPLATE.format(text=user_text)
+        prompt_template = prompts.TRANSLATE_TO_CHINESE_PROMPT_TEMPLATE
+
+    chunks = split_translation_chunks(user_text)
+    if len(chunks) > 1:
+        return generate_chunked_translation(
+            client_instance, model_name, chunks, prompt_template, gen_config, stream_enabled_flag
+        )
 
+    translation_prompt_text = prompt_template.format(text=user_text)
     if stream_enabled_flag:
         return handle_streaming_response(
             client_instance.models.generate_content_stream(
@@ -238,9 +565,10 @@ def generate_translation_response(client_instance, model_name, user_text, gen_co
         return handle_normal_response(response)
 
 def generate_image_response(client_instance, model_name, user_text, image_data, gen_config, stream_enabled_flag):
-    """Generates a response for image-based input."""
-    st.image(image_data, caption="上传的图片", use_container_width=True)
-    contents = [user_text, image_data]
+    """Generates a response for image-based input (image_data is the output of prepare_image)."""
+    st.image(image_data["bytes"], caption="上传的图片", use_container_width=True)
+    image_part = genai.types.Part.from_bytes(data=image_data["bytes"], mime_type=image_data["mime_type"])
+    contents = [user_text, image_part]
     if stream_enabled_flag:
         return handle_streaming_response(
             client_instance.models.generate_content_stream(
@@ -256,7 +584,7 @@ def generate_image_response(client_instance, model_name, user_text, image_data,
 # --- Main App Logic ---
 (current_model, temperature_setting, max_tokens_setting, stream_enabled_opt,
  translate_enabled_opt, computer_expert_opt, book_mode_opt, careful_check_opt,
- search_enabled_opt, image_data_opt) = configure_sidebar()
+ search_enabled_opt, image_data_opt, history_token_budget_opt, summarize_history_opt) = configure_sidebar()
 
 display_chat_history()
 
@@ -283,10 +611,21 @@ if user_input:
                     computer_expert_opt, careful_check_opt, book_mode_opt
                 )
                 
+                dropped_history, kept_history = select_history_window(
+                    st.session_state.messages[:-1], history_token_budget_opt
+                )
+                history_summary_text = None
+                if dropped_history and summarize_history_opt:
+                    try:
+                        history_summary_text = summarize_history(client, dropped_history)
+                    except Exception as e:
+                        logging.error(f"History summary failed: {str(e)}")
+                
                 gemini_messages = build_gemini_messages(
-                    prompts.SYSTEM_PROMPT,
-                    st.session_state.messages[:-1], # History
-                    prompt_prefix_text + user_input # Current input with prefix
+                    get_system_message(),
+                    kept_history, # History within the token budget
+                    prompt_prefix_text + user_input, # Current input with prefix
+                    history_summary_text
                 )
                 
                 response_text = None
@@ -296,7 +635,10 @@ if user_input:
                     )
                 elif search_enabled_opt:
                     response_text = generate_response_with_search(
-                        client, current_model, gemini_messages, generation_config_obj
+                        client, current_model, gemini_messages, generation_config_obj, stream_enabled_opt,
+                        cache_key=grounded_cache_key(
+                            current_model, user_input, generation_config_obj, prompt_prefix_text
+                        )
                     )
                 elif translate_enabled_opt:
                     response_text = generate_translation_response(
@@ -310,7 +652,7 @@ if user_input:
                 if response_text:
                     st.session_state.messages.append({"role": "assistant", "content": response_text})
                     logging.info(f"Assistant: {response_text}")
-                    if not stream_enabled_opt or search_enabled_opt: # Non-streaming or search needs explicit markdown
+                    if not stream_enabled_opt: # Streamed responses are already rendered
                         st.markdown(response_text)
                 else:
                     st.error("未能获取有效响应")